@@ -0,0 +1,22 @@
+"""
+Request checks shared by the report routers.
+"""
+from typing import Optional
+
+from fastapi import HTTPException, Query
+
+from app.services.model_catalog import model_catalog
+
+
+def check_model(model: Optional[str]) -> None:
+    """Reject a model the Ollama fleet does not have (422) before any work is done."""
+    if model and not model_catalog.is_known(model):
+        raise HTTPException(
+            status_code=422,
+            detail=f"Unknown model: {model}. Available models: {', '.join(model_catalog.names())}",
+        )
+
+
+def require_known_model(model: Optional[str] = Query(None)) -> None:
+    """Router dependency validating the ``model`` query parameter of report endpoints."""
+    check_model(model)
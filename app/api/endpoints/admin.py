@@ -0,0 +1,47 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from typing import Any, Dict, Optional
+import hmac
+import os
+import time
+
+from app.services.loop_monitor import loop_monitor
+from app.services.profiler import ProfilerBusy, capture_profile
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """The admin endpoints exist only when ADMIN_TOKEN is configured."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+# --- Router Definition ---
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin)]
+)
+
+@router.get("/loop-lag")
+async def loop_lag() -> Dict[str, Any]:
+    """هیستوگرام تأخیر حلقه رویداد"""
+    return loop_monitor.stats()
+
+@router.post("/profile")
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=120, description="مدت نمونه‌برداری (ثانیه)"),
+    top: int = Query(50, ge=1, le=500, description="تعداد ردیف‌های خلاصه")
+) -> Response:
+    """ثبت پروفایل CPU و حافظه سرور در حال اجرا و دریافت آن به صورت فایل zip"""
+    try:
+        data = await capture_profile(seconds, top)
+    except ProfilerBusy:
+        raise HTTPException(status_code=409, detail="A profile capture is already running")
+
+    filename = time.strftime("profile-%Y%m%d-%H%M%S.zip")
+    return Response(
+        content=data,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,6 +1,12 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.services.report_generator import ReportGenerator
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.api.dependencies import require_known_model
+from app.services.report_cache import report_cache
+from app.services.backend_client import backend
+from app.services.replica import replica
+from app.services.timing import timed
+from app.services.sources import tracks_sources
 from app.models.report import Report
+from app.services.prompts import ReportPrompt
 from typing import List, Optional
 from pydantic import BaseModel
 import httpx
@@ -24,37 +30,33 @@ class Assessment(BaseModel):
 # --- Router Definition ---
 router = APIRouter(
     prefix="/assessments",
-    tags=["Assessments Report"]
+    tags=["Assessments Report"],
+    dependencies=[Depends(require_known_model)]
 )
-report_generator = ReportGenerator()
-BACKEND_BASE_URL = "http://192.168.1.50:8080/api"
 
-@router.post("/report", response_model=Report)
-async def generate_assessment_report(
-    model: str = "phi3:mini",
-    limit: int = Query(5, description="تعداد ممیزی‌های اخیر برای نمایش در گزارش")
-) -> Report:
-    """تولید گزارش تحلیلی از ممیزی‌ها و ارزیابی‌های امنیتی"""
+@timed("prompt")
+@tracks_sources
+async def build_assessment_prompt(
+    limit: int = 5
+) -> ReportPrompt:
 
     try:
-        async with httpx.AsyncClient() as client:
-            # Fetch assessment statistics
-            stats_response = await client.get(f"{BACKEND_BASE_URL}/assessments/stats")
-            stats_response.raise_for_status()
-            stats = AssessmentStats(**stats_response.json())
+        # Fetch assessment statistics
+        stats = AssessmentStats(**await backend.get_json("/assessments/stats"))
+
+        # Fetch recent completed assessments
+        if await replica.is_fresh("assessments"):
+            completed_assessments = await replica.query("assessments", status="COMPLETED", limit=limit)
+        else:
+            assessments_data = await backend.get_json("/assessments")
 
-            # Fetch recent completed assessments
-            assessments_response = await client.get(f"{BACKEND_BASE_URL}/assessments")
-            assessments_response.raise_for_status()
-            assessments_data = assessments_response.json()
-            
             # Filter for completed assessments and sort by date to get the most recent ones
             completed_assessments = sorted(
                 [a for a in assessments_data if a.get("status") == "COMPLETED"],
-                key=lambda x: x.get("assessmentDate", ""),
+                key=lambda x: x.get("assessmentDate") or "",
                 reverse=True
             )
-            assessments = [Assessment(**asm) for asm in completed_assessments[:limit]]
+        assessments = [Assessment(**asm) for asm in completed_assessments[:limit]]
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
@@ -72,9 +74,18 @@ async def generate_assessment_report(
             f"  - **تاریخ:** {asm.assessmentDate or 'نامشخص'}\n\n"
         )
     
-    prompt = f"""
+    prompt = ReportPrompt(
+        preamble="""
     شما یک مشاور ارشد امنیت و ممیزی سایبری هستید. بر اساس داده‌های زیر، یک گزارش مدیریتی جامع در مورد وضعیت ممیزی‌های امنیتی سازمان تهیه کنید:
 
+    **تحلیل و توصیه‌ها:**
+    گزارش شما باید شامل موارد زیر باشد:
+    1.  **خلاصه اجرایی:** ارزیابی کلی از وضعیت ممیزی‌ها و سطح ریسک سازمان.
+    2.  **تحلیل روند:** آیا نمره ریسک سازمان در حال بهبود است یا خیر؟
+    3.  **سازمان‌های پرخطر:** کدام سازمان‌ها بر اساس نمره ریسک، نیاز به توجه فوری دارند؟
+    4.  **توصیه‌های راهبردی:** چه اقداماتی برای بهبود فرآیندهای ممیزی و کاهش ریسک کلی پیشنهاد می‌کنید؟
+    """,
+        body=f"""
     **آمار کلی ممیزی‌ها (Assessments):**
     - تعداد کل ممیزی‌ها: {stats.totalAssessments}
     - ممیزی‌های تکمیل‌شده: {stats.completedAssessments}
@@ -84,16 +95,20 @@ async def generate_assessment_report(
 
     **جزئیات آخرین ممیزی‌های تکمیل‌شده:**
     {assessment_details if assessment_details else "موردی یافت نشد."}
+    """,
+    )
 
-    **تحلیل و توصیه‌ها:**
-    گزارش شما باید شامل موارد زیر باشد:
-    1.  **خلاصه اجرایی:** ارزیابی کلی از وضعیت ممیزی‌ها و سطح ریسک سازمان.
-    2.  **تحلیل روند:** آیا نمره ریسک سازمان در حال بهبود است یا خیر؟
-    3.  **سازمان‌های پرخطر:** کدام سازمان‌ها بر اساس نمره ریسک، نیاز به توجه فوری دارند؟
-    4.  **توصیه‌های راهبردی:** چه اقداماتی برای بهبود فرآیندهای ممیزی و کاهش ریسک کلی پیشنهاد می‌کنید؟
-    """
+    return prompt
+
+@router.post("/report", response_model=Report)
+async def generate_assessment_report(
+    model: Optional[str] = None,
+    limit: int = Query(5, description="تعداد ممیزی‌های اخیر برای نمایش در گزارش")
+) -> Report:
+    """تولید گزارش تحلیلی از ممیزی‌ها و ارزیابی‌های امنیتی"""
+    prompt = await build_assessment_prompt(limit)
 
     try:
-        return await report_generator.generate_report(model, prompt)
+        return await report_cache.generate(model, prompt, report_type="assessments.report", params={"limit": limit})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,9 +1,19 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.services.report_generator import ReportGenerator
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app.api.dependencies import require_known_model
+from app.services.report_cache import report_cache
+from app.services.backend_client import backend
+from app.services.replica import replica
+from app.services.timing import timed
+from app.services.sources import tracks_sources
 from app.models.report import Report
+from app.services.prompts import ReportPrompt
 from typing import Optional
 from pydantic import BaseModel
+import asyncio
 import httpx
+import json
+import time
 from datetime import datetime, timedelta
 
 # --- Models ---
@@ -24,37 +34,34 @@ class OrganizationStat(BaseModel):
     totalIncidents: int = 0
     riskLevel: str = "متوسط"
 
+class ExecutiveBundle(BaseModel):
+    governor: Report
+    director_general: Report
+    center_director: Report
+    wall_seconds: float
+
 # --- Router Definition ---
 router = APIRouter(
     prefix="/executive",
-    tags=["Executive Reports"]
+    tags=["Executive Reports"],
+    dependencies=[Depends(require_known_model)]
 )
-report_generator = ReportGenerator()
-BACKEND_BASE_URL = "http://192.168.1.50:8080/api"
 
-@router.post("/governor", response_model=Report)
-async def generate_governor_report(
-    model: str = "phi3:mini",
+@timed("prompt")
+@tracks_sources
+async def build_governor_prompt(
     quarter: Optional[int] = None,
     year: Optional[int] = None
-) -> Report:
-    """تولید گزارش سه‌ماهه برای استاندار"""
+) -> ReportPrompt:
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get dashboard stats
-            stats_response = await client.get(f"{BACKEND_BASE_URL}/dashboard/stats")
-            stats_response.raise_for_status()
-            stats = DashboardStats(**stats_response.json())
-
-            # Get organization stats
-            org_response = await client.get(f"{BACKEND_BASE_URL}/organizations/stats")
-            org_response.raise_for_status()
-            org_stats = org_response.json()
-
-            # Get monthly summary
-            monthly_response = await client.get(f"{BACKEND_BASE_URL}/reports/monthly-summary")
-            monthly_response.raise_for_status()
-            monthly_data = monthly_response.json()
+        # Get dashboard stats
+        stats = DashboardStats(**await backend.get_json("/dashboard/stats"))
+
+        # Get organization stats
+        org_stats = await backend.get_json("/organizations/stats")
+
+        # Get monthly summary
+        monthly_data = await backend.get_json("/reports/monthly-summary")
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
@@ -64,11 +71,23 @@ async def generate_governor_report(
     current_quarter = quarter or ((datetime.now().month - 1) // 3 + 1)
     current_year = year or datetime.now().year
 
-    prompt = f"""
+    prompt = ReportPrompt(
+        preamble="""
     بسم الله الرحمن الرحیم
 
     شما مشاور ارشد امنیت سایبری استان هستید. یک گزارش اجرایی سه‌ماهه برای استاندار محترم تهیه کنید.
 
+    **نکات مورد انتظار در گزارش:**
+    1. **خلاصه اجرایی:** وضعیت کلی امنیت سایبری استان در یک پاراگراف
+    2. **دستاوردهای کلیدی:** مهم‌ترین اقدامات و دستاوردهای سه ماه گذشته (3 مورد)
+    3. **چالش‌های اساسی:** مهم‌ترین چالش‌ها و تهدیدات (2 مورد)
+    4. **پیشنهادات راهبردی:** اقدامات پیشنهادی برای بهبود وضعیت (3 مورد)
+    5. **نیازمندی‌های حمایتی:** موارد نیازمند حمایت و پیگیری استاندار محترم
+
+    گزارش باید رسمی، مختصر و قابل ارائه در جلسه شورای امنیت استان باشد.
+    از عبارات تخصصی پیچیده پرهیز کنید و بر نتایج کاربردی تمرکز کنید.
+    """,
+        body=f"""
     **دوره گزارش:** فصل {current_quarter} سال {current_year}
 
     **آمار کلی استان:**
@@ -82,46 +101,41 @@ async def generate_governor_report(
 
     **وضعیت سازمان‌های کلیدی:**
     {chr(10).join([f"- {org['name']}: {org.get('totalVulnerabilities', 0)} آسیب‌پذیری، {org.get('totalIncidents', 0)} رخداد" for org in org_stats[:5]])}
+    """,
+    )
 
-    **نکات مورد انتظار در گزارش:**
-    1. **خلاصه اجرایی:** وضعیت کلی امنیت سایبری استان در یک پاراگراف
-    2. **دستاوردهای کلیدی:** مهم‌ترین اقدامات و دستاوردهای سه ماه گذشته (3 مورد)
-    3. **چالش‌های اساسی:** مهم‌ترین چالش‌ها و تهدیدات (2 مورد)
-    4. **پیشنهادات راهبردی:** اقدامات پیشنهادی برای بهبود وضعیت (3 مورد)
-    5. **نیازمندی‌های حمایتی:** موارد نیازمند حمایت و پیگیری استاندار محترم
+    return prompt
 
-    گزارش باید رسمی، مختصر و قابل ارائه در جلسه شورای امنیت استان باشد.
-    از عبارات تخصصی پیچیده پرهیز کنید و بر نتایج کاربردی تمرکز کنید.
-    """
+@router.post("/governor", response_model=Report)
+async def generate_governor_report(
+    model: Optional[str] = None,
+    quarter: Optional[int] = None,
+    year: Optional[int] = None,
+    sectioned: bool = Query(False, description="تولید موازی بخش‌های گزارش")
+) -> Report:
+    """تولید گزارش سه‌ماهه برای استاندار"""
+    prompt = await build_governor_prompt(quarter, year)
 
     try:
-        return await report_generator.generate_report(model, prompt)
+        return await report_cache.generate(model, prompt, report_type="executive.governor", params={"quarter": quarter, "year": year}, sectioned=sectioned)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/director-general", response_model=Report)
-async def generate_director_general_report(
-    model: str = "phi3:mini",
+@timed("prompt")
+@tracks_sources
+async def build_director_general_prompt(
     month: Optional[int] = None,
     year: Optional[int] = None
-) -> Report:
-    """تولید گزارش ماهانه برای مدیرکل"""
+) -> ReportPrompt:
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get dashboard stats
-            stats_response = await client.get(f"{BACKEND_BASE_URL}/dashboard/stats")
-            stats_response.raise_for_status()
-            stats = DashboardStats(**stats_response.json())
-
-            # Get user performance stats
-            user_response = await client.get(f"{BACKEND_BASE_URL}/activities/user-stats")
-            user_response.raise_for_status()
-            user_stats = user_response.json()
-
-            # Get vulnerability stats
-            vuln_response = await client.get(f"{BACKEND_BASE_URL}/vulnerabilities/stats")
-            vuln_response.raise_for_status()
-            vuln_stats = vuln_response.json()
+        # Get dashboard stats
+        stats = DashboardStats(**await backend.get_json("/dashboard/stats"))
+
+        # Get user performance stats
+        user_stats = await backend.get_json("/activities/user-stats")
+
+        # Get vulnerability stats
+        vuln_stats = await backend.get_json("/vulnerabilities/stats")
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
@@ -133,9 +147,24 @@ async def generate_director_general_report(
     persian_months = ["فروردین", "اردیبهشت", "خرداد", "تیر", "مرداد", "شهریور",
                      "مهر", "آبان", "آذر", "دی", "بهمن", "اسفند"]
 
-    prompt = f"""
+    prompt = ReportPrompt(
+        preamble="""
     شما رئیس مرکز امنیت سایبری استان هستید. یک گزارش ماهانه جامع برای مدیرکل محترم تهیه کنید.
 
+    **ساختار گزارش:**
+    1. **خلاصه عملکرد:** بررسی کلی فعالیت‌های ماه
+    2. **شاخص‌های کلیدی عملکرد (KPI):**
+       - نرخ تکمیل فعالیت‌ها
+       - زمان پاسخ به رخدادها
+       - پوشش ارزیابی سازمان‌ها
+    3. **اقدامات شاخص:** مهم‌ترین اقدامات انجام شده
+    4. **برنامه ماه آینده:** اولویت‌ها و برنامه‌های پیش رو
+    5. **موانع و محدودیت‌ها:** مشکلات نیازمند رفع
+
+    گزارش باید دقیق، مستند و قابل پیگیری باشد.
+    از آمار و ارقام دقیق استفاده کنید.
+    """,
+        body=f"""
     **دوره گزارش:** {persian_months[current_month-1]} {current_year}
 
     **آمار عملیاتی ماه جاری:**
@@ -154,52 +183,44 @@ async def generate_director_general_report(
     - بالا: {vuln_stats.get('high', 0)}
     - متوسط: {vuln_stats.get('medium', 0)}
     - پایین: {vuln_stats.get('low', 0)}
+    """,
+    )
 
-    **ساختار گزارش:**
-    1. **خلاصه عملکرد:** بررسی کلی فعالیت‌های ماه
-    2. **شاخص‌های کلیدی عملکرد (KPI):**
-       - نرخ تکمیل فعالیت‌ها
-       - زمان پاسخ به رخدادها
-       - پوشش ارزیابی سازمان‌ها
-    3. **اقدامات شاخص:** مهم‌ترین اقدامات انجام شده
-    4. **برنامه ماه آینده:** اولویت‌ها و برنامه‌های پیش رو
-    5. **موانع و محدودیت‌ها:** مشکلات نیازمند رفع
+    return prompt
 
-    گزارش باید دقیق، مستند و قابل پیگیری باشد.
-    از آمار و ارقام دقیق استفاده کنید.
-    """
+@router.post("/director-general", response_model=Report)
+async def generate_director_general_report(
+    model: Optional[str] = None,
+    month: Optional[int] = None,
+    year: Optional[int] = None,
+    sectioned: bool = Query(False, description="تولید موازی بخش‌های گزارش")
+) -> Report:
+    """تولید گزارش ماهانه برای مدیرکل"""
+    prompt = await build_director_general_prompt(month, year)
 
     try:
-        return await report_generator.generate_report(model, prompt)
+        return await report_cache.generate(model, prompt, report_type="executive.director-general", params={"month": month, "year": year}, sectioned=sectioned)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.post("/center-director", response_model=Report)
-async def generate_center_director_report(
-    model: str = "phi3:mini"
-) -> Report:
-    """تولید گزارش جامع برای رئیس مرکز"""
+@timed("prompt")
+@tracks_sources
+async def build_center_director_prompt() -> ReportPrompt:
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get comprehensive data
-            stats_response = await client.get(f"{BACKEND_BASE_URL}/dashboard/stats")
-            stats_response.raise_for_status()
-            stats = DashboardStats(**stats_response.json())
-
-            # Get all processes status
-            process_response = await client.get(f"{BACKEND_BASE_URL}/processes")
-            process_response.raise_for_status()
-            processes = process_response.json()
-
-            # Get recent activities
-            activity_response = await client.get(f"{BACKEND_BASE_URL}/activities/recent?limit=10")
-            activity_response.raise_for_status()
-            recent_activities = activity_response.json()
-
-            # Get organization details
-            org_response = await client.get(f"{BACKEND_BASE_URL}/organizations")
-            org_response.raise_for_status()
-            organizations = org_response.json()
+        # Get comprehensive data
+        stats = DashboardStats(**await backend.get_json("/dashboard/stats"))
+
+        # Get all processes status
+        processes = await backend.get_json("/processes")
+
+        # Get recent activities
+        recent_activities = await backend.get_json("/activities/recent?limit=10")
+
+        # Get organization details
+        if await replica.is_fresh("organizations"):
+            organizations = await replica.query("organizations")
+        else:
+            organizations = await backend.get_json("/organizations")
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
@@ -211,32 +232,10 @@ async def generate_center_director_report(
     for proc in processes[:10]:
         process_summary[proc.get('typePersianName', proc.get('name', 'نامشخص'))] = proc.get('totalActivities', 0)
 
-    prompt = f"""
+    prompt = ReportPrompt(
+        preamble="""
     شما رئیس مرکز امنیت سایبری استان هستید. یک گزارش جامع و کامل از وضعیت فعلی و اقدامات در دست انجام تهیه کنید.
 
-    **تاریخ گزارش:** {datetime.now().strftime('%Y/%m/%d')}
-
-    **وضعیت کلی مرکز:**
-    - سازمان‌های تحت پوشش: {stats.totalOrganizations}
-    - کل فعالیت‌های ثبت شده: {stats.totalActivities}
-    - فعالیت‌های تکمیل شده: {stats.completedActivities}
-    - فعالیت‌های در حال انجام: {stats.pendingActivities}
-
-    **وضعیت فرآیندهای 10‌گانه:**
-    {chr(10).join([f"- {name}: {count} فعالیت" for name, count in process_summary.items()])}
-
-    **آسیب‌پذیری‌ها و رخدادها:**
-    - کل آسیب‌پذیری‌ها: {stats.totalVulnerabilities}
-    - آسیب‌پذیری‌های بحرانی رفع نشده: {stats.criticalVulnerabilities}
-    - رخدادهای جاری: {stats.totalIncidents}
-
-    **سازمان‌های دارای اولویت:**
-    - تعداد سازمان‌های IT: {len([o for o in organizations if o.get('infrastructureType') == 'IT'])}
-    - تعداد سازمان‌های OT: {len([o for o in organizations if o.get('infrastructureType') == 'OT'])}
-    - تعداد سازمان‌های Hybrid: {len([o for o in organizations if o.get('infrastructureType') == 'Hybrid'])}
-
-    **فعالیت‌های اخیر:** {len(recent_activities)} فعالیت در هفته گذشته
-
     **ساختار گزارش مورد نیاز:**
 
     1. **وضعیت عملیاتی مرکز:**
@@ -278,9 +277,143 @@ async def generate_center_director_report(
     گزارش باید بسیار دقیق، جامع و عملیاتی باشد.
     تمام جزئیات مهم را پوشش دهید.
     از جداول و لیست‌ها برای وضوح بیشتر استفاده کنید.
-    """
+    """,
+        body=f"""
+    **تاریخ گزارش:** {datetime.now().strftime('%Y/%m/%d')}
+
+    **وضعیت کلی مرکز:**
+    - سازمان‌های تحت پوشش: {stats.totalOrganizations}
+    - کل فعالیت‌های ثبت شده: {stats.totalActivities}
+    - فعالیت‌های تکمیل شده: {stats.completedActivities}
+    - فعالیت‌های در حال انجام: {stats.pendingActivities}
+
+    **وضعیت فرآیندهای 10‌گانه:**
+    {chr(10).join([f"- {name}: {count} فعالیت" for name, count in process_summary.items()])}
+
+    **آسیب‌پذیری‌ها و رخدادها:**
+    - کل آسیب‌پذیری‌ها: {stats.totalVulnerabilities}
+    - آسیب‌پذیری‌های بحرانی رفع نشده: {stats.criticalVulnerabilities}
+    - رخدادهای جاری: {stats.totalIncidents}
+
+    **سازمان‌های دارای اولویت:**
+    - تعداد سازمان‌های IT: {len([o for o in organizations if o.get('infrastructureType') == 'IT'])}
+    - تعداد سازمان‌های OT: {len([o for o in organizations if o.get('infrastructureType') == 'OT'])}
+    - تعداد سازمان‌های Hybrid: {len([o for o in organizations if o.get('infrastructureType') == 'Hybrid'])}
+
+    **فعالیت‌های اخیر:** {len(recent_activities)} فعالیت در هفته گذشته
+    """,
+    )
+
+    return prompt
+
+@router.post("/center-director", response_model=Report)
+async def generate_center_director_report(
+    model: Optional[str] = None,
+    sectioned: bool = Query(False, description="تولید موازی بخش‌های گزارش")
+) -> Report:
+    """تولید گزارش جامع برای رئیس مرکز"""
+    prompt = await build_center_director_prompt()
 
     try:
-        return await report_generator.generate_report(model, prompt)
+        return await report_cache.generate(model, prompt, report_type="executive.center-director", params={}, sectioned=sectioned)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Executive Bundle ---
+# Union of the backend data the three executive prompts need
+EXECUTIVE_DATA_PATHS = (
+    "/dashboard/stats",
+    "/organizations/stats",
+    "/reports/monthly-summary",
+    "/activities/user-stats",
+    "/vulnerabilities/stats",
+    "/processes",
+    "/activities/recent?limit=10",
+)
+
+async def build_executive_prompts(
+    quarter: Optional[int] = None,
+    month: Optional[int] = None,
+    year: Optional[int] = None
+) -> dict:
+    """
+    Build the three executive prompts from one concurrent fetch of their
+    combined data; shared resources such as /dashboard/stats are fetched once.
+    """
+    paths = list(EXECUTIVE_DATA_PATHS)
+    # The center-director prompt reads organizations from the replica when it is fresh
+    if not await replica.is_fresh("organizations"):
+        paths.append("/organizations")
+    with backend.shared_fetches():
+        # Failures surface (as 503/500) in the builders that need the data
+        await asyncio.gather(*(backend.get_json(path) for path in paths), return_exceptions=True)
+        governor, director_general, center_director = await asyncio.gather(
+            build_governor_prompt(quarter, year),
+            build_director_general_prompt(month, year),
+            build_center_director_prompt(),
+        )
+    return {
+        "executive.governor": governor,
+        "executive.director-general": director_general,
+        "executive.center-director": center_director,
+    }
+
+@router.post("/bundle", response_model=ExecutiveBundle)
+async def generate_executive_bundle(
+    model: Optional[str] = None,
+    quarter: Optional[int] = None,
+    month: Optional[int] = None,
+    year: Optional[int] = None,
+    sectioned: bool = Query(False, description="تولید موازی بخش‌های گزارش"),
+    stream: bool = Query(False, description="ارسال هر گزارش به محض آماده شدن (NDJSON)")
+):
+    """تولید همزمان بسته گزارش‌های مدیریتی (استاندار، مدیرکل و رئیس مرکز)"""
+    started = time.monotonic()
+    prompts = await build_executive_prompts(quarter, month, year)
+    params = {
+        "executive.governor": {"quarter": quarter, "year": year},
+        "executive.director-general": {"month": month, "year": year},
+        "executive.center-director": {},
+    }
+
+    async def generate(report_type: str, prompt: ReportPrompt):
+        try:
+            return report_type, await report_cache.generate(
+                model, prompt, report_type=report_type, params=params[report_type], sectioned=sectioned
+            ), None
+        except Exception as e:
+            return report_type, None, e
+
+    def start() -> list:
+        # All three go to the scheduler at once and share its concurrency limit
+        return [asyncio.ensure_future(generate(report_type, prompt)) for report_type, prompt in prompts.items()]
+
+    if stream:
+        async def events():
+            # Started only once the response is streamed, so a client gone before then leaves nothing running
+            tasks = start()
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    report_type, report, error = await next_done
+                    event = {"report_type": report_type}
+                    if error is None:
+                        event["report"] = report.model_dump(mode="json")
+                    else:
+                        event["error"] = str(error)
+                    yield json.dumps(event, ensure_ascii=False) + "\n"
+            finally:
+                for task in tasks:
+                    task.cancel()
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    reports = {}
+    for report_type, report, error in await asyncio.gather(*start()):
+        if error is not None:
+            raise HTTPException(status_code=500, detail=f"{report_type}: {error}")
+        reports[report_type] = report
+    return ExecutiveBundle(
+        governor=reports["executive.governor"],
+        director_general=reports["executive.director-general"],
+        center_director=reports["executive.center-director"],
+        wall_seconds=round(time.monotonic() - started, 3),
+    )
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, HTTPException, Query, Response
+from app.services.exporter import EXPORT_MEDIA_TYPES, ExportUnavailable, export_service
+from app.services.report_store import report_store
+
+# --- Router Definition ---
+router = APIRouter(
+    prefix="/reports",
+    tags=["Report Exports"]
+)
+
+@router.get("/{report_id}/export")
+async def export_report(
+    report_id: str,
+    format: str = Query("pdf", pattern="^(pdf|docx|html)$", description="قالب خروجی")
+) -> Response:
+    """دریافت نسخه قابل چاپ گزارش (PDF، DOCX یا HTML)"""
+    report = await report_store.get(report_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Report {report_id} not found")
+
+    generated_at = report.generated_at.strftime("%Y/%m/%d %H:%M") if report.generated_at else ""
+    subtitle = f"{generated_at} — {report.model_used}"
+    try:
+        data = await export_service.export(format, report.title, subtitle, report.content)
+    except ExportUnavailable as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {e}")
+
+    return Response(
+        content=data,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="report-{report_id}.{format}"'},
+    )
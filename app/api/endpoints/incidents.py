@@ -1,7 +1,15 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.services.report_generator import ReportGenerator
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.api.dependencies import require_known_model
+from app.services.report_cache import report_cache
+from app.services.backend_client import backend
+from app.services.replica import replica
+from app.services.timing import timed
+from app.services.sources import tracks_sources
 from app.models.report import Report
-from typing import List, Optional
+from app.services.prompts import ReportPrompt
+from app.services.analytics import TimelineStats
+from app.services.records import RecordColumns, RecordSpec
+from typing import Optional
 from pydantic import BaseModel
 import httpx
 
@@ -20,31 +28,36 @@ class Incident(BaseModel):
     organizationName: str
     detectionDate: Optional[str] = None
 
+# Incident fields whose distribution is summarised for the prompt
+INCIDENT_CATEGORIES = ("severity", "status", "organizationName")
+INCIDENT_SPEC = RecordSpec.from_model(Incident, categories=INCIDENT_CATEGORIES)
+
 # --- Router Definition ---
 router = APIRouter(
     prefix="/incidents",
-    tags=["Incidents Report"]
+    tags=["Incidents Report"],
+    dependencies=[Depends(require_known_model)]
 )
-report_generator = ReportGenerator()
-BACKEND_BASE_URL = "http://192.168.1.50:8080/api"
 
-@router.post("/report", response_model=Report)
-async def generate_incident_report(
-    model: str = "phi3:mini",
-    limit: int = Query(5, description="تعداد رخدادهای مهم برای نمایش در گزارش")
-) -> Report:
-    """تولید گزارش تحلیلی از رخدادهای امنیتی"""
+async def fetch_critical_incidents() -> RecordColumns:
+    """Critical incidents, from the local replica when it is fresh."""
+    if await replica.is_fresh("incidents"):
+        return await replica.query_columns("incidents", INCIDENT_SPEC, match={"severity": "CRITICAL"})
+    return await backend.get_columns("/incidents/critical", INCIDENT_SPEC)
+
+@timed("prompt")
+@tracks_sources
+async def build_incident_prompt(
+    limit: int = 5
+) -> ReportPrompt:
     # ... (کد کامل این تابع که قبلاً نوشته شده بود)
     try:
-        async with httpx.AsyncClient() as client:
-            stats_response = await client.get(f"{BACKEND_BASE_URL}/incidents/stats")
-            stats_response.raise_for_status()
-            stats = IncidentStats(**stats_response.json())
+        stats = IncidentStats(**await backend.get_json("/incidents/stats"))
 
-            incidents_response = await client.get(f"{BACKEND_BASE_URL}/incidents/critical")
-            incidents_response.raise_for_status()
-            incidents_data = incidents_response.json()
-            incidents = [Incident(**inc) for inc in incidents_data[:limit]]
+        critical = await fetch_critical_incidents()
+        incidents = critical.head(limit)
+        trends = TimelineStats("detectionDate", group_fields=INCIDENT_CATEGORIES)
+        trends.add_columns(critical.columns)
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
@@ -55,25 +68,42 @@ async def generate_incident_report(
     for i, incident in enumerate(incidents):
         incident_details += (f"- **رخداد {i+1}:**\n  - **عنوان:** {incident.title}\n  - **شدت:** {incident.severity}\n  - **وضعیت:** {incident.status}\n  - **سازمان:** {incident.organizationName}\n  - **تاریخ شناسایی:** {incident.detectionDate or 'نامشخص'}\n\n")
 
-    prompt = f"""
+    prompt = ReportPrompt(
+        preamble="""
     شما یک تحلیلگر ارشد امنیت سایبری هستید. بر اساس داده‌های زیر، یک گزارش مدیریتی جامع در مورد وضعیت رخدادهای امنیتی به زبان فارسی تهیه کنید:
+
+    **تحلیل و پیشنهادات:**
+    گزارش شما باید شامل موارد زیر باشد:
+    1.  **خلاصه اجرایی:** وضعیت کلی رخدادها در یک پاراگراف.
+    2.  **تحلیل روندها:** آیا روند خاصی در نوع یا شدت رخدادها مشاهده می‌شود؟
+    3.  **ریسک‌های اصلی:** مهم‌ترین ریسک‌هایی که سازمان با آن مواجه است کدامند؟
+    4.  **پیشنهادات کلیدی:** چه اقداماتی برای بهبود وضعیت پیشنهاد می‌کنید؟ (اولویت‌بندی شده)
+    """,
+        body=f"""
     **آمار کلی رخدادها:**
     - کل رخدادها: {stats.totalIncidents}
     - رخدادهای بحرانی: {stats.criticalIncidents}
     - رخدادهای با شدت بالا: {stats.highSeverityIncidents}
     - رخدادهای در حال بررسی: {stats.investigatingIncidents}
     - میانگین زمان رفع رخدادها (ساعت): {stats.averageResolutionTime:.2f}
+    **توزیع و روند رخدادهای بحرانی:**
+    {trends.prompt_text("رخداد")}
     **جزئیات رخدادهای بحرانی اخیر:**
     {incident_details if incident_details else "موردی یافت نشد."}
-    **تحلیل و پیشنهادات:**
-    گزارش شما باید شامل موارد زیر باشد:
-    1.  **خلاصه اجرایی:** وضعیت کلی رخدادها در یک پاراگراف.
-    2.  **تحلیل روندها:** آیا روند خاصی در نوع یا شدت رخدادها مشاهده می‌شود؟
-    3.  **ریسک‌های اصلی:** مهم‌ترین ریسک‌هایی که سازمان با آن مواجه است کدامند؟
-    4.  **پیشنهادات کلیدی:** چه اقداماتی برای بهبود وضعیت پیشنهاد می‌کنید؟ (اولویت‌بندی شده)
-    """
+    """,
+    )
     
+    return prompt
+
+@router.post("/report", response_model=Report)
+async def generate_incident_report(
+    model: Optional[str] = None,
+    limit: int = Query(5, description="تعداد رخدادهای مهم برای نمایش در گزارش")
+) -> Report:
+    """تولید گزارش تحلیلی از رخدادهای امنیتی"""
+    prompt = await build_incident_prompt(limit)
+
     try:
-        return await report_generator.generate_report(model, prompt)
+        return await report_cache.generate(model, prompt, report_type="incidents.report", params={"limit": limit})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
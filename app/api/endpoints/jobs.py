@@ -0,0 +1,75 @@
+from fastapi import APIRouter, HTTPException, Response
+from pydantic import BaseModel
+from typing import Any, Dict, Optional
+
+from app.api.dependencies import check_model
+from app.api.reports import REPORT_BUILDERS, build_prompt
+from app.models.report import Report
+from app.services.eta import eta_predictor
+from app.services.generation_profiles import profile_for
+from app.services.jobs import JobQueueFull, job_queue
+from app.services.model_policy import model_policy
+from app.services.report_cache import report_cache
+from app.services.scheduler import Priority
+
+# --- Router Definition ---
+router = APIRouter(
+    prefix="/jobs",
+    tags=["Report Jobs"]
+)
+
+class JobRequest(BaseModel):
+    report_type: str
+    params: Dict[str, Any] = {}
+    model: Optional[str] = None
+    sectioned: bool = False
+
+def _eta_header(response: Response, eta: Optional[Dict[str, Any]]) -> None:
+    if eta is not None:
+        response.headers["X-Report-ETA"] = str(eta["eta_seconds"])
+
+@router.post("", status_code=202)
+async def submit_job(request: JobRequest, response: Response) -> Dict[str, Any]:
+    """ثبت درخواست تولید گزارش در پس‌زمینه و دریافت زمان تخمینی تکمیل آن"""
+    if request.report_type not in REPORT_BUILDERS:
+        raise HTTPException(status_code=404, detail=f"Unknown report type: {request.report_type}")
+    check_model(request.model)
+
+    async def run() -> Report:
+        prompt = await build_prompt(request.report_type, request.params)
+        return await report_cache.generate(
+            request.model, prompt, request.report_type, request.params, sectioned=request.sectioned
+        )
+
+    estimate = eta_predictor.predict(
+        request.report_type,
+        model_policy.select(request.report_type, request.model).model,
+        profile_for(request.report_type),
+        Priority.BATCH,
+    )
+    try:
+        job = job_queue.submit(request.report_type, request.model, request.params, run, estimate)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    body = job.to_dict()
+    _eta_header(response, body["eta"])
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return body
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, response: Response) -> Dict[str, Any]:
+    """وضعیت، زمان تخمینی تکمیل و نتیجه یک درخواست پس‌زمینه"""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    body = job.to_dict()
+    _eta_header(response, body["eta"])
+    return body
+
+@router.delete("/{job_id}")
+async def cancel_job(job_id: str) -> Dict[str, Any]:
+    """لغو یک درخواست پس‌زمینه"""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {"id": job.id, "status": job.status if job.done else "cancelling"}
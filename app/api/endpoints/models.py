@@ -1,23 +1,56 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from app.api.dependencies import check_model
+from app.services.eta import eta_predictor
+from app.services.model_catalog import model_catalog
 from app.services.report_generator import ReportGenerator
 from app.models.report import Report
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
+from pydantic import BaseModel
+import asyncio
 import httpx
+import json
+import os
+import time
 
 router = APIRouter(
     tags=["Ollama Models"]
 )
 report_generator = ReportGenerator()
 
+# Generations of one batch in flight at once (each still waits for a scheduler slot)
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "4"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+
+class BatchItem(BaseModel):
+    prompt: str
+    model: Optional[str] = None
+    id: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    items: List[Union[str, BatchItem]]
+    model: Optional[str] = None
+
 @router.get("/models", response_model=Dict[str, Any])
 async def list_models() -> Dict[str, Any]:
     """
-    List available Ollama models.
+    List available Ollama models (from the catalog refreshed in the background).
     """
     try:
-        return await report_generator.ollama_client.list_models()
+        return await model_catalog.listing()
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=503, detail=f"Ollama service unavailable: {str(e)}")
+
+@router.get("/models/capacity", response_model=Dict[str, Any])
+async def model_capacity() -> Dict[str, Any]:
+    """
+    Sustainable reports per minute of each model on the current Ollama
+    fleet, learned from the generations served so far.
+    """
+    return {
+        "instances": len(report_generator.ollama_client.instances),
+        **eta_predictor.capacity(),
+    }
 
 @router.post("/generate", response_model=Report)
 async def generate_report(model: str, prompt: str) -> Report:
@@ -26,10 +59,84 @@ async def generate_report(model: str, prompt: str) -> Report:
     """
     if not model or not prompt:
         raise HTTPException(status_code=400, detail="Model and prompt are required")
-    
+    check_model(model)
+
     try:
         return await report_generator.generate_report(model, prompt)
     except httpx.HTTPError as e:
         raise HTTPException(status_code=503, detail=f"Ollama service unavailable: {str(e)}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/generate/batch")
+async def generate_batch(request: BatchRequest) -> StreamingResponse:
+    """
+    Generate reports for many prompts in one call (NDJSON stream).
+
+    ``items`` are prompts, or objects with ``prompt`` and optionally
+    ``model`` and ``id``; ``model`` is the default for items without one.
+    Items with the same model and prompt are generated once. Up to
+    ``BATCH_MAX_PARALLEL`` generations run at once at batch priority, and
+    one line is streamed per item as soon as it finishes, followed by a
+    ``summary`` line.
+    """
+    if not request.items:
+        raise HTTPException(status_code=400, detail="At least one prompt is required")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_ITEMS} prompts per batch")
+    items = [BatchItem(prompt=item) if isinstance(item, str) else item for item in request.items]
+    if any(not item.prompt for item in items):
+        raise HTTPException(status_code=400, detail="Prompts must not be empty")
+    for model in {item.model or request.model for item in items}:
+        check_model(model)
+
+    started = time.monotonic()
+    semaphore = asyncio.Semaphore(BATCH_MAX_PARALLEL)
+    generations: Dict[tuple, asyncio.Task] = {}
+    timings: Dict[tuple, Dict[str, float]] = {}
+
+    async def generate(key: tuple) -> Report:
+        async with semaphore:
+            timing = timings[key] = {"started_at": round(time.monotonic() - started, 3)}
+            try:
+                return await report_generator.generate_report(key[0], key[1], report_type="generate.batch")
+            finally:
+                timing["seconds"] = round(time.monotonic() - started - timing["started_at"], 3)
+
+    async def run_item(index: int, item: BatchItem) -> Dict[str, Any]:
+        model = item.model or request.model
+        key = (model, item.prompt)
+        deduplicated = key in generations
+        if not deduplicated:
+            generations[key] = asyncio.ensure_future(generate(key))
+        result: Dict[str, Any] = {"index": index, "id": item.id, "model": model, "deduplicated": deduplicated}
+        try:
+            report = await asyncio.shield(generations[key])
+            result.update(status="ok", report=report.model_dump(mode="json"))
+        except Exception as e:
+            result.update(status="error", error=str(e) or type(e).__name__)
+        result.update(timings.get(key, {}), finished_at=round(time.monotonic() - started, 3))
+        return result
+
+    async def events():
+        # Started only once the response is streamed, so a client gone before then leaves nothing running
+        tasks = [asyncio.ensure_future(run_item(index, item)) for index, item in enumerate(items)]
+        succeeded = 0
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                succeeded += result["status"] == "ok"
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+            yield json.dumps({"summary": {
+                "items": len(items),
+                "generated": len(generations),
+                "succeeded": succeeded,
+                "failed": len(items) - succeeded,
+                "wall_seconds": round(time.monotonic() - started, 3),
+            }}) + "\n"
+        finally:
+            # The client went away (or we are done): stop what is still queued
+            for task in [*tasks, *generations.values()]:
+                task.cancel()
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
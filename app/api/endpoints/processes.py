@@ -1,6 +1,14 @@
-from fastapi import APIRouter, HTTPException, Query, Path
-from app.services.report_generator import ReportGenerator
+from fastapi import APIRouter, Depends, HTTPException, Query, Path
+from app.api.dependencies import require_known_model
+from app.services.report_cache import report_cache
+from app.services.backend_client import backend
+from app.services.timing import timed
+from app.services.sources import tracks_sources
+from app.services.analytics import TimelineStats
+from app.services.replica import replica
+from app.services.records import RecordSpec
 from app.models.report import Report
+from app.services.prompts import ReportPrompt
 from typing import Optional, List
 from pydantic import BaseModel
 import httpx
@@ -38,6 +46,13 @@ class ProcessActivity(BaseModel):
     createdDate: Optional[str] = None
     completedDate: Optional[str] = None
 
+# The activity fields TimelineStats reads, decoded column by column
+ACTIVITY_SPEC = RecordSpec.from_model(
+    ProcessActivity,
+    fields=("status", "organizationName", "createdDate", "completedDate"),
+    categories=("status", "organizationName"),
+)
+
 class ProcessStats(BaseModel):
     processName: str
     totalActivities: int = 0
@@ -48,10 +63,9 @@ class ProcessStats(BaseModel):
 # --- Router Definition ---
 router = APIRouter(
     prefix="/processes",
-    tags=["Process Reports"]
+    tags=["Process Reports"],
+    dependencies=[Depends(require_known_model)]
 )
-report_generator = ReportGenerator()
-BACKEND_BASE_URL = "http://192.168.1.50:8080/api"
 
 # --- Helper Functions ---
 def get_process_persian_name(process_type: ProcessType) -> str:
@@ -77,38 +91,40 @@ def get_process_persian_name(process_type: ProcessType) -> str:
     }
     return mapping.get(process_type, process_type.value)
 
+async def analyze_activities(process: str, days: Optional[int] = None) -> TimelineStats:
+    """
+    Aggregate a process's activities, from the local replica when it is
+    fresh, otherwise page by page from the backend.
+    """
+    stats = TimelineStats("createdDate", "completedDate", days=days)
+    if await replica.is_fresh("activities"):
+        since = str(stats.window_start) if stats.window_start is not None else None
+        stats.add_columns((await replica.query_columns("activities", ACTIVITY_SPEC, process_type=process, since=since)).columns)
+        return stats
+    async for page in backend.iter_page_columns(f"/activities/by-process/{process}", ACTIVITY_SPEC):
+        stats.add_columns(page.columns)
+    return stats
+
 # --- SOC Monitoring Report ---
-@router.post("/soc-monitoring", response_model=Report)
-async def generate_soc_monitoring_report(
-    model: str = "phi3:mini",
-    days: int = Query(7, description="تعداد روزهای گذشته برای تحلیل")
-) -> Report:
-    """تولید گزارش پایش و تحلیل تهدیدات SOC"""
+@timed("prompt")
+@tracks_sources
+async def build_soc_monitoring_prompt(
+    days: int = 7
+) -> ReportPrompt:
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get SOC monitoring data
-            response = await client.get(f"{BACKEND_BASE_URL}/activities/by-process/THREAT_MONITORING")
-            response.raise_for_status()
-            activities = response.json()
+        # Get SOC monitoring data
+        activity_stats = await analyze_activities("THREAT_MONITORING", days)
 
-            # Get incident stats
-            inc_response = await client.get(f"{BACKEND_BASE_URL}/incidents/stats")
-            inc_response.raise_for_status()
-            incident_stats = inc_response.json()
+        # Get incident stats
+        incident_stats = await backend.get_json("/incidents/stats")
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
 
-    prompt = f"""
+    prompt = ReportPrompt(
+        preamble="""
     شما تحلیلگر ارشد مرکز عملیات امنیت (SOC) هستید. گزارش جامع پایش و تحلیل تهدیدات را تهیه کنید.
 
-    **دوره گزارش:** {days} روز گذشته
-
-    **آمار پایش:**
-    - تعداد کل هشدارهای دریافتی: {len(activities)}
-    - رخدادهای شناسایی شده: {incident_stats.get('totalIncidents', 0)}
-    - رخدادهای بحرانی: {incident_stats.get('criticalIncidents', 0)}
-
     **ساختار گزارش:**
 
     1. **خلاصه وضعیت SOC:**
@@ -144,35 +160,51 @@ async def generate_soc_monitoring_report(
 
     از داده‌های واقعی و آمار دقیق استفاده کنید.
     بر تهدیدات فعال و در حال ظهور تمرکز کنید.
-    """
+    """,
+        body=f"""
+    **دوره گزارش:** {days} روز گذشته
+
+    **آمار پایش:**
+    {activity_stats.prompt_text("هشدار", "زمان رسیدگی")}
+    - رخدادهای شناسایی شده: {incident_stats.get('totalIncidents', 0)}
+    - رخدادهای بحرانی: {incident_stats.get('criticalIncidents', 0)}
+    - میانگین زمان رفع رخدادها (ساعت): {incident_stats.get('averageResolutionTime', 0)}
+    """,
+    )
+
+    return prompt
+
+@router.post("/soc-monitoring", response_model=Report)
+async def generate_soc_monitoring_report(
+    model: Optional[str] = None,
+    days: int = Query(7, description="تعداد روزهای گذشته برای تحلیل"),
+    sectioned: bool = Query(False, description="تولید موازی بخش‌های گزارش")
+) -> Report:
+    """تولید گزارش پایش و تحلیل تهدیدات SOC"""
+    prompt = await build_soc_monitoring_prompt(days)
 
     try:
-        return await report_generator.generate_report(model, prompt)
+        return await report_cache.generate(model, prompt, report_type="processes.soc-monitoring", params={"days": days}, sectioned=sectioned)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Forensics Report ---
-@router.post("/forensics", response_model=Report)
-async def generate_forensics_report(
-    model: str = "phi3:mini",
+@timed("prompt")
+@tracks_sources
+async def build_forensics_prompt(
     case_id: Optional[int] = None
-) -> Report:
-    """تولید گزارش تحلیل فارنزیک"""
+) -> ReportPrompt:
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get forensics activities
-            response = await client.get(f"{BACKEND_BASE_URL}/activities/by-process/FORENSICS")
-            response.raise_for_status()
-            forensics_activities = response.json()
+        # Get forensics activities
+        forensics_stats = await analyze_activities("FORENSICS")
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
 
-    prompt = f"""
+    prompt = ReportPrompt(
+        preamble="""
     شما کارشناس ارشد فارنزیک دیجیتال هستید. گزارش تحلیل فارنزیک را تهیه کنید.
 
-    **تعداد پرونده‌های فارنزیک:** {len(forensics_activities)}
-
     **ساختار گزارش فارنزیک:**
 
     1. **خلاصه اجرایی:**
@@ -212,40 +244,49 @@ async def generate_forensics_report(
        - شواهد قابل استناد
 
     گزارش باید دقیق، فنی و قابل استناد در مراجع قانونی باشد.
-    """
+    """,
+        body=f"""
+    **آمار پرونده‌های فارنزیک:**
+    {forensics_stats.prompt_text("پرونده", "زمان بررسی")}
+    """,
+    )
+
+    return prompt
+
+@router.post("/forensics", response_model=Report)
+async def generate_forensics_report(
+    model: Optional[str] = None,
+    case_id: Optional[int] = None,
+    sectioned: bool = Query(False, description="تولید موازی بخش‌های گزارش")
+) -> Report:
+    """تولید گزارش تحلیل فارنزیک"""
+    prompt = await build_forensics_prompt(case_id)
 
     try:
-        return await report_generator.generate_report(model, prompt)
+        return await report_cache.generate(model, prompt, report_type="processes.forensics", params={"case_id": case_id}, sectioned=sectioned)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Threat Hunting Report ---
-@router.post("/threat-hunting", response_model=Report)
-async def generate_threat_hunting_report(
-    model: str = "phi3:mini",
+@timed("prompt")
+@tracks_sources
+async def build_threat_hunting_prompt(
     focus_area: Optional[str] = None
-) -> Report:
-    """تولید گزارش شکار تهدید"""
+) -> ReportPrompt:
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get threat hunting activities
-            response = await client.get(f"{BACKEND_BASE_URL}/activities/by-process/THREAT_HUNTING")
-            response.raise_for_status()
-            hunting_activities = response.json()
+        # Get threat hunting activities
+        hunting_stats = await analyze_activities("THREAT_HUNTING")
 
-            # Get vulnerability data for correlation
-            vuln_response = await client.get(f"{BACKEND_BASE_URL}/vulnerabilities/stats")
-            vuln_response.raise_for_status()
-            vuln_stats = vuln_response.json()
+        # Get vulnerability data for correlation
+        vuln_stats = await backend.get_json("/vulnerabilities/stats")
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
 
-    prompt = f"""
+    prompt = ReportPrompt(
+        preamble="""
     شما متخصص شکار تهدید پیشرفته هستید. گزارش جامع شکار تهدید را تهیه کنید.
 
-    **فعالیت‌های شکار تهدید:** {len(hunting_activities)} عملیات
-
     **ساختار گزارش شکار تهدید:**
 
     1. **خلاصه عملیات شکار:**
@@ -278,7 +319,7 @@ async def generate_threat_hunting_report(
        - Network signatures
 
     6. **همبستگی با آسیب‌پذیری‌ها:**
-       - آسیب‌پذیری‌های بحرانی: {vuln_stats.get('critical', 0)}
+       - آسیب‌پذیری‌های بحرانی
        - احتمال بهره‌برداری
        - اولویت‌بندی رفع
 
@@ -295,42 +336,53 @@ async def generate_threat_hunting_report(
 
     گزارش باید proactive، عملیاتی و مبتنی بر intelligence باشد.
     از مثال‌های واقعی و use case های عملی استفاده کنید.
-    """
+    """,
+        body=f"""
+    **آمار عملیات‌های شکار تهدید:**
+    {hunting_stats.prompt_text("عملیات", "مدت عملیات")}
+    **آسیب‌پذیری‌های بحرانی:** {vuln_stats.get('critical', 0)}
+    """,
+    )
+
+    return prompt
+
+@router.post("/threat-hunting", response_model=Report)
+async def generate_threat_hunting_report(
+    model: Optional[str] = None,
+    focus_area: Optional[str] = None,
+    sectioned: bool = Query(False, description="تولید موازی بخش‌های گزارش")
+) -> Report:
+    """تولید گزارش شکار تهدید"""
+    prompt = await build_threat_hunting_prompt(focus_area)
 
     try:
-        return await report_generator.generate_report(model, prompt)
+        return await report_cache.generate(model, prompt, report_type="processes.threat-hunting", params={"focus_area": focus_area}, sectioned=sectioned)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Training Report ---
-@router.post("/training", response_model=Report)
-async def generate_training_report(
-    model: str = "phi3:mini",
+@timed("prompt")
+@tracks_sources
+async def build_training_prompt(
     period_days: int = 30
-) -> Report:
-    """تولید گزارش آموزش امنیت سایبری"""
+) -> ReportPrompt:
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get training activities
-            response = await client.get(f"{BACKEND_BASE_URL}/activities/by-process/TRAINING")
-            response.raise_for_status()
-            training_activities = response.json()
+        # Get training activities
+        training_stats = await analyze_activities("TRAINING", period_days)
 
-            # Get organization data
-            org_response = await client.get(f"{BACKEND_BASE_URL}/organizations")
-            org_response.raise_for_status()
-            organizations = org_response.json()
+        # Get organization data
+        if await replica.is_fresh("organizations"):
+            organizations = await replica.query("organizations")
+        else:
+            organizations = await backend.get_json("/organizations")
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
 
-    prompt = f"""
+    prompt = ReportPrompt(
+        preamble="""
     شما مسئول آموزش امنیت سایبری استان هستید. گزارش جامع آموزش‌های انجام شده را تهیه کنید.
 
-    **دوره گزارش:** {period_days} روز گذشته
-    **تعداد دوره‌های برگزار شده:** {len(training_activities)}
-    **سازمان‌های تحت پوشش:** {len(organizations)}
-
     **ساختار گزارش آموزش:**
 
     1. **خلاصه آموزش‌ها:**
@@ -378,38 +430,50 @@ async def generate_training_report(
        - بودجه مورد نیاز
 
     گزارش باید شامل metrics قابل اندازه‌گیری و ROI آموزش باشد.
-    """
+    """,
+        body=f"""
+    **دوره گزارش:** {period_days} روز گذشته
+    **آمار دوره‌های آموزشی:**
+    {training_stats.prompt_text("دوره", "مدت برگزاری")}
+    **سازمان‌های تحت پوشش:** {len(organizations)}
+    """,
+    )
+
+    return prompt
+
+@router.post("/training", response_model=Report)
+async def generate_training_report(
+    model: Optional[str] = None,
+    period_days: int = 30,
+    sectioned: bool = Query(False, description="تولید موازی بخش‌های گزارش")
+) -> Report:
+    """تولید گزارش آموزش امنیت سایبری"""
+    prompt = await build_training_prompt(period_days)
 
     try:
-        return await report_generator.generate_report(model, prompt)
+        return await report_cache.generate(model, prompt, report_type="processes.training", params={"period_days": period_days}, sectioned=sectioned)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Generic Process Report ---
-@router.post("/{process_type}", response_model=Report)
-async def generate_process_report(
-    process_type: ProcessType = Path(..., description="نوع فرآیند"),
-    model: str = "phi3:mini"
-) -> Report:
-    """تولید گزارش برای فرآیندهای مختلف امنیت سایبری"""
+@timed("prompt")
+@tracks_sources
+async def build_process_prompt(
+    process_type: ProcessType
+) -> ReportPrompt:
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # Get process-specific activities
-            response = await client.get(f"{BACKEND_BASE_URL}/activities/by-process/{process_type}")
-            response.raise_for_status()
-            activities = response.json()
+        # Get process-specific activities
+        activity_stats = await analyze_activities(process_type.value)
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
 
     persian_name = get_process_persian_name(process_type)
 
-    prompt = f"""
+    prompt = ReportPrompt(
+        preamble=f"""
     شما کارشناس ارشد فرآیند "{persian_name}" هستید. گزارش جامع این فرآیند را تهیه کنید.
 
-    **نوع فرآیند:** {persian_name}
-    **تعداد فعالیت‌ها:** {len(activities)}
-
     **ساختار گزارش:**
 
     1. **خلاصه اجرایی:**
@@ -450,9 +514,26 @@ async def generate_process_report(
 
     گزارش باید متناسب با ماهیت فرآیند "{persian_name}" تنظیم شود.
     از داده‌های واقعی و قابل پیگیری استفاده کنید.
-    """
+    """,
+        body=f"""
+    **نوع فرآیند:** {persian_name}
+    **آمار فعالیت‌ها:**
+    {activity_stats.prompt_text()}
+    """,
+    )
+
+    return prompt
+
+@router.post("/{process_type}", response_model=Report)
+async def generate_process_report(
+    process_type: ProcessType = Path(..., description="نوع فرآیند"),
+    model: Optional[str] = None,
+    sectioned: bool = Query(False, description="تولید موازی بخش‌های گزارش")
+) -> Report:
+    """تولید گزارش برای فرآیندهای مختلف امنیت سایبری"""
+    prompt = await build_process_prompt(process_type)
 
     try:
-        return await report_generator.generate_report(model, prompt)
+        return await report_cache.generate(model, prompt, report_type="processes.generic", params={"process_type": process_type.value}, sectioned=sectioned)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from typing import Any, Dict
+from app.services.replica import replica
+
+# --- Router Definition ---
+router = APIRouter(
+    prefix="/replica",
+    tags=["Backend Replica"]
+)
+
+@router.get("/freshness")
+async def replica_freshness() -> Dict[str, Any]:
+    """وضعیت به‌روز بودن نسخه محلی داده‌های بک‌اند"""
+    return await replica.freshness()
@@ -0,0 +1,90 @@
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from app.api.dependencies import check_model
+from app.api.reports import UnknownReportType, build_prompt
+from app.services.report_generator import ReportGenerator
+from app.services.request_context import caller_id
+from typing import Any, Dict
+import asyncio
+import contextlib
+
+# --- Router Definition ---
+router = APIRouter(
+    tags=["Report Streaming"]
+)
+report_generator = ReportGenerator()
+
+@router.websocket("/ws/reports")
+async def stream_reports(websocket: WebSocket):
+    """
+    Progressive report delivery over a WebSocket.
+
+    Client messages:
+    - ``{"action": "generate", "id": "...", "report_type": "executive.governor",
+      "model": null, "params": {...}, "tokens": true}``
+    - ``{"action": "cancel", "id": "..."}``
+
+    Every server message carries the ``id`` of its generation and an
+    ``event``: ``started``, ``token``, ``section``, ``report``, ``error`` or
+    ``cancelled``. Several generations may run on one socket at once.
+    """
+    await websocket.accept()
+    caller_id.set(websocket.headers.get("X-Client-Id") or (websocket.client.host if websocket.client else "anonymous"))
+    send_lock = asyncio.Lock()
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def send(message: Dict[str, Any]) -> None:
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def run(request_id: str, request: Dict[str, Any]) -> None:
+        report_type = request.get("report_type", "")
+        try:
+            check_model(request.get("model"))
+            prompt = await build_prompt(report_type, request.get("params") or {})
+            await send({"id": request_id, "event": "started", "report_type": report_type})
+            async for event in report_generator.stream_report(request.get("model"), prompt, report_type=report_type):
+                if event["event"] == "token" and not request.get("tokens", True):
+                    continue
+                if event["event"] == "report":
+                    event = {"event": "report", "report": event["report"].model_dump(mode="json")}
+                await send({"id": request_id, **event})
+        except asyncio.CancelledError:
+            with contextlib.suppress(Exception):
+                await send({"id": request_id, "event": "cancelled"})
+            raise
+        except UnknownReportType:
+            await send({"id": request_id, "event": "error", "status_code": 404, "detail": f"Unknown report type: {report_type}"})
+        except HTTPException as e:
+            await send({"id": request_id, "event": "error", "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            await send({"id": request_id, "event": "error", "status_code": 500, "detail": str(e)})
+        finally:
+            tasks.pop(request_id, None)
+
+    try:
+        while True:
+            try:
+                message = await websocket.receive_json()
+                if not isinstance(message, dict):
+                    raise TypeError("Messages must be JSON objects")
+                request_id = str(message.get("id", ""))
+                action = message.get("action", "generate")
+            except (ValueError, KeyError, TypeError) as e:
+                # A malformed message must not take the other generations down with it
+                await send({"id": None, "event": "error", "status_code": 400, "detail": f"Invalid message: {e}"})
+                continue
+            if action == "cancel":
+                if request_id in tasks:
+                    tasks[request_id].cancel()
+            elif action == "generate":
+                if not request_id or request_id in tasks:
+                    await send({"id": request_id, "event": "error", "status_code": 400, "detail": "A unique id is required"})
+                    continue
+                tasks[request_id] = asyncio.create_task(run(request_id, message))
+            else:
+                await send({"id": request_id, "event": "error", "status_code": 400, "detail": f"Unknown action: {action}"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        for task in list(tasks.values()):
+            task.cancel()
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, HTTPException, Query
-from app.services.report_generator import ReportGenerator
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.api.dependencies import require_known_model
+from app.services.report_cache import report_cache
+from app.services.backend_client import backend
+from app.services.replica import replica
+from app.services.timing import timed
+from app.services.sources import tracks_sources
 from app.models.report import Report
-from typing import List, Optional
+from app.services.prompts import ReportPrompt
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 import httpx
 
@@ -22,30 +28,29 @@ class Vulnerability(BaseModel):
 # --- Router Definition ---
 router = APIRouter(
     prefix="/vulnerabilities",
-    tags=["Vulnerabilities Report"]
+    tags=["Vulnerabilities Report"],
+    dependencies=[Depends(require_known_model)]
 )
-report_generator = ReportGenerator()
-BACKEND_BASE_URL = "http://192.168.1.50:8080/api"
 
-@router.post("/report", response_model=Report)
-async def generate_vulnerability_report(
-    model: str = "phi3:mini",
-    limit: int = Query(5, description="تعداد آسیب‌پذیری‌های مهم برای نمایش در گزارش")
-) -> Report:
-    """تولید گزارش تحلیلی از آسیب‌پذیری‌های امنیتی"""
+async def fetch_critical_vulnerabilities() -> List[Dict[str, Any]]:
+    """Critical vulnerabilities, from the local replica when it is fresh."""
+    if await replica.is_fresh("vulnerabilities"):
+        return await replica.query("vulnerabilities", match={"severity": "CRITICAL"})
+    return await backend.get_json("/vulnerabilities/severity/CRITICAL")
+
+@timed("prompt")
+@tracks_sources
+async def build_vulnerability_prompt(
+    limit: int = 5
+) -> ReportPrompt:
 
     try:
-        async with httpx.AsyncClient() as client:
-            # Fetch vulnerability statistics
-            stats_response = await client.get(f"{BACKEND_BASE_URL}/vulnerabilities/stats")
-            stats_response.raise_for_status()
-            stats = VulnerabilityStats(**stats_response.json())
+        # Fetch vulnerability statistics
+        stats = VulnerabilityStats(**await backend.get_json("/vulnerabilities/stats"))
 
-            # Fetch recent critical vulnerabilities
-            vulns_response = await client.get(f"{BACKEND_BASE_URL}/vulnerabilities/severity/CRITICAL")
-            vulns_response.raise_for_status()
-            vulns_data = vulns_response.json()
-            vulnerabilities = [Vulnerability(**vuln) for vuln in vulns_data[:limit]]
+        # Fetch recent critical vulnerabilities
+        vulns_data = await fetch_critical_vulnerabilities()
+        vulnerabilities = [Vulnerability(**vuln) for vuln in vulns_data[:limit]]
 
     except httpx.RequestError as e:
         raise HTTPException(status_code=503, detail=f"Could not connect to backend service: {e}")
@@ -64,9 +69,18 @@ async def generate_vulnerability_report(
             f"  - **تاریخ شناسایی:** {vuln.discoveredDate or 'نامشخص'}\n\n"
         )
     
-    prompt = f"""
+    prompt = ReportPrompt(
+        preamble="""
     شما یک متخصص ارشد امنیت سایبری هستید. لطفاً بر اساس داده‌های زیر، یک گزارش تحلیلی در مورد وضعیت آسیب‌پذیری‌های سازمان به زبان فارسی تهیه کنید:
 
+    **تحلیل و توصیه‌ها:**
+    گزارش شما باید شامل موارد زیر باشد:
+    1.  **وضعیت کلی:** ارزیابی کلی از وضعیت آسیب‌پذیری‌ها.
+    2.  **تحلیل روند:** آیا در نوع یا شدت آسیب‌پذیری‌ها الگوی خاصی وجود دارد؟
+    3.  **حوزه‌های پرخطر:** کدام سیستم‌ها یا سازمان‌ها بیشترین آسیب‌پذیری را دارند؟
+    4.  **توصیه‌های عملی:** چه اقداماتی باید برای مدیریت و رفع این آسیب‌پذیری‌ها انجام شود؟ (با اولویت‌بندی)
+    """,
+        body=f"""
     **آمار کلی آسیب‌پذیری‌ها:**
     - تعداد آسیب‌پذیری‌های بحرانی (Critical): {stats.critical}
     - تعداد آسیب‌پذیری‌های با ریسک بالا (High): {stats.high}
@@ -75,16 +89,20 @@ async def generate_vulnerability_report(
 
     **جزئیات آسیب‌پذیری‌های بحرانی اخیر:**
     {vulnerability_details if vulnerability_details else "موردی یافت نشد."}
+    """,
+    )
 
-    **تحلیل و توصیه‌ها:**
-    گزارش شما باید شامل موارد زیر باشد:
-    1.  **وضعیت کلی:** ارزیابی کلی از وضعیت آسیب‌پذیری‌ها.
-    2.  **تحلیل روند:** آیا در نوع یا شدت آسیب‌پذیری‌ها الگوی خاصی وجود دارد؟
-    3.  **حوزه‌های پرخطر:** کدام سیستم‌ها یا سازمان‌ها بیشترین آسیب‌پذیری را دارند؟
-    4.  **توصیه‌های عملی:** چه اقداماتی باید برای مدیریت و رفع این آسیب‌پذیری‌ها انجام شود؟ (با اولویت‌بندی)
-    """
+    return prompt
+
+@router.post("/report", response_model=Report)
+async def generate_vulnerability_report(
+    model: Optional[str] = None,
+    limit: int = Query(5, description="تعداد آسیب‌پذیری‌های مهم برای نمایش در گزارش")
+) -> Report:
+    """تولید گزارش تحلیلی از آسیب‌پذیری‌های امنیتی"""
+    prompt = await build_vulnerability_prompt(limit)
 
     try:
-        return await report_generator.generate_report(model, prompt)
+        return await report_cache.generate(model, prompt, report_type="vulnerabilities.report", params={"limit": limit})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
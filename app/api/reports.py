@@ -0,0 +1,44 @@
+"""
+Registry of report types that can be generated outside their HTTP endpoints.
+
+Each report type maps to the prompt builder of its router. The builders
+fetch their backend data and return the final prompt, so any caller
+(WebSocket streams, bundles, background jobs) can run a report by name.
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from app.api.endpoints import assessments, executive, incidents, processes, vulnerabilities
+from app.services.prompts import ReportPrompt
+
+
+async def _build_generic_process_prompt(process_type: str) -> ReportPrompt:
+    return await processes.build_process_prompt(processes.ProcessType(process_type))
+
+
+REPORT_BUILDERS: Dict[str, Callable[..., Awaitable[ReportPrompt]]] = {
+    "executive.governor": executive.build_governor_prompt,
+    "executive.director-general": executive.build_director_general_prompt,
+    "executive.center-director": executive.build_center_director_prompt,
+    "processes.soc-monitoring": processes.build_soc_monitoring_prompt,
+    "processes.forensics": processes.build_forensics_prompt,
+    "processes.threat-hunting": processes.build_threat_hunting_prompt,
+    "processes.training": processes.build_training_prompt,
+    "processes.generic": _build_generic_process_prompt,
+    "incidents.report": incidents.build_incident_prompt,
+    "vulnerabilities.report": vulnerabilities.build_vulnerability_prompt,
+    "assessments.report": assessments.build_assessment_prompt,
+}
+
+
+class UnknownReportType(KeyError):
+    pass
+
+
+async def build_prompt(report_type: str, params: Dict[str, Any]) -> ReportPrompt:
+    """
+    Fetch the data for ``report_type`` and build its prompt.
+    """
+    builder = REPORT_BUILDERS.get(report_type)
+    if builder is None:
+        raise UnknownReportType(report_type)
+    return await builder(**params)
@@ -1,10 +1,24 @@
 """
 Main application entry point.
 """
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from app.services.deadline import Deadline, DeadlineExceeded, current_deadline, parse_timeout
+from app.services.eta import request_estimates
+from app.services.request_context import caller_id, priority_override, request_id
+from app.services.timing import RequestTimings, current_timings
+import json
+import logging
+import uuid
 # Import routers from the new endpoint files
-from app.api.endpoints import checklist, incidents, vulnerabilities, models, assessments, executive, processes
+from app.api.endpoints import checklist, incidents, vulnerabilities, models, assessments, executive, processes, stream, exports, admin, jobs, replica as replica_endpoints
+from app.services.exporter import export_service
+from app.services.loop_monitor import loop_monitor
+from app.services.model_catalog import model_catalog
+from app.services.replica import replica
+from app.services.report_cache import report_cache
+from app.api.reports import build_prompt
 
 app = FastAPI(
     title="Ollama Report Generator",
@@ -21,6 +35,96 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# One JSON line per request with its phase timings
+request_logger = logging.getLogger("app.requests")
+if not request_logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    request_logger.addHandler(_handler)
+    request_logger.setLevel(logging.INFO)
+    request_logger.propagate = False
+
+@app.middleware("http")
+async def bind_request_context(request: Request, call_next):
+    """
+    Expose the caller identity, requested priority, request id and deadline
+    (``X-Request-Timeout`` header or ``timeout`` query parameter, in
+    seconds) to the services, and report the phase timings of the request.
+
+    A request whose deadline could not be met gets a 504 with the stage
+    that ran out of time; otherwise ``X-Deadline-Shortened`` lists the
+    stages that were cut short to meet it. ``X-Report-ETA`` carries the
+    completion time predicted when the request's generation was queued.
+    """
+    caller = request.headers.get("X-Client-Id") or (request.client.host if request.client else "anonymous")
+    rid = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    timings = RequestTimings(rid)
+    budget = parse_timeout(request.headers.get("X-Request-Timeout") or request.query_params.get("timeout"))
+    deadline = Deadline(budget) if budget else None
+    estimates = []
+    tokens = [
+        (caller_id, caller_id.set(caller)),
+        (priority_override, priority_override.set(request.headers.get("X-Report-Priority"))),
+        (request_id, request_id.set(rid)),
+        (current_timings, current_timings.set(timings)),
+        (current_deadline, current_deadline.set(deadline)),
+        (request_estimates, request_estimates.set(estimates)),
+    ]
+    status_code = 500
+
+    def log_request() -> None:
+        request_logger.info(json.dumps({
+            "request_id": rid,
+            "method": request.method,
+            "path": request.url.path,
+            "status": status_code,
+            "caller": caller,
+            **timings.to_dict(),
+            "server_timing": timings.server_timing(),
+        }, ensure_ascii=False))
+
+    streamed = False
+    try:
+        response = None
+        try:
+            response = await call_next(request)
+        except DeadlineExceeded:
+            if deadline is None:
+                raise
+        failed = response is None or response.status_code >= 500
+        if deadline is not None and deadline.exceeded is not None and failed:
+            # Endpoints wrap service errors in a 500; report the deadline instead
+            response = JSONResponse(
+                status_code=504,
+                content={"detail": str(deadline.exceeded), "deadline": deadline.to_dict()},
+            )
+        elif deadline is not None and deadline.shortened:
+            response.headers["X-Deadline-Shortened"] = ",".join(deadline.shortened)
+        if estimates and "X-Report-ETA" not in response.headers:
+            response.headers["X-Report-ETA"] = f"{max(e.total_seconds for e in estimates):.1f}"
+        status_code = response.status_code
+        response.headers["Server-Timing"] = timings.server_timing()
+        response.headers["X-Request-ID"] = rid
+        if "content-length" not in response.headers:
+            # A streamed body (batch, bundle) keeps running phases after the
+            # headers are sent; log the complete timings once it is drained
+            response.body_iterator = _logged_when_drained(response.body_iterator, log_request)
+            streamed = True
+        return response
+    finally:
+        if not streamed:
+            log_request()
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+async def _logged_when_drained(body, log_request):
+    try:
+        async for chunk in body:
+            yield chunk
+    finally:
+        log_request()
+
 # A main router to organize all endpoints under a common path like /api
 api_router = APIRouter(prefix="/api")
 
@@ -31,9 +135,39 @@ api_router.include_router(vulnerabilities.router)
 api_router.include_router(assessments.router)
 api_router.include_router(executive.router)
 api_router.include_router(processes.router)
+api_router.include_router(stream.router)
+api_router.include_router(exports.router)
+api_router.include_router(admin.router)
+api_router.include_router(jobs.router)
+api_router.include_router(replica_endpoints.router)
 
 app.include_router(api_router)
 
+# Stop the export worker processes with the server
+app.add_event_handler("shutdown", export_service.shutdown)
+
+# Measure event-loop lag for the lifetime of the server
+app.add_event_handler("startup", loop_monitor.start)
+app.add_event_handler("shutdown", loop_monitor.stop)
+
+# Keep the local backend replica in sync (when REPLICA_ENABLED)
+def start_replica_sync():
+    replica.start(process.value for process in processes.ProcessType)
+
+app.add_event_handler("startup", start_replica_sync)
+app.add_event_handler("shutdown", replica.stop)
+
+# Regenerate cached reports whose backend data changed
+def start_report_watcher():
+    report_cache.start(build_prompt)
+
+app.add_event_handler("startup", start_report_watcher)
+app.add_event_handler("shutdown", report_cache.stop)
+
+# Keep the Ollama model catalog fresh for listing and validation
+app.add_event_handler("startup", model_catalog.start)
+app.add_event_handler("shutdown", model_catalog.stop)
+
 
 if __name__ == "__main__":
     import uvicorn
@@ -9,6 +9,7 @@ class Report(BaseModel):
      
     model_config = ConfigDict(protected_namespaces=())
 
+    id: Optional[str] = None
     title: str
     content: str
     generated_at: Optional[datetime] = None
@@ -0,0 +1,186 @@
+"""
+Vectorized statistics over activity and incident lists for report prompts.
+
+The prompts ask the model for completion rates, resolution times and
+trends; without real figures it invents them. ``TimelineStats`` consumes a
+list page by page, as dicts (``BackendClient.iter_page_lists``) or as
+columns (``BackendClient.iter_page_columns``, see ``records``), keeps only
+the rows inside the reporting window, and aggregates them with
+NumPy: status and organization distributions, start-to-end durations with
+percentiles, and daily and weekly counts. ``prompt_text`` renders the
+result as a few compact Persian lines for the prompt body.
+"""
+from collections import Counter
+from datetime import datetime
+from itertools import compress
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+DONE_STATUSES = ("COMPLETED", "RESOLVED", "CLOSED")
+UNKNOWN = "نامشخص"
+
+_HOUR = np.timedelta64(1, "h")
+
+
+def parse_timestamps(values: Sequence[Any]) -> np.ndarray:
+    """
+    Parse ISO date/time strings to ``datetime64[s]``; missing or malformed
+    values become ``NaT``. Time zone suffixes and fractions are dropped.
+    """
+    cleaned = [value[:19].replace(" ", "T") if isinstance(value, str) and value else "NaT" for value in values]
+    try:
+        return np.array(cleaned, dtype="datetime64[s]")
+    except ValueError:
+        parsed = np.full(len(cleaned), np.datetime64("NaT"), dtype="datetime64[s]")
+        for index, value in enumerate(cleaned):
+            try:
+                parsed[index] = np.datetime64(value, "s")
+            except ValueError:
+                pass
+        return parsed
+
+
+class TimelineStats:
+    def __init__(
+        self,
+        start_field: str,
+        end_field: Optional[str] = None,
+        days: Optional[int] = None,
+        group_fields: Iterable[str] = ("status", "organizationName"),
+        now: Optional[datetime] = None,
+    ):
+        self.start_field = start_field
+        self.end_field = end_field
+        self.days = days
+        self.group_fields = tuple(group_fields)
+        self.today = np.datetime64((now or datetime.now()).date(), "D")
+        # Whole days, today included, so the window lines up with the daily series
+        self.window_start = (self.today - np.timedelta64(days - 1, "D")).astype("datetime64[s]") if days else None
+        self.total = 0
+        self.groups: Dict[str, Counter] = {field: Counter() for field in self.group_fields}
+        self.daily: Counter = Counter()
+        self._durations: List[np.ndarray] = []
+
+    def add(self, items: Sequence[Dict[str, Any]]) -> None:
+        """Aggregate one page of items."""
+        if not items:
+            return
+        fields = {self.start_field, self.end_field, *self.group_fields} - {None}
+        self.add_columns({field: [item.get(field) for item in items] for field in fields})
+
+    def add_columns(self, columns: Mapping[str, Sequence[Any]]) -> None:
+        """Aggregate one page given as a column of values per field."""
+        start = parse_timestamps(columns[self.start_field])
+        if not start.size:
+            return
+        if self.window_start is not None:
+            mask = start >= self.window_start
+        else:
+            mask = np.ones(start.size, dtype=bool)
+        kept = int(mask.sum())
+        self.total += kept
+
+        keep = mask.tolist()
+        for field in self.group_fields:
+            values = columns.get(field)
+            counts = Counter(compress(values, keep)) if values is not None else Counter({UNKNOWN: kept})
+            # Categorical columns are interned, so there are only a few keys to clean up
+            for key in [key for key in counts if not key or not isinstance(key, str)]:
+                self.groups[field][str(key) if key else UNKNOWN] += counts.pop(key)
+            self.groups[field].update(counts)
+
+        started = start[mask]
+        days = started[~np.isnat(started)].astype("datetime64[D]")
+        if days.size:
+            keys, counts = np.unique(days, return_counts=True)
+            self.daily.update(dict(zip(keys.tolist(), counts.tolist())))
+
+        if self.end_field:
+            ended = parse_timestamps(columns[self.end_field])[mask]
+            valid = ~np.isnat(started) & ~np.isnat(ended) & (ended >= started)
+            if valid.any():
+                self._durations.append(((ended[valid] - started[valid]) / _HOUR).astype(np.float32))
+
+    # --- Results ---
+
+    def durations(self) -> np.ndarray:
+        return np.concatenate(self._durations) if self._durations else np.empty(0, dtype=np.float32)
+
+    def completion_rate(self) -> Optional[float]:
+        if not self.total or "status" not in self.groups:
+            return None
+        done = sum(self.groups["status"].get(status, 0) for status in DONE_STATUSES)
+        return done / self.total
+
+    def daily_series(self, days: int) -> np.ndarray:
+        """Counts for each of the last ``days`` days, oldest first."""
+        series = np.zeros(days, dtype=np.int64)
+        if not self.daily:
+            return series
+        dates = np.array(list(self.daily.keys()), dtype="datetime64[D]")
+        counts = np.array(list(self.daily.values()), dtype=np.int64)
+        offsets = (self.today - dates).astype(np.int64)
+        keep = (offsets >= 0) & (offsets < days)
+        np.add.at(series, days - 1 - offsets[keep], counts[keep])
+        return series
+
+    def weekly_series(self, weeks: int) -> np.ndarray:
+        """Counts per 7-day block ending today, oldest first."""
+        return self.daily_series(weeks * 7).reshape(weeks, 7).sum(axis=1)
+
+    def summary(self) -> Dict[str, Any]:
+        durations = self.durations()
+        weeks = max(1, min(8, (self.days or 56) // 7))
+        last_week, previous_week = self.weekly_series(2)[::-1].tolist()
+        result: Dict[str, Any] = {
+            "window_days": self.days,
+            "total": self.total,
+            "completion_rate": self.completion_rate(),
+            "groups": {field: dict(counter.most_common()) for field, counter in self.groups.items()},
+            "weekly": self.weekly_series(weeks).tolist(),
+            "last_7_days": last_week,
+            "previous_7_days": previous_week,
+            "duration_hours": None,
+        }
+        if durations.size:
+            p50, p90 = np.percentile(durations, [50, 90])
+            result["duration_hours"] = {
+                "count": int(durations.size),
+                "mean": float(durations.mean()),
+                "p50": float(p50),
+                "p90": float(p90),
+            }
+        return result
+
+    def prompt_text(self, label: str = "فعالیت", duration_label: str = "زمان تکمیل", top: int = 5) -> str:
+        summary = self.summary()
+        window = f"{self.days} روز گذشته" if self.days else "کل دوره"
+        lines = [f"- تعداد {label}‌ها ({window}): {summary['total']}"]
+        if not summary["total"]:
+            return "\n    ".join(lines)
+
+        status = summary["groups"].get("status")
+        if status:
+            lines.append("- توزیع وضعیت: " + "، ".join(
+                f"{name}: {count} ({count / summary['total']:.0%})" for name, count in status.items()
+            ))
+        if summary["completion_rate"] is not None:
+            lines.append(f"- نرخ تکمیل: {summary['completion_rate']:.1%}")
+        for field, title in (("severity", "توزیع شدت"), ("organizationName", "سازمان‌های با بیشترین مورد")):
+            counts = summary["groups"].get(field)
+            if counts:
+                lines.append(f"- {title}: " + "، ".join(f"{name}: {count}" for name, count in list(counts.items())[:top]))
+        duration = summary["duration_hours"]
+        if duration:
+            lines.append(
+                f"- {duration_label} (ساعت، {duration['count']} مورد): میانه {duration['p50']:.1f}، "
+                f"صدک ۹۰ {duration['p90']:.1f}، میانگین {duration['mean']:.1f}"
+            )
+        lines.append("- روند هفتگی (قدیمی به جدید): " + "، ".join(str(count) for count in summary["weekly"]))
+        # A week-over-week change needs both weeks inside the window
+        if not self.days or self.days >= 14:
+            last, previous = summary["last_7_days"], summary["previous_7_days"]
+            change = f"{(last - previous) / previous:+.0%}" if previous else "بدون مبنای مقایسه"
+            lines.append(f"- ۷ روز اخیر: {last}، ۷ روز قبل: {previous} (تغییر: {change})")
+        return "\n    ".join(lines)
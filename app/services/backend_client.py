@@ -0,0 +1,349 @@
+"""
+Client for the security-management backend that feeds the reports.
+
+``BACKEND_MODE`` selects where responses come from: ``live`` (default),
+``record`` (live, and every response is appended to the snapshot in
+``BACKEND_SNAPSHOT_DIR``) or ``replay`` (served from that snapshot only,
+so generation can be benchmarked without the backend).
+
+Responses that carry an ``ETag`` or ``Last-Modified`` validator are kept
+with their parsed payload and revalidated with a conditional GET; on a
+``304`` the payload parsed earlier is returned as is. Callers must treat
+returned data as read-only. Each response body is hashed once, when it is
+received, and the digest travels with the payload (through the validator
+table and the cross-worker cache) to the report's source fingerprints;
+``probe`` revalidates a recorded source without rebuilding anything.
+
+Inside ``shared_fetches()`` identical GETs made by the same request, for
+example by several prompt builders of a report bundle, share one fetch.
+
+Large collections are read with ``iter_pages``, which follows the
+backend's paging and yields items with a bounded number of pages
+prefetched, so memory does not grow with the size of the collection.
+``iter_page_columns`` and ``get_columns`` decode the raw response bodies
+straight into ``records.RecordColumns`` instead of lists of dicts.
+"""
+import httpx
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import json
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import parse_qs
+
+from app.services.backend_snapshot import SnapshotReader, SnapshotRecorder, snapshot_key
+from app.services.records import RecordColumns, RecordSpec
+from app.services.deadline import current_deadline
+from app.services.shared_cache import shared_cache
+from app.services.sources import body_hash, record_source
+from app.services.timing import phase
+
+# Bodies larger than this are decoded off the event loop
+DECODE_IN_THREAD_BYTES = 256 * 1024
+
+# Fetches shared by the current request, keyed like the response cache
+_request_fetches: ContextVar[Optional[Dict[str, asyncio.Future]]] = ContextVar("request_fetches", default=None)
+
+class BackendClient:
+    def __init__(
+        self,
+        base_url: str = "http://192.168.1.50:8080/api",
+        timeout: float = 30.0,
+        cache_ttl: float = 0.0,
+        mode: str = "live",
+        snapshot_dir: Optional[str] = None,
+        revalidate_max_entries: int = 256,
+        page_size: int = 500,
+        page_prefetch: int = 2,
+    ):
+        self.base_url = os.getenv("BACKEND_BASE_URL", base_url)
+        # One pooled client for all routers instead of a connection per report
+        self.timeout = timeout
+        self.client = httpx.AsyncClient(timeout=timeout)
+        self.cache_ttl = cache_ttl
+        if mode not in ("live", "record", "replay"):
+            raise ValueError(f"Unknown backend mode: {mode}")
+        if mode != "live" and not snapshot_dir:
+            raise ValueError(f"Backend mode '{mode}' requires a snapshot directory")
+        self.mode = mode
+        self.recorder = SnapshotRecorder(snapshot_dir) if mode == "record" else None
+        self.replay = SnapshotReader(snapshot_dir) if mode == "replay" else None
+        # url -> (response headers to revalidate with, parsed payload)
+        self.revalidate_max_entries = revalidate_max_entries
+        self.page_size = page_size
+        self.page_prefetch = page_prefetch
+        # url -> (headers to revalidate with, parsed payload or raw body, body digest)
+        self._validated: "OrderedDict[str, Tuple[Dict[str, str], Any, str]]" = OrderedDict()
+
+    async def get_json(self, path: str, params: Optional[Dict[str, Any]] = None, cached: bool = True) -> Any:
+        """
+        GET ``path`` (relative to the backend API root) and decode the JSON body.
+
+        With a cache TTL, responses are shared through the cross-worker
+        cache and concurrent identical requests reach the backend once;
+        ``cached=False`` always goes to the backend. Under a request deadline
+        the wait is bounded by the time the caller has left.
+        """
+        data, digest = await self._within_deadline(self._get_shared(path, params, cached, raw=False))
+        record_source(snapshot_key(path, params), digest=digest)
+        return data
+
+    async def get_body(self, path: str, params: Optional[Dict[str, Any]] = None, cached: bool = True) -> bytes:
+        """Like ``get_json`` but return the raw response body, for bulk decoders."""
+        body = await self._within_deadline(self._get_shared(path, params, cached, raw=True))
+        record_source(snapshot_key(path, params), body=body)
+        return body
+
+    async def _within_deadline(self, fetch: Awaitable[Any]) -> Any:
+        deadline = current_deadline.get()
+        if deadline is None:
+            return await fetch
+        return await deadline.wait("backend", fetch, self.timeout)
+
+    async def _get_shared(self, path: str, params: Optional[Dict[str, Any]], cached: bool, raw: bool) -> Any:
+        if self.replay is not None:
+            with phase("backend"):
+                body = self.replay.get_bytes(snapshot_key(path, params))
+                return body if raw else (json.loads(body), body_hash(body))
+        key = ("body:" if raw else "backend-json:") + json.dumps([self.base_url, path, params or {}], sort_keys=True)
+        fetches = _request_fetches.get()
+        if fetches is None or not cached:
+            return await self._get(key, path, params, cached, raw)
+        while key in fetches:
+            shared = fetches[key]
+            try:
+                return await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                # Fetch it ourselves if only the caller that started it went away
+                if not shared.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        fetches[key] = future
+        try:
+            data = await self._get(key, path, params, cached, raw)
+            future.set_result(data)
+            return data
+        except asyncio.CancelledError:
+            del fetches[key]
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not logged
+            future.exception()
+            raise
+
+    @contextmanager
+    def shared_fetches(self) -> Iterator[None]:
+        """Share identical GETs made within the block (and tasks started in it)."""
+        token = _request_fetches.set({})
+        try:
+            yield
+        finally:
+            _request_fetches.reset(token)
+
+    async def _get(self, key: str, path: str, params: Optional[Dict[str, Any]], cached: bool, raw: bool) -> Any:
+        """The raw body, or the parsed payload and the digest of its body."""
+        if self.cache_ttl <= 0 or not cached:
+            return await self._fetch_one(path, params, raw)
+        if raw:
+            # The cross-worker cache stores JSON values: keep the body as text
+            text = await shared_cache.get_or_set(key, self.cache_ttl, lambda: self._fetch_text(path, params))
+            return text.encode("utf-8")
+        data, digest = await shared_cache.get_or_set(key, self.cache_ttl, lambda: self._fetch(path, params))
+        return data, digest
+
+    async def _fetch_one(self, path: str, params: Optional[Dict[str, Any]], raw: bool) -> Any:
+        payload, digest = await self._fetch(path, params, raw)
+        return payload if raw else (payload, digest)
+
+    async def _fetch_text(self, path: str, params: Optional[Dict[str, Any]]) -> str:
+        body, _ = await self._fetch(path, params, raw=True)
+        return body.decode("utf-8")
+
+    async def probe(self, key: str) -> Optional[str]:
+        """
+        The current body digest of the source recorded as ``key`` (a path
+        with its query), by conditional GET when validators are known, so
+        an unchanged source costs a ``304``. ``None`` for sources that are
+        not backend responses.
+        """
+        if not key.startswith("/"):
+            return None
+        path, _, query = key.partition("?")
+        if self.replay is not None:
+            return body_hash(self.replay.get_bytes(key))
+        _, digest = await self._fetch(path, parse_qs(query) if query else None)
+        return digest
+
+    async def iter_pages(
+        self, path: str, params: Optional[Dict[str, Any]] = None, page_size: Optional[int] = None
+    ) -> AsyncIterator[Any]:
+        """
+        Yield the items of a paged collection, fetching pages ahead of the consumer.
+
+        Pages are requested with ``page``/``size`` query parameters. A page
+        envelope is either Spring style (``content`` with ``last`` or
+        ``totalPages``) or cursor style (``items``/``content`` with
+        ``nextCursor``, sent back as ``cursor``). A plain JSON array means
+        the endpoint is not paged and is yielded as the only page. At most
+        ``page_prefetch`` pages wait in memory at any time.
+        """
+        async for items in self.iter_page_lists(path, params, page_size):
+            for item in items:
+                yield item
+
+    async def iter_page_lists(
+        self,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        page_size: Optional[int] = None,
+        cached: bool = True,
+    ) -> AsyncIterator[List[Any]]:
+        """Like ``iter_pages`` but yield each page's item list, for batch consumers."""
+        async def fetch_page(query: Dict[str, Any], page: int) -> Tuple[List[Any], Optional[Any], bool]:
+            return _page_items(await self.get_json(path, query, cached), page)
+
+        async for items in self._paged(params, page_size, fetch_page):
+            yield items
+
+    async def iter_page_columns(
+        self,
+        path: str,
+        spec: RecordSpec,
+        params: Optional[Dict[str, Any]] = None,
+        page_size: Optional[int] = None,
+        cached: bool = True,
+    ) -> AsyncIterator[RecordColumns]:
+        """
+        Like ``iter_page_lists`` but decode each page's raw body straight
+        into the columns of ``spec``; raises ``RecordError`` when a row
+        lacks a required field.
+        """
+        async def fetch_page(query: Dict[str, Any], page: int) -> Tuple[RecordColumns, Optional[Any], bool]:
+            return await _decode_columns(await self.get_body(path, query, cached), spec, page)
+
+        async for columns in self._paged(params, page_size, fetch_page):
+            yield columns
+
+    async def get_columns(
+        self, path: str, spec: RecordSpec, params: Optional[Dict[str, Any]] = None, cached: bool = True
+    ) -> RecordColumns:
+        """GET a list that is not paged and decode it into the columns of ``spec``."""
+        columns, _, _ = await _decode_columns(await self.get_body(path, params, cached), spec, 0)
+        return columns
+
+    async def _paged(
+        self,
+        params: Optional[Dict[str, Any]],
+        page_size: Optional[int],
+        fetch_page: Callable[[Dict[str, Any], int], Awaitable[Tuple[Any, Optional[Any], bool]]],
+    ) -> AsyncIterator[Any]:
+        size = page_size or self.page_size
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.page_prefetch)
+
+        async def produce() -> None:
+            page, cursor = 0, None
+            try:
+                while True:
+                    query = {**(params or {}), "size": size}
+                    if cursor is None:
+                        query["page"] = page
+                    else:
+                        query["cursor"] = cursor
+                    items, cursor, last = await fetch_page(query, page)
+                    await queue.put(items)
+                    if last:
+                        break
+                    page += 1
+                await queue.put(None)
+            except Exception as e:
+                await queue.put(e)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while True:
+                items = await queue.get()
+                if items is None:
+                    return
+                if isinstance(items, BaseException):
+                    raise items
+                yield items
+        finally:
+            producer.cancel()
+
+    async def _fetch(self, path: str, params: Optional[Dict[str, Any]], raw: bool = False) -> Tuple[Any, str]:
+        """The parsed payload (or raw body) and the digest of the body."""
+        key = snapshot_key(path, params)
+        # Raw bodies and parsed payloads of one URL are revalidated separately
+        slot = "raw:" + key if raw else key
+        validated = self._validated.get(slot)
+        with phase("backend"):
+            response = await self.client.get(
+                f"{self.base_url}{path}", params=params, headers=validated[0] if validated else None
+            )
+            if response.status_code == 304 and validated is not None:
+                self._validated.move_to_end(slot)
+                return validated[1], validated[2]
+            response.raise_for_status()
+            if self.recorder is not None:
+                await asyncio.to_thread(self.recorder.record, key, response.content)
+            data = response.content if raw else response.json()
+            digest = body_hash(response.content)
+        self._remember_validators(slot, response, data, digest)
+        return data, digest
+
+    def _remember_validators(self, key: str, response: httpx.Response, data: Any, digest: str) -> None:
+        conditional = {}
+        if "etag" in response.headers:
+            conditional["If-None-Match"] = response.headers["etag"]
+        if "last-modified" in response.headers:
+            conditional["If-Modified-Since"] = response.headers["last-modified"]
+        if not conditional:
+            self._validated.pop(key, None)
+            return
+        self._validated[key] = (conditional, data, digest)
+        self._validated.move_to_end(key)
+        while len(self._validated) > self.revalidate_max_entries:
+            self._validated.popitem(last=False)
+
+
+async def _decode_columns(body: bytes, spec: RecordSpec, page: int) -> Tuple[RecordColumns, Optional[Any], bool]:
+    def decode() -> Tuple[RecordColumns, Optional[Any], bool]:
+        # Straight from the raw bytes; the page's dicts are dropped once the columns are built
+        items, cursor, last = _page_items(json.loads(body), page)
+        return RecordColumns.from_items(spec, items), cursor, last
+
+    # Small bodies are not worth the hop to a thread
+    if len(body) < DECODE_IN_THREAD_BYTES:
+        return decode()
+    return await asyncio.to_thread(decode)
+
+
+def _page_items(payload: Any, page: int) -> Tuple[List[Any], Optional[Any], bool]:
+    """Split a page payload into (items, next cursor, is last page)."""
+    if isinstance(payload, list):
+        return payload, None, True
+    items = payload.get("content", payload.get("items")) or []
+    if payload.get("nextCursor") is not None:
+        return items, payload["nextCursor"], False
+    if "nextCursor" in payload:
+        return items, None, True
+    if "last" in payload:
+        return items, None, bool(payload["last"])
+    if "totalPages" in payload:
+        return items, None, page + 1 >= payload["totalPages"]
+    return items, None, not items
+
+
+backend = BackendClient(
+    cache_ttl=float(os.getenv("BACKEND_CACHE_TTL_SECONDS", "30")),
+    mode=os.getenv("BACKEND_MODE", "live"),
+    snapshot_dir=os.getenv("BACKEND_SNAPSHOT_DIR"),
+    revalidate_max_entries=int(os.getenv("BACKEND_REVALIDATE_MAX_ENTRIES", "256")),
+    page_size=int(os.getenv("BACKEND_PAGE_SIZE", "500")),
+    page_prefetch=int(os.getenv("BACKEND_PAGE_PREFETCH", "2")),
+)
@@ -0,0 +1,104 @@
+"""
+On-disk snapshots of backend responses for offline runs.
+
+A snapshot is a directory written by any number of worker processes. Each
+recording process appends raw response bodies back to back to its own
+``data-<pid>.bin`` and one line per body to ``index-<pid>.jsonl``, giving
+the request key (path plus sorted query), offset, length and recording
+time. Recording is append-only, so it costs the same for the thousandth
+response as for the first and workers never overwrite each other. Replay
+merges every index (the latest recording of a key wins) and memory-maps
+the data files, so bodies are read straight from the page cache and
+shared between worker processes.
+"""
+import glob
+import json
+import mmap
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+import httpx
+
+DATA_FILE = "data-{worker}.bin"
+INDEX_FILE = "index-{worker}.jsonl"
+
+
+def snapshot_key(path: str, params: Optional[Dict[str, Any]] = None) -> str:
+    if not params:
+        return path
+    return f"{path}?{urlencode(sorted(params.items()), doseq=True)}"
+
+
+class SnapshotMiss(httpx.RequestError):
+    """The replayed snapshot has no response for a request."""
+
+
+class SnapshotRecorder:
+    def __init__(self, directory: str, worker: Optional[str] = None):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        worker = worker or str(os.getpid())
+        self.data_path = os.path.join(directory, DATA_FILE.format(worker=worker))
+        self.index_path = os.path.join(directory, INDEX_FILE.format(worker=worker))
+        self._lock = threading.Lock()
+
+    def record(self, key: str, body: bytes) -> None:
+        """Append ``body`` for ``key``; a later recording of the same key wins."""
+        with self._lock:
+            with open(self.data_path, "ab") as f:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(body)
+            # The body is on disk before the line that points at it
+            line = json.dumps([key, offset, len(body), time.time()], ensure_ascii=False) + "\n"
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class SnapshotReader:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._data: Dict[str, Any] = {}
+        # key -> (data file, offset, length, recorded at)
+        self._index: Dict[str, Tuple[str, int, int, float]] = {}
+        pattern = os.path.join(directory, INDEX_FILE.format(worker="*"))
+        for index_path in sorted(glob.glob(pattern)):
+            worker = os.path.basename(index_path)[len("index-"):-len(".jsonl")]
+            data_path = os.path.join(directory, DATA_FILE.format(worker=worker))
+            self._load_index(index_path, data_path)
+        for data_path in {entry[0] for entry in self._index.values()}:
+            with open(data_path, "rb") as f:
+                self._data[data_path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+    def _load_index(self, index_path: str, data_path: str) -> None:
+        size = os.path.getsize(data_path) if os.path.exists(data_path) else 0
+        with open(index_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    key, offset, length, recorded_at = json.loads(line)
+                except ValueError:
+                    # A line cut short by a worker that died mid-write
+                    continue
+                if offset + length > size:
+                    continue
+                current = self._index.get(key)
+                if current is None or recorded_at >= current[3]:
+                    self._index[key] = (data_path, offset, length, recorded_at)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def get_bytes(self, key: str) -> bytes:
+        entry = self._index.get(key)
+        if entry is None:
+            raise SnapshotMiss(f"No recorded backend response for {key} in snapshot {self.directory}")
+        data_path, offset, length, _ = entry
+        return self._data[data_path][offset:offset + length]
+
+    def get_json(self, key: str) -> Any:
+        return json.loads(self.get_bytes(key))
@@ -0,0 +1,102 @@
+"""
+Client-supplied request deadlines.
+
+A caller states how long it is willing to wait with the
+``X-Request-Timeout`` header or the ``timeout`` query parameter (seconds).
+The HTTP middleware binds a ``Deadline`` to the request context and every
+stage consults it: backend waits are bounded by the remaining budget, the
+scheduler queue wait ends at the deadline, ``num_predict`` is capped to what
+the measured token rate can produce in the time left, and work that cannot
+finish in time is rejected before it is queued. Stages that had to be cut
+short are recorded and reported back with the response.
+"""
+import asyncio
+import math
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Optional
+
+# Upper bound on what a caller may ask for
+MAX_REQUEST_TIMEOUT = float(os.getenv("MAX_REQUEST_TIMEOUT_SECONDS", "600"))
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, stage: str, detail: str):
+        super().__init__(f"Deadline exceeded in {stage}: {detail}")
+        self.stage = stage
+        self.detail = detail
+
+
+class Deadline:
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+        self.shortened: Dict[str, str] = {}
+        self.exceeded: Optional[DeadlineExceeded] = None
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def shorten(self, stage: str, detail: str) -> None:
+        """Record that ``stage`` ran with less than its usual allowance."""
+        previous = self.shortened.get(stage)
+        self.shortened[stage] = f"{previous}; {detail}" if previous else detail
+
+    def expire(self, stage: str, detail: str) -> DeadlineExceeded:
+        """The error to raise when ``stage`` cannot finish in time (remembered for the response)."""
+        if self.exceeded is None:
+            self.exceeded = DeadlineExceeded(stage, detail)
+        return self.exceeded
+
+    async def wait(self, stage: str, awaitable: Awaitable[Any], usual_timeout: Optional[float] = None) -> Any:
+        """
+        Await ``awaitable`` for at most the remaining budget.
+
+        The work itself is shielded: a shared fetch other requests are
+        waiting for keeps running when this caller gives up on it.
+        """
+        task = asyncio.ensure_future(awaitable)
+        remaining = self.remaining()
+        if remaining <= 0:
+            task.cancel()
+            raise self.expire(stage, "no time left")
+        if usual_timeout is not None and remaining < usual_timeout:
+            self.shorten(stage, f"timeout {remaining:.1f}s instead of {usual_timeout:.0f}s")
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), remaining)
+        except asyncio.TimeoutError:
+            task.add_done_callback(_retrieve)
+            raise self.expire(stage, f"no result within {remaining:.1f}s") from None
+
+    def to_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {
+            "budget_seconds": self.budget_seconds,
+            "remaining_seconds": round(self.remaining(), 3),
+            "shortened": dict(self.shortened),
+        }
+        if self.exceeded is not None:
+            result["exceeded"] = {"stage": self.exceeded.stage, "detail": self.exceeded.detail}
+        return result
+
+
+def _retrieve(task: asyncio.Future) -> None:
+    # Nobody awaits an abandoned task any more; mark its error as seen
+    if not task.cancelled():
+        task.exception()
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar("current_deadline", default=None)
+
+
+def parse_timeout(value: Optional[str]) -> Optional[float]:
+    """Seconds from a header or query value; ``None`` when absent or invalid."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        return None
+    if not math.isfinite(seconds) or seconds <= 0:
+        return None
+    return min(seconds, MAX_REQUEST_TIMEOUT)
@@ -0,0 +1,170 @@
+"""
+Early termination of report generation.
+
+Reasoning models such as ``phi4-reasoning`` keep writing after the last
+section the prompt asked for: extra recommendations, a closing summary,
+reasoning traces or the same lines in a loop. A ``CompletionDetector`` is
+fed the streamed output; it drops reasoning blocks (``<think>...</think>``),
+splits the rest into the prompt's sections and tells the caller to stop once
+the final section is complete or the output starts repeating itself back
+to back.
+Closing the stream makes Ollama stop generating, so the remaining tokens are
+never produced.
+"""
+import os
+import re
+from typing import List, Optional, Sequence, Tuple
+
+from app.services.sections import Section, SectionParser
+
+EARLY_STOP_ENABLED = os.getenv("EARLY_STOP_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# A block of up to REPEAT_MAX_LINES lines (at least REPEAT_MIN_CHARS long)
+# written this many times in a row is a loop; the same line in different
+# places (a bullet repeated across sections) is not
+REPEAT_MIN_CHARS = int(os.getenv("EARLY_STOP_REPEAT_MIN_CHARS", "24"))
+REPEAT_LIMIT = int(os.getenv("EARLY_STOP_REPEAT_LIMIT", "3"))
+REPEAT_MAX_LINES = int(os.getenv("EARLY_STOP_REPEAT_MAX_LINES", "4"))
+
+REASONING_TAGS: Tuple[Tuple[str, str], ...] = (("<think>", "</think>"), ("<thinking>", "</thinking>"))
+
+# A horizontal rule after the final section starts the model's own trailer
+_RULE_RE = re.compile(r"^\s*(?:-{3,}|\*{3,}|_{3,})\s*$")
+
+
+def _partial_suffix(text: str, tags: Sequence[str]) -> int:
+    """Length of the longest suffix of ``text`` that starts one of ``tags``."""
+    longest = 0
+    for tag in tags:
+        for size in range(min(len(tag) - 1, len(text)), longest, -1):
+            if text.endswith(tag[:size]):
+                longest = size
+                break
+    return longest
+
+
+class CompletionDetector:
+    """
+    Watches a streamed report for the point where the rest can be dropped.
+
+    ``feed`` takes each raw delta and returns the visible part of it (with
+    reasoning removed) and the sections it completed. Once ``reason`` is set
+    the caller should stop the generation; ``content`` is the output up to
+    the stopping point. With ``stop=False`` only the reasoning is stripped.
+    """
+
+    def __init__(self, expected: Sequence[str] = (), stop: bool = True):
+        self.parser = SectionParser(expected)
+        self.expected = list(expected)
+        self.stop = stop
+        self.reason: Optional[str] = None
+        self.text = ""
+        self.reasoning_chars = 0
+        self._pending = ""
+        self._closing: Optional[str] = None
+        self._line = ""
+        self._cut: Optional[int] = None
+        # The latest non-blank lines with their offsets, enough to hold the longest loop
+        self._recent: List[Tuple[str, int]] = []
+
+    @property
+    def content(self) -> str:
+        return (self.text if self._cut is None else self.text[:self._cut]).strip()
+
+    def feed(self, delta: str) -> Tuple[str, List[Section]]:
+        visible = self._strip_reasoning(delta)
+        completed: List[Section] = []
+        if self.reason is not None or not visible:
+            return visible, completed
+        self.text += visible
+        self._line += visible
+        while "\n" in self._line and self.reason is None:
+            line, self._line = self._line.split("\n", 1)
+            offset = len(self.text) - len(self._line) - len(line) - 1
+            completed.extend(self._consume_line(line, offset))
+        return visible, completed
+
+    def close(self) -> List[Section]:
+        if self._pending and self._closing is None and self.reason is None:
+            # A trailing "<" that turned out not to open a reasoning block
+            self.text += self._pending
+            self._line += self._pending
+        self._pending = ""
+        if self.reason is None and self._line:
+            self.parser.feed(self._line)
+        return self.parser.close()
+
+    def _consume_line(self, line: str, offset: int) -> List[Section]:
+        if self.stop:
+            self.reason = self._stop_reason(line, offset)
+            if self.reason is not None:
+                return []
+        return self.parser.feed(line + "\n")
+
+    def _stop_reason(self, line: str, offset: int) -> Optional[str]:
+        # Repetition loop: keep one copy of the repeated block
+        if self._repeated(line, offset):
+            return "repetition"
+
+        total = len(self.expected)
+        current = self.parser.current
+        if not total or current is None or current.index != total:
+            return None
+        # A numbered heading past the last requested section
+        if self.parser.heading_index(line) is not None:
+            self._cut = offset
+            return "sections_complete"
+        # A rule once the last section has some content
+        if current.content.strip() and _RULE_RE.match(line):
+            self._cut = offset
+            return "sections_complete"
+        return None
+
+    def _repeated(self, line: str, offset: int) -> bool:
+        key = line.strip()
+        if not key:
+            return False
+        self._recent.append((key, offset))
+        del self._recent[:-REPEAT_LIMIT * REPEAT_MAX_LINES]
+        keys = [entry[0] for entry in self._recent]
+        for size in range(1, REPEAT_MAX_LINES + 1):
+            span = REPEAT_LIMIT * size
+            if len(keys) < span:
+                break
+            block = keys[-size:]
+            if sum(map(len, block)) < REPEAT_MIN_CHARS or not any(ch.isalpha() for text in block for ch in text):
+                continue
+            if all(keys[-span + start:len(keys) - span + start + size] == block for start in range(0, span, size)):
+                self._cut = self._recent[-span + size][1]
+                return True
+        return False
+
+    def _strip_reasoning(self, delta: str) -> str:
+        text = self._pending + delta
+        self._pending = ""
+        visible: List[str] = []
+        while text:
+            if self._closing is not None:
+                end = text.find(self._closing)
+                if end < 0:
+                    keep = _partial_suffix(text, (self._closing,))
+                    self.reasoning_chars += len(text) - keep
+                    self._pending = text[len(text) - keep:]
+                    break
+                self.reasoning_chars += end + len(self._closing)
+                text = text[end + len(self._closing):]
+                self._closing = None
+                continue
+            found = [(text.find(opening), opening, closing) for opening, closing in REASONING_TAGS]
+            found = [entry for entry in found if entry[0] >= 0]
+            if not found:
+                keep = _partial_suffix(text, [opening for opening, _ in REASONING_TAGS])
+                visible.append(text[:len(text) - keep])
+                self._pending = text[len(text) - keep:]
+                break
+            start, opening, closing = min(found)
+            visible.append(text[:start])
+            self.reasoning_chars += len(opening)
+            text = text[start + len(opening):]
+            self._closing = closing
+        return "".join(visible)
@@ -0,0 +1,214 @@
+"""
+Completion-time prediction for report generation.
+
+The predictor learns online from every finished generation: the token
+rates of each model (``token_rates``), how many tokens each report type
+actually produces per model, typical prompt sizes, and how far the raw
+rate-based estimate and the queue estimate are off in practice. An
+estimate combines the expected queue wait at the current queue position
+with the expected generation time. The same numbers give the sustainable
+report throughput of each model per priority class (``capacity``): a
+sectioned report holds a slot once per section, so its cost is the slot
+time of all its generations together.
+"""
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.generation_profiles import GenerationProfile, TokenRateTracker, token_rates
+from app.services.scheduler import OllamaScheduler, Priority, scheduler
+
+
+@dataclass
+class Estimate:
+    report_type: str
+    model: str
+    position: int
+    queue_seconds: float
+    generation_seconds: float
+    made_at: float = field(default_factory=time.time)
+
+    @property
+    def total_seconds(self) -> float:
+        return self.queue_seconds + self.generation_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.made_at + self.total_seconds - time.time())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "report_type": self.report_type,
+            "model": self.model,
+            "queue_position": self.position,
+            "queue_seconds": round(self.queue_seconds, 1),
+            "generation_seconds": round(self.generation_seconds, 1),
+            "eta_seconds": round(self.remaining(), 1),
+            "eta": datetime.fromtimestamp(self.made_at + self.total_seconds).isoformat(timespec="seconds"),
+        }
+
+
+# Estimates made while serving the current request (bound by the middleware or a job)
+request_estimates: ContextVar[Optional[List[Estimate]]] = ContextVar("request_estimates", default=None)
+
+
+def publish(estimate: Estimate) -> None:
+    estimates = request_estimates.get()
+    if estimates is not None:
+        estimates.append(estimate)
+
+
+def _clamp(value: float, low: float, high: float) -> float:
+    return min(high, max(low, value))
+
+
+class EtaPredictor:
+    def __init__(self, rates: TokenRateTracker, slots: OllamaScheduler, alpha: float = 0.2):
+        self.rates = rates
+        self.scheduler = slots
+        self.alpha = alpha
+        # (report type, model) -> tokens generated
+        self._output_tokens: Dict[Tuple[str, str], float] = {}
+        # report type -> prompt characters
+        self._prompt_chars: Dict[str, float] = {}
+        # model -> observed / rate-based generation seconds
+        self._generation_scale: Dict[str, float] = {}
+        # model and (report type, model) -> seconds a generation holds its slot
+        self._service: Dict[str, float] = {}
+        self._service_by_type: Dict[Tuple[str, str], float] = {}
+        self._mean_service: Optional[float] = None
+        # model and (report type, model) -> slot seconds a whole report takes (all its sections)
+        self._report_service: Dict[str, float] = {}
+        self._report_service_by_type: Dict[Tuple[str, str], float] = {}
+        # observed / predicted queue wait
+        self._queue_scale = 1.0
+        self._error: Dict[str, float] = {}
+        self._samples: Dict[str, int] = {}
+
+    def _ewma(self, previous: Optional[float], sample: float) -> float:
+        return sample if previous is None else self.alpha * sample + (1 - self.alpha) * previous
+
+    def predict(
+        self,
+        report_type: str,
+        model: str,
+        profile: GenerationProfile,
+        priority: Priority,
+        prompt: Optional[str] = None,
+        num_predict: Optional[int] = None,
+    ) -> Estimate:
+        """
+        Expected queue wait and generation time of a generation enqueued now.
+
+        Without a prompt (before its data is fetched) the typical prompt
+        size of the report type is assumed.
+        """
+        generation = self._generation_seconds(report_type, model, profile, prompt, num_predict)
+        position = self.scheduler.queued_ahead(priority)
+        free = self.scheduler.free_slots(priority)
+        queue = 0.0
+        if position >= free:
+            # The waiters ahead drain over all slots; the slot we get is on average half done
+            service = self._mean_service or generation
+            slots = self.scheduler.usable_slots(priority)
+            queue = ((position - free) / slots + 0.5) * service * self._queue_scale
+        return Estimate(report_type, model, position, queue, generation)
+
+    def observe(
+        self, estimate: Estimate, queue_wait: float, seconds: float, prompt: str, result: Dict[str, Any]
+    ) -> None:
+        """Learn from a finished generation that held its slot for ``seconds``."""
+        key = (estimate.report_type, estimate.model)
+        model = estimate.model
+        if result.get("eval_count") and result.get("early_stop") != "deadline":
+            self._output_tokens[key] = self._ewma(self._output_tokens.get(key), result["eval_count"])
+        if prompt:
+            self._prompt_chars[estimate.report_type] = self._ewma(
+                self._prompt_chars.get(estimate.report_type), len(prompt)
+            )
+        raw = self._rate_seconds(model, len(prompt), result.get("eval_count") or 0)
+        if raw:
+            self._generation_scale[model] = self._ewma(
+                self._generation_scale.get(model), _clamp(seconds / raw, 0.5, 5.0)
+            )
+        self._service[model] = self._ewma(self._service.get(model), seconds)
+        self._service_by_type[key] = self._ewma(self._service_by_type.get(key), seconds)
+        self._mean_service = self._ewma(self._mean_service, seconds)
+        if not estimate.report_type.endswith(".section"):
+            self.observe_report(estimate.report_type, model, seconds)
+        if estimate.queue_seconds > 0:
+            self._queue_scale = self._ewma(
+                self._queue_scale, _clamp(self._queue_scale * queue_wait / estimate.queue_seconds, 0.2, 5.0)
+            )
+        error = abs(queue_wait + seconds - estimate.total_seconds)
+        self._error[model] = self._ewma(self._error.get(model), error)
+        self._samples[model] = self._samples.get(model, 0) + 1
+
+    def observe_report(self, report_type: str, model: str, slot_seconds: float) -> None:
+        """Learn the slot time a finished report took over all its generations."""
+        self._report_service[model] = self._ewma(self._report_service.get(model), slot_seconds)
+        key = (report_type, model)
+        self._report_service_by_type[key] = self._ewma(self._report_service_by_type.get(key), slot_seconds)
+
+    def capacity(self) -> Dict[str, Any]:
+        """
+        Sustainable reports per minute of each model, per priority class,
+        if the slots that class may use served only that model, at the
+        current report mix.
+        """
+        slots = self.scheduler.max_concurrency
+        usable = {p.name.lower(): self.scheduler.usable_slots(p) for p in Priority}
+        models = {}
+        for model, service in sorted(self._report_service.items()):
+            rates = self.rates.get(model)
+            models[model] = {
+                "samples": self._samples.get(model, 0),
+                "seconds_per_report": round(service, 1),
+                "seconds_per_generation": round(self._service[model], 1) if model in self._service else None,
+                "reports_per_minute": {
+                    name: round(count * 60 / service, 2) if service > 0 else None for name, count in usable.items()
+                },
+                "eval_tps": round(rates.eval_tps, 1) if rates.eval_tps else None,
+                "eta_error_seconds": round(self._error[model], 1) if model in self._error else None,
+                "report_types": {
+                    report_type: round(seconds, 1)
+                    for (report_type, name), seconds in sorted(self._report_service_by_type.items())
+                    if name == model
+                },
+            }
+        stats = self.scheduler.stats()
+        backlog = None
+        if self._mean_service is not None:
+            backlog = round(stats["queued"] * self._mean_service * self._queue_scale / slots, 1)
+        return {"slots": slots, "usable_slots": usable, "queue": stats, "backlog_seconds": backlog, "models": models}
+
+    def _rate_seconds(self, model: str, prompt_chars: float, tokens: float) -> Optional[float]:
+        rates = self.rates.get(model)
+        if not rates.eval_tps:
+            return None
+        prompt_seconds = prompt_chars * rates.tokens_per_char / rates.prompt_tps if rates.prompt_tps else 0.0
+        return rates.load_seconds + prompt_seconds + tokens / rates.eval_tps
+
+    def _generation_seconds(
+        self,
+        report_type: str,
+        model: str,
+        profile: GenerationProfile,
+        prompt: Optional[str],
+        num_predict: Optional[int],
+    ) -> float:
+        key = (report_type, model)
+        tokens = num_predict or profile.num_predict
+        if key in self._output_tokens:
+            tokens = min(tokens, self._output_tokens[key])
+        prompt_chars = len(prompt) if prompt is not None else self._prompt_chars.get(report_type, 0.0)
+        raw = self._rate_seconds(model, prompt_chars, tokens)
+        if raw is not None:
+            return raw * self._generation_scale.get(model, 1.0)
+        # Rates not measured yet: what this kind of generation took, or the profile's latency target
+        return self._service_by_type.get(key) or self._service.get(model) or profile.target_latency_seconds
+
+
+eta_predictor = EtaPredictor(token_rates, scheduler, alpha=float(os.getenv("ETA_ALPHA", "0.2")))
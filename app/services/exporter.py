@@ -0,0 +1,306 @@
+"""
+Rendering of report markdown to printable HTML, PDF and DOCX.
+
+Rendering is CPU bound, so it runs in a process pool rather than on the
+event loop. Rendered artifacts are cached by a hash of the format and the
+report text, and a semaphore bounds how many exports run at once.
+"""
+import asyncio
+import hashlib
+import html
+import io
+import os
+import re
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+EXPORT_MEDIA_TYPES = {
+    "html": "text/html",
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+}
+
+HTML_TEMPLATE = """<!DOCTYPE html>
+<html lang="fa" dir="rtl">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+  body {{ font-family: Vazirmatn, Tahoma, "DejaVu Sans", sans-serif; direction: rtl; text-align: right;
+         line-height: 1.8; margin: 2cm; }}
+  h1, h2, h3, h4 {{ color: #1f3864; }}
+  table {{ border-collapse: collapse; width: 100%; margin: 1em 0; }}
+  th, td {{ border: 1px solid #999; padding: 4px 8px; }}
+  th {{ background: #e7ecf5; }}
+  .meta {{ color: #666; font-size: 0.9em; }}
+</style>
+</head>
+<body>
+<h1>{title}</h1>
+<p class="meta">{subtitle}</p>
+{body}
+</body>
+</html>
+"""
+
+
+class ExportUnavailable(Exception):
+    """The renderer for a format is not installed."""
+
+
+# --- Markdown parsing (shared by the HTML and DOCX renderers) ---
+
+Block = Tuple[str, object]
+
+_ORDERED_RE = re.compile(r"^\s*[0-9۰-۹]+[.)]\s+(.*)$")
+_BULLET_RE = re.compile(r"^\s*[-*•]\s+(.*)$")
+_HEADING_RE = re.compile(r"^\s*(#{1,6})\s+(.*)$")
+_TABLE_SEPARATOR_RE = re.compile(r"^\s*\|?\s*:?-{2,}")
+
+
+def parse_markdown(text: str) -> List[Block]:
+    """
+    Split markdown into ``heading``, ``list``, ``table`` and ``paragraph``
+    blocks; the subset models produce for these reports.
+    """
+    blocks: List[Block] = []
+    paragraph: List[str] = []
+
+    def flush_paragraph():
+        if paragraph:
+            blocks.append(("paragraph", " ".join(paragraph)))
+            paragraph.clear()
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            flush_paragraph()
+            continue
+        heading = _HEADING_RE.match(line)
+        ordered = _ORDERED_RE.match(line)
+        bullet = _BULLET_RE.match(line)
+        if heading:
+            flush_paragraph()
+            blocks.append(("heading", (len(heading.group(1)), heading.group(2).strip())))
+        elif stripped.startswith("|"):
+            flush_paragraph()
+            if _TABLE_SEPARATOR_RE.match(stripped):
+                continue
+            row = [cell.strip() for cell in stripped.strip("|").split("|")]
+            if blocks and blocks[-1][0] == "table":
+                blocks[-1][1].append(row)
+            else:
+                blocks.append(("table", [row]))
+        elif ordered or bullet:
+            flush_paragraph()
+            kind = "ordered" if ordered else "bullet"
+            item = (ordered or bullet).group(1).strip()
+            if blocks and blocks[-1][0] == "list" and blocks[-1][1][0] == kind:
+                blocks[-1][1][1].append(item)
+            else:
+                blocks.append(("list", (kind, [item])))
+        else:
+            paragraph.append(stripped)
+    flush_paragraph()
+    return blocks
+
+
+def _inline_html(text: str) -> str:
+    parts = html.escape(text).split("**")
+    return "".join(f"<strong>{part}</strong>" if i % 2 else part for i, part in enumerate(parts))
+
+
+def render_html(title: str, subtitle: str, content: str) -> bytes:
+    body: List[str] = []
+    for kind, value in parse_markdown(content):
+        if kind == "heading":
+            level, text = value
+            level = min(level + 1, 6)
+            body.append(f"<h{level}>{_inline_html(text)}</h{level}>")
+        elif kind == "list":
+            tag = "ol" if value[0] == "ordered" else "ul"
+            items = "".join(f"<li>{_inline_html(item)}</li>" for item in value[1])
+            body.append(f"<{tag}>{items}</{tag}>")
+        elif kind == "table":
+            header, *rows = value
+            head = "".join(f"<th>{_inline_html(cell)}</th>" for cell in header)
+            rows_html = "".join(
+                "<tr>" + "".join(f"<td>{_inline_html(cell)}</td>" for cell in row) + "</tr>" for row in rows
+            )
+            body.append(f"<table><thead><tr>{head}</tr></thead><tbody>{rows_html}</tbody></table>")
+        else:
+            body.append(f"<p>{_inline_html(value)}</p>")
+    return HTML_TEMPLATE.format(
+        title=html.escape(title), subtitle=html.escape(subtitle), body="\n".join(body)
+    ).encode("utf-8")
+
+
+def render_pdf(title: str, subtitle: str, content: str) -> bytes:
+    try:
+        from weasyprint import HTML
+    except ImportError as e:
+        raise ExportUnavailable("PDF export requires the 'weasyprint' package") from e
+    return HTML(string=render_html(title, subtitle, content).decode("utf-8")).write_pdf()
+
+
+# Elements that follow the right-to-left switches in their parent, in OOXML schema order
+_PPR_AFTER_BIDI = (
+    "w:adjustRightInd", "w:snapToGrid", "w:spacing", "w:ind", "w:contextualSpacing", "w:mirrorIndents",
+    "w:suppressOverlap", "w:jc", "w:textDirection", "w:textAlignment", "w:textboxTightWrap",
+    "w:outlineLvl", "w:divId", "w:cnfStyle", "w:rPr", "w:sectPr", "w:pPrChange",
+)
+_RPR_AFTER_RTL = ("w:cs", "w:em", "w:lang", "w:eastAsianLayout", "w:specVanish", "w:oMath")
+_TBLPR_AFTER_BIDI = (
+    "w:tblStyleRowBandSize", "w:tblStyleColBandSize", "w:tblW", "w:jc", "w:tblCellSpacing", "w:tblInd",
+    "w:tblBorders", "w:shd", "w:tblLayout", "w:tblCellMar", "w:tblLook", "w:tblCaption",
+    "w:tblDescription", "w:tblPrChange",
+)
+_SECTPR_AFTER_BIDI = ("w:rtlGutter", "w:docGrid", "w:printerSettings", "w:sectPrChange")
+
+
+def render_docx(title: str, subtitle: str, content: str) -> bytes:
+    try:
+        from docx import Document
+        from docx.enum.text import WD_ALIGN_PARAGRAPH
+        from docx.oxml import OxmlElement
+        from docx.oxml.ns import qn
+    except ImportError as e:
+        raise ExportUnavailable("DOCX export requires the 'python-docx' package") from e
+
+    def switch_on(parent, tag, successors):
+        # Word rejects properties out of schema order, so insert instead of appending
+        if parent.find(qn(tag)) is None:
+            parent.insert_element_before(OxmlElement(tag), *successors)
+
+    def rtl(paragraph):
+        paragraph.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        switch_on(paragraph._p.get_or_add_pPr(), "w:bidi", _PPR_AFTER_BIDI)
+        for run in paragraph.runs:
+            switch_on(run._r.get_or_add_rPr(), "w:rtl", _RPR_AFTER_RTL)
+        return paragraph
+
+    def add_inline(paragraph, text):
+        for i, part in enumerate(text.split("**")):
+            if part:
+                paragraph.add_run(part).bold = bool(i % 2)
+        return rtl(paragraph)
+
+    document = Document()
+    rtl(document.add_heading(title, level=0))
+    rtl(document.add_paragraph(subtitle))
+    for kind, value in parse_markdown(content):
+        if kind == "heading":
+            level, text = value
+            add_inline(document.add_heading("", level=min(level, 9)), text)
+        elif kind == "list":
+            style = "List Number" if value[0] == "ordered" else "List Bullet"
+            for item in value[1]:
+                add_inline(document.add_paragraph(style=style), item)
+        elif kind == "table":
+            columns = max(len(row) for row in value)
+            table = document.add_table(rows=len(value), cols=columns)
+            table.style = "Table Grid"
+            switch_on(table._tbl.tblPr, "w:bidiVisual", _TBLPR_AFTER_BIDI)
+            for r, row in enumerate(value):
+                for c, cell in enumerate(row):
+                    add_inline(table.cell(r, c).paragraphs[0], cell)
+        else:
+            add_inline(document.add_paragraph(), value)
+    # Right-to-left default for the whole section
+    switch_on(document.sections[0]._sectPr, "w:bidi", _SECTPR_AFTER_BIDI)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+_RENDERERS = {"html": render_html, "pdf": render_pdf, "docx": render_docx}
+
+
+def render(fmt: str, title: str, subtitle: str, content: str) -> bytes:
+    """Entry point executed in the worker processes."""
+    return _RENDERERS[fmt](title, subtitle, content)
+
+
+class ExportService:
+    def __init__(self, max_workers: int = 2, max_concurrency: int = 4, cache_max_bytes: int = 64 * 1024 * 1024):
+        self.max_workers = max_workers
+        self.cache_max_bytes = cache_max_bytes
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._cache_bytes = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @staticmethod
+    def cache_key(fmt: str, title: str, subtitle: str, content: str) -> str:
+        digest = hashlib.sha256()
+        for part in (fmt, title, subtitle, content):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    async def export(self, fmt: str, title: str, subtitle: str, content: str) -> bytes:
+        if fmt not in _RENDERERS:
+            raise ValueError(f"Unsupported export format: {fmt}")
+        key = self.cache_key(fmt, title, subtitle, content)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+        # Concurrent exports of the same artifact share one render
+        while key in self._inflight:
+            shared = self._inflight[key]
+            try:
+                return await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                # Render again ourselves if only the caller that started it went away
+                if not shared.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            async with self._semaphore:
+                data = await asyncio.get_running_loop().run_in_executor(
+                    self._get_pool(), render, fmt, title, subtitle, content
+                )
+            self._store(key, data)
+            future.set_result(data)
+            return data
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not logged
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _store(self, key: str, data: bytes) -> None:
+        if len(data) > self.cache_max_bytes:
+            return
+        self._cache[key] = data
+        self._cache_bytes += len(data)
+        while self._cache_bytes > self.cache_max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_bytes -= len(evicted)
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+export_service = ExportService(
+    max_workers=int(os.getenv("EXPORT_WORKERS", "2")),
+    max_concurrency=int(os.getenv("EXPORT_MAX_CONCURRENCY", "4")),
+    cache_max_bytes=int(os.getenv("EXPORT_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+)
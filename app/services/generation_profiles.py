@@ -0,0 +1,149 @@
+"""
+Generation profiles with latency SLOs.
+
+Without ``options`` Ollama uses unbounded model defaults for output length
+and context size. Each report type is mapped to a named profile that bounds
+``num_predict`` and ``num_ctx``. ``num_predict`` is further reduced from the
+measured tokens/sec of the model so the report lands within the profile's
+target latency.
+"""
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+# Ollama durations are reported in nanoseconds
+_NS = 1e9
+
+# Fraction of the measured token rate relied upon when sizing num_predict
+SLO_SAFETY_FACTOR = float(os.getenv("GENERATION_SLO_SAFETY_FACTOR", "0.9"))
+
+# Stop sequences that mark the model starting a fake next turn
+DEFAULT_STOP: Tuple[str, ...] = ("<|user|>", "<|endoftext|>")
+
+
+@dataclass(frozen=True)
+class GenerationProfile:
+    name: str
+    num_predict: int
+    num_ctx: int
+    temperature: float
+    target_latency_seconds: float
+    stop: Tuple[str, ...] = DEFAULT_STOP
+    min_predict: int = 256
+
+
+PROFILES: Dict[str, GenerationProfile] = {
+    "executive-brief": GenerationProfile(
+        "executive-brief", num_predict=1200, num_ctx=4096, temperature=0.3, target_latency_seconds=90
+    ),
+    "executive-comprehensive": GenerationProfile(
+        "executive-comprehensive", num_predict=2000, num_ctx=8192, temperature=0.3, target_latency_seconds=150
+    ),
+    "process": GenerationProfile(
+        "process", num_predict=1500, num_ctx=4096, temperature=0.4, target_latency_seconds=90
+    ),
+    "analytical": GenerationProfile(
+        "analytical", num_predict=1000, num_ctx=4096, temperature=0.4, target_latency_seconds=60
+    ),
+    "freeform": GenerationProfile(
+        "freeform", num_predict=1024, num_ctx=4096, temperature=0.7, target_latency_seconds=60
+    ),
+}
+
+# Keyed by full report type first, then by router prefix
+REPORT_PROFILES: Dict[str, str] = {
+    "executive": "executive-brief",
+    "executive.center-director": "executive-comprehensive",
+    "processes": "process",
+    "incidents": "analytical",
+    "vulnerabilities": "analytical",
+    "assessments": "analytical",
+    "generate": "freeform",
+}
+
+
+def profile_for(report_type: str) -> GenerationProfile:
+    name = REPORT_PROFILES.get(report_type) or REPORT_PROFILES.get(report_type.split(".")[0], "freeform")
+    return PROFILES[name]
+
+
+@dataclass
+class ModelRates:
+    eval_tps: Optional[float] = None
+    prompt_tps: Optional[float] = None
+    load_seconds: float = 0.0
+    tokens_per_char: float = 0.5
+
+
+class TokenRateTracker:
+    """
+    Moving averages of the rates Ollama reports for each model.
+    """
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self._rates: Dict[str, ModelRates] = {}
+
+    def get(self, model: str) -> ModelRates:
+        return self._rates.get(model) or ModelRates()
+
+    def _ewma(self, previous: Optional[float], sample: float) -> float:
+        return sample if previous is None else self.alpha * sample + (1 - self.alpha) * previous
+
+    def observe(self, model: str, prompt: str, result: Dict[str, Any]) -> None:
+        rates = self._rates.setdefault(model, ModelRates())
+        if result.get("eval_count") and result.get("eval_duration"):
+            rates.eval_tps = self._ewma(rates.eval_tps, result["eval_count"] / (result["eval_duration"] / _NS))
+        if result.get("prompt_eval_count") and result.get("prompt_eval_duration"):
+            rates.prompt_tps = self._ewma(
+                rates.prompt_tps, result["prompt_eval_count"] / (result["prompt_eval_duration"] / _NS)
+            )
+            if prompt:
+                rates.tokens_per_char = self._ewma(rates.tokens_per_char, result["prompt_eval_count"] / len(prompt))
+        if "load_duration" in result:
+            rates.load_seconds = self._ewma(rates.load_seconds, result["load_duration"] / _NS)
+
+    def estimate_prompt_seconds(self, model: str, prompt: str) -> float:
+        rates = self.get(model)
+        if not rates.prompt_tps:
+            return 0.0
+        return len(prompt) * rates.tokens_per_char / rates.prompt_tps
+
+
+def affordable_tokens(model: str, prompt: str, seconds: float, rates: "TokenRateTracker") -> Optional[int]:
+    """
+    Tokens ``model`` is expected to produce within ``seconds``, after
+    loading and evaluating ``prompt``; ``None`` until its rate is measured.
+    """
+    model_rates = rates.get(model)
+    if not model_rates.eval_tps:
+        return None
+    budget = seconds - model_rates.load_seconds - rates.estimate_prompt_seconds(model, prompt)
+    return int(max(budget, 0) * model_rates.eval_tps * SLO_SAFETY_FACTOR)
+
+
+def build_options(
+    profile: GenerationProfile,
+    model: str,
+    prompt: str,
+    rates: TokenRateTracker,
+) -> Dict[str, Any]:
+    """
+    Ollama ``options`` for a generation under ``profile``.
+
+    ``num_predict`` is capped so that the expected prompt evaluation plus
+    generation time fits the profile's SLO.
+    """
+    num_predict = profile.num_predict
+    affordable = affordable_tokens(model, prompt, profile.target_latency_seconds, rates)
+    if affordable is not None:
+        num_predict = max(profile.min_predict, min(num_predict, affordable))
+    return {
+        "num_predict": num_predict,
+        "num_ctx": profile.num_ctx,
+        "temperature": profile.temperature,
+        "stop": list(profile.stop),
+    }
+
+
+token_rates = TokenRateTracker()
@@ -0,0 +1,134 @@
+"""
+Background report jobs.
+
+A job runs one report generation after its HTTP request has returned, so
+callers can submit work, learn its expected completion time straight
+away and poll for the result. The estimate is refined as the job goes:
+the generator publishes a fresh one (with the real prompt and queue
+position) when the job reaches the Ollama queue. Jobs are kept in memory
+for ``JOB_TTL_SECONDS`` after they finish.
+"""
+import asyncio
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.models.report import Report
+from app.services.deadline import current_deadline
+from app.services.eta import Estimate, request_estimates
+from app.services.scheduler import run_as_background
+
+JOB_TTL_SECONDS = float(os.getenv("JOB_TTL_SECONDS", "3600"))
+MAX_JOBS = int(os.getenv("JOBS_MAX", "1000"))
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    id: str
+    report_type: str
+    model: Optional[str]
+    params: Dict[str, Any]
+    status: str = "queued"
+    created_at: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    estimates: List[Estimate] = field(default_factory=list)
+    report: Optional[Report] = None
+    error: Optional[Dict[str, Any]] = None
+    task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("done", "failed", "cancelled")
+
+    def eta(self) -> Optional[Dict[str, Any]]:
+        """The latest estimate (of the slowest part, for multi-generation reports)."""
+        if self.done or not self.estimates:
+            return None
+        latest = self.estimates[-1].made_at
+        current = [e for e in self.estimates if e.made_at >= latest - 1.0]
+        return max(current, key=lambda e: e.made_at + e.total_seconds).to_dict()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "report_type": self.report_type,
+            "model": self.model,
+            "params": self.params,
+            "status": self.status,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "eta": self.eta(),
+            "report": self.report.model_dump(mode="json") if self.report else None,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    def __init__(self, ttl_seconds: float = 3600.0, max_jobs: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._jobs: Dict[str, Job] = {}
+
+    def submit(
+        self,
+        report_type: str,
+        model: Optional[str],
+        params: Dict[str, Any],
+        run: Callable[[], Awaitable[Report]],
+        estimate: Estimate,
+    ) -> Job:
+        """
+        Start ``run`` as a job; ``estimate`` is the completion time expected
+        before any of its data has been fetched.
+        """
+        self._prune()
+        if len(self._jobs) >= self.max_jobs:
+            raise JobQueueFull(f"{len(self._jobs)} jobs are already kept")
+        job = Job(uuid.uuid4().hex, report_type, model, params, estimates=[estimate])
+        self._jobs[job.id] = job
+        job.task = asyncio.get_running_loop().create_task(self._run(job, run))
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is not None and not job.done and job.task is not None:
+            job.task.cancel()
+        return job
+
+    async def _run(self, job: Job, run: Callable[[], Awaitable[Report]]) -> None:
+        # The job outlives its request: batch priority, no caller deadline, its own estimates
+        run_as_background()
+        current_deadline.set(None)
+        request_estimates.set(job.estimates)
+        job.status = "running"
+        try:
+            job.report = await run()
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = {
+                "status_code": getattr(e, "status_code", 500),
+                "detail": getattr(e, "detail", None) or str(e),
+            }
+        finally:
+            job.finished_at = time.time()
+            job.task = None
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+
+job_queue = JobQueue(ttl_seconds=JOB_TTL_SECONDS, max_jobs=MAX_JOBS)
@@ -0,0 +1,93 @@
+"""
+Event-loop lag monitoring and slow-callback logging.
+
+A background task sleeps for a fixed interval and measures how late it
+wakes up; the delay is the time the loop spent running other callbacks.
+Lags go into a fixed-bucket histogram. With ``debug`` the loop's own debug
+mode is switched on and asyncio (or uvloop) logs every callback that runs
+longer than the slow threshold, naming its handle; debug mode has a cost,
+so it is meant for investigations rather than normal operation.
+"""
+import asyncio
+import bisect
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger("app.loop")
+
+# Upper bounds of the histogram buckets in milliseconds (last one open)
+LAG_BUCKETS_MS: List[float] = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.5, slow_threshold: float = 0.1, debug: bool = False):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.debug = debug
+        self.buckets = [0] * (len(LAG_BUCKETS_MS) + 1)
+        self.samples = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def observe(self, lag: float) -> None:
+        self.samples += 1
+        self.total_lag += lag
+        self.max_lag = max(self.max_lag, lag)
+        self.buckets[bisect.bisect_left(LAG_BUCKETS_MS, lag * 1000)] += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Upper bound (ms) of the bucket holding the ``q`` quantile."""
+        if not self.samples:
+            return None
+        rank = q * self.samples
+        seen = 0
+        for bound, count in zip(LAG_BUCKETS_MS + [float("inf")], self.buckets):
+            seen += count
+            if seen >= rank:
+                return bound if bound != float("inf") else round(self.max_lag * 1000, 1)
+        return round(self.max_lag * 1000, 1)
+
+    def stats(self) -> Dict[str, object]:
+        labels = [f"le_{int(b)}ms" for b in LAG_BUCKETS_MS] + ["gt_5000ms"]
+        return {
+            "interval_seconds": self.interval,
+            "samples": self.samples,
+            "mean_lag_ms": round(self.total_lag / self.samples * 1000, 2) if self.samples else None,
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "histogram": dict(zip(labels, self.buckets)),
+            "slow_callback_logging": self.debug,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.monotonic() - expected)
+            self.observe(lag)
+            if lag >= self.slow_threshold:
+                logger.warning("event loop lag %.1f ms", lag * 1000)
+
+    def start(self) -> None:
+        if self._task is None:
+            loop = asyncio.get_running_loop()
+            if self.debug:
+                loop.set_debug(True)
+                loop.slow_callback_duration = self.slow_threshold
+            self._task = loop.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+loop_monitor = LoopLagMonitor(
+    interval=float(os.getenv("LOOP_MONITOR_INTERVAL_SECONDS", "0.5")),
+    slow_threshold=float(os.getenv("LOOP_SLOW_CALLBACK_MS", "100")) / 1000,
+    debug=os.getenv("LOOP_DEBUG", "0") == "1",
+)
@@ -0,0 +1,134 @@
+"""
+In-memory catalog of the models available on the Ollama fleet.
+
+The catalog is refreshed in the background from ``/api/tags`` (installed
+models) and ``/api/ps`` (models loaded in memory) of every configured
+instance, so listing models and validating a requested model cost no
+round-trip to Ollama. When a refresh fails the previous catalog is kept;
+until the first successful refresh nothing is rejected as unknown. A model
+whose digest changes (re-pulled) or that disappears has its cached prefix
+contexts dropped.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from app.services.ollama_client import OllamaClient
+from app.services.prefix_cache import prefix_cache
+
+logger = logging.getLogger("app.model_catalog")
+
+
+def _names(name: str) -> List[str]:
+    # Ollama resolves "phi4" to "phi4:latest"
+    return [name, f"{name}:latest"] if ":" not in name else [name]
+
+
+class ModelCatalog:
+    def __init__(self, client: OllamaClient, refresh_seconds: float = 60.0):
+        self.client = client
+        self.refresh_seconds = refresh_seconds
+        self.refreshed_at: Optional[float] = None
+        self.error: Optional[str] = None
+        # name -> Ollama's tag entry, plus the instances that have it and those that have it loaded
+        self._models: Dict[str, Dict[str, Any]] = {}
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.refreshed_at is not None
+
+    def resolve(self, name: str) -> Optional[str]:
+        """The catalog name of ``name``, or ``None`` when it is not installed."""
+        for candidate in _names(name):
+            if candidate in self._models:
+                return candidate
+        return None
+
+    def is_known(self, name: str) -> bool:
+        """Whether ``name`` may be used; anything goes until the catalog is loaded."""
+        return not self.loaded or self.resolve(name) is not None
+
+    def names(self) -> List[str]:
+        return sorted(self._models)
+
+    async def listing(self) -> Dict[str, Any]:
+        """The catalog in the shape of Ollama's ``/api/tags``, with fleet details."""
+        if not self.loaded:
+            await self.refresh()
+        return {
+            "models": [self._models[name] for name in self.names()],
+            "refreshed_at": self.refreshed_at,
+            "age_seconds": round(time.time() - self.refreshed_at, 1),
+            "error": self.error,
+        }
+
+    async def refresh(self) -> None:
+        """
+        Rebuild the catalog from every instance; raises only when no
+        instance answered and there is no earlier catalog to keep.
+        """
+        async with self._lock:
+            instances = self.client.instances
+            tags = await asyncio.gather(*(self.client.list_models(i) for i in instances), return_exceptions=True)
+            running = await asyncio.gather(*(self.client.list_running(i) for i in instances), return_exceptions=True)
+            models: Dict[str, Dict[str, Any]] = {}
+            errors = []
+            for instance, listed, ps in zip(instances, tags, running):
+                if isinstance(listed, Exception):
+                    errors.append(f"{instance}: {listed}")
+                    continue
+                loaded = set() if isinstance(ps, Exception) else {m.get("name") for m in ps.get("models", [])}
+                for entry in listed.get("models", []):
+                    model = models.setdefault(entry["name"], {**entry, "instances": [], "loaded_on": []})
+                    model["instances"].append(instance)
+                    if entry["name"] in loaded:
+                        model["loaded_on"].append(instance)
+            if len(errors) == len(instances):
+                self.error = "; ".join(errors)
+                if not self.loaded:
+                    raise RuntimeError(self.error)
+                logger.warning("model catalog refresh failed, keeping the previous one: %s", self.error)
+                return
+            previous, self._models = self._models, models
+            self.refreshed_at = time.time()
+            self._invalidate_replaced(previous, models)
+            self.error = "; ".join(errors) or None
+
+    @staticmethod
+    def _invalidate_replaced(previous: Dict[str, Dict[str, Any]], current: Dict[str, Dict[str, Any]]) -> None:
+        # A re-pulled or removed model must not reuse contexts evaluated by its old weights
+        for name, entry in previous.items():
+            replaced = current.get(name)
+            if replaced is not None and replaced.get("digest") == entry.get("digest"):
+                continue
+            aliases = {name, name[: -len(":latest")]} if name.endswith(":latest") else {name}
+            dropped = sum(prefix_cache.invalidate(alias) for alias in aliases)
+            if dropped:
+                logger.info("model %s changed, dropped %d cached prefix contexts", name, dropped)
+
+    def start(self) -> None:
+        if self.refresh_seconds > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("model catalog refresh failed")
+            await asyncio.sleep(self.refresh_seconds)
+
+
+model_catalog = ModelCatalog(
+    OllamaClient(),
+    refresh_seconds=float(os.getenv("MODEL_CATALOG_REFRESH_SECONDS", "60")),
+)
@@ -0,0 +1,132 @@
+"""
+Load-adaptive model routing.
+
+Each report type has a preferred model and an ordered list of lighter
+fallbacks. When the Ollama queue is deep or a model's observed latency is
+above threshold, the request is served by a lighter model instead, and the
+decision is recorded in the report metadata.
+"""
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.services.scheduler import scheduler
+
+# The phi family from models.txt, heaviest first
+MODEL_FAMILY: List[str] = [
+    "phi4-reasoning:plus",
+    "phi4-reasoning",
+    "phi4",
+    "phi4:mini",
+    "phi3:mini",
+]
+
+DEFAULT_MODEL = "phi3:mini"
+
+
+@dataclass
+class ModelRoute:
+    preferred: str
+    fallbacks: List[str] = field(default_factory=list)
+
+
+# Keyed by full report type first, then by router prefix
+MODEL_ROUTES: Dict[str, ModelRoute] = {
+    "executive": ModelRoute("phi4", ["phi4:mini", "phi3:mini"]),
+    "processes.forensics": ModelRoute("phi4:mini", ["phi3:mini"]),
+    "processes.threat-hunting": ModelRoute("phi4:mini", ["phi3:mini"]),
+}
+
+
+@dataclass
+class ModelDecision:
+    model: str
+    requested: str
+    reason: Optional[str] = None
+
+    @property
+    def downgraded(self) -> bool:
+        return self.model != self.requested
+
+    def metadata(self) -> dict:
+        if not self.downgraded:
+            return {}
+        return {
+            "model_requested": self.requested,
+            "model_downgraded": True,
+            "downgrade_reason": self.reason,
+        }
+
+
+class ModelPolicy:
+    def __init__(
+        self,
+        queue_depth_threshold: int = 4,
+        latency_threshold_seconds: float = 90.0,
+        enabled: bool = True,
+        alpha: float = 0.3,
+        latency_window_seconds: float = 600.0,
+    ):
+        self.queue_depth_threshold = max(1, queue_depth_threshold)
+        self.latency_threshold_seconds = latency_threshold_seconds
+        self.enabled = enabled
+        self.alpha = alpha
+        # A downgraded model gets no new samples, so old ones must expire
+        self.latency_window_seconds = latency_window_seconds
+        self._latency: Dict[str, Tuple[float, float]] = {}
+
+    def route_for(self, report_type: str) -> ModelRoute:
+        route = MODEL_ROUTES.get(report_type) or MODEL_ROUTES.get(report_type.split(".")[0])
+        return route or ModelRoute(DEFAULT_MODEL)
+
+    def fallback_chain(self, report_type: str, requested: Optional[str] = None) -> List[str]:
+        """
+        Candidate models for a report, preferred first.
+        """
+        route = self.route_for(report_type)
+        first = requested or route.preferred
+        if first in MODEL_FAMILY:
+            lighter = MODEL_FAMILY[MODEL_FAMILY.index(first) + 1:]
+        else:
+            lighter = [m for m in route.fallbacks if m != first]
+        return [first] + lighter
+
+    def observe_latency(self, model: str, seconds: float) -> None:
+        previous = self.observed_latency(model)
+        value = seconds if previous is None else self.alpha * seconds + (1 - self.alpha) * previous
+        self._latency[model] = (value, time.monotonic())
+
+    def observed_latency(self, model: str) -> Optional[float]:
+        sample = self._latency.get(model)
+        if sample is None or time.monotonic() - sample[1] > self.latency_window_seconds:
+            return None
+        return sample[0]
+
+    def select(self, report_type: str, requested: Optional[str] = None) -> ModelDecision:
+        chain = self.fallback_chain(report_type, requested)
+        decision = ModelDecision(model=chain[0], requested=chain[0])
+        if not self.enabled or len(chain) == 1:
+            return decision
+
+        depth = scheduler.queue_depth()
+        index = min(depth // self.queue_depth_threshold, len(chain) - 1)
+        if index:
+            decision.reason = f"queue_depth={depth}"
+
+        while index < len(chain) - 1:
+            latency = self.observed_latency(chain[index])
+            if latency is None or latency <= self.latency_threshold_seconds:
+                break
+            decision.reason = f"latency {chain[index]}={latency:.1f}s"
+            index += 1
+
+        decision.model = chain[index]
+        return decision
+
+
+model_policy = ModelPolicy(
+    queue_depth_threshold=int(os.getenv("MODEL_DOWNGRADE_QUEUE_DEPTH", "4")),
+    latency_threshold_seconds=float(os.getenv("MODEL_DOWNGRADE_LATENCY_SECONDS", "90")),
+    enabled=os.getenv("MODEL_DOWNGRADE_ENABLED", "true").lower() == "true",
+)
@@ -2,34 +2,115 @@
 Ollama API client implementation.
 """
 import httpx
-from typing import Dict, Any
+from contextlib import contextmanager
+from typing import AsyncIterator, Dict, Any, Iterator, List, Optional
+import json
 import os
 
+from app.services.timing import phase
+
+# In-flight generations per Ollama instance, shared by all clients
+_inflight: Dict[str, int] = {}
+
+DEFAULT_BASE_URL = "http://192.168.1.50:11434"
+
+
+def ollama_instances(base_url: str = DEFAULT_BASE_URL) -> List[str]:
+    """
+    The Ollama instances to use: ``OLLAMA_BASE_URLS`` (comma separated) or
+    the single ``OLLAMA_BASE_URL``.
+    """
+    urls = os.getenv("OLLAMA_BASE_URLS", "")
+    return [u.strip().rstrip("/") for u in urls.split(",") if u.strip()] or [os.getenv("OLLAMA_BASE_URL", base_url)]
+
+
 class OllamaClient:
-    def __init__(self, base_url: str = "http://192.168.1.50:11434"):
+    def __init__(self, base_url: str = DEFAULT_BASE_URL):
         self.base_url = os.getenv("OLLAMA_BASE_URL", base_url)
+        self.instances: List[str] = ollama_instances(self.base_url)
         self.client = httpx.AsyncClient(timeout=120.0)
-    
-    
-    async def generate(self, model: str, prompt: str) -> str:
+
+    @contextmanager
+    def _instance(self) -> Iterator[str]:
+        """
+        Pick the instance with the fewest generations in flight.
+        """
+        url = min(self.instances, key=lambda u: _inflight.get(u, 0))
+        _inflight[url] = _inflight.get(url, 0) + 1
+        try:
+            yield url
+        finally:
+            _inflight[url] -= 1
+
+
+    async def generate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> str:
         """
         Generate text using the specified Ollama model.
         """
-        response = await self.client.post(
-            f"{self.base_url}/api/generate",
-            json={
-                "model": model,
-                "prompt": prompt,
-                "stream": False  # Set to True if you want streaming responses
-            }
-        )
+        result = await self.generate_raw(model, prompt, options)
+        return result["response"]
+
+    async def generate_raw(
+        self,
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        context: Optional[List[int]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Generate text and return the full Ollama response, including the
+        eval counts and durations used to measure token rates and the
+        ``context`` that can continue this conversation.
+        """
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False  # Set to True if you want streaming responses
+        }
+        if options:
+            payload["options"] = options
+        if context:
+            payload["context"] = context
+        with phase("ollama"), self._instance() as base_url:
+            response = await self.client.post(f"{base_url}/api/generate", json=payload)
         response.raise_for_status() # Ensure we raise an error for bad responses
-        return response.json()["response"]
-    
-    async def list_models(self) -> Dict[str, Any]:
+        return response.json()
+
+    async def generate_stream(
+        self,
+        model: str,
+        prompt: str,
+        options: Optional[Dict[str, Any]] = None,
+        context: Optional[List[int]] = None,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream generation chunks; the last chunk has ``done`` set and carries
+        the same counters as a non-streamed response.
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        if context:
+            payload["context"] = context
+        with phase("ollama"), self._instance() as base_url:
+            async with self.client.stream("POST", f"{base_url}/api/generate", json=payload) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if line:
+                        yield json.loads(line)
+
+    async def list_models(self, instance: Optional[str] = None) -> Dict[str, Any]:
+        """
+        List available models (of ``instance``, by default the main one).
+        """
+        response = await self.client.get(f"{instance or self.base_url}/api/tags")
+        response.raise_for_status()
+        return response.json()
+
+    async def list_running(self, instance: Optional[str] = None) -> Dict[str, Any]:
         """
-        List available models.
+        List the models currently loaded in memory.
         """
-        response = await self.client.get(f"{self.base_url}/api/tags")
+        response = await self.client.get(f"{instance or self.base_url}/api/ps")
         response.raise_for_status()
-        return response.json()
\ No newline at end of file
+        return response.json()
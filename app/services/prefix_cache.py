@@ -0,0 +1,97 @@
+"""
+Reuse of Ollama context tokens for static prompt preambles.
+
+Every report of a type starts with the same long role and structure
+preamble. It is evaluated once per model as its own turn; the ``context``
+Ollama returns is stored and later requests send only the data body on
+top of it. Entries are keyed by model and a hash of the preamble text, so
+editing a template or switching model never reuses a stale context.
+"""
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from app.services.ollama_client import OllamaClient
+
+# Ends the priming turn so the next message (the data) continues naturally
+PRIMING_INSTRUCTION = """
+    داده‌های گزارش در پیام بعدی ارسال می‌شود. اکنون فقط با «آماده‌ام» پاسخ دهید.
+    """
+
+
+class PrefixContextCache:
+    def __init__(self, max_entries: int = 64, ttl_seconds: float = 3600.0, enabled: bool = True):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[str, Tuple[str, List[int], float]]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    @staticmethod
+    def key(model: str, preamble: str) -> str:
+        digest = hashlib.sha256(preamble.encode("utf-8")).hexdigest()[:16]
+        return f"{model}:{digest}"
+
+    def get(self, model: str, preamble: str) -> Optional[List[int]]:
+        key = self.key(model, preamble)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[2] > self.ttl_seconds:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    async def context_for(
+        self, client: OllamaClient, model: str, preamble: str, num_ctx: int
+    ) -> Optional[List[int]]:
+        """
+        The cached context of ``preamble``, evaluating it on a miss.
+        """
+        if not self.enabled:
+            return None
+        context = self.get(model, preamble)
+        if context is not None:
+            return context
+        key = self.key(model, preamble)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            context = self.get(model, preamble)
+            if context is None:
+                result = await client.generate_raw(
+                    model,
+                    preamble + PRIMING_INSTRUCTION,
+                    {"num_predict": 8, "num_ctx": num_ctx, "temperature": 0},
+                )
+                context = result.get("context")
+                if context:
+                    self._store(key, model, context)
+        return context
+
+    def _store(self, key: str, model: str, context: List[int]) -> None:
+        self._entries[key] = (model, context, time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._locks.pop(evicted, None)
+
+    def invalidate(self, model: Optional[str] = None) -> int:
+        """
+        Drop cached contexts, for one model or all; returns how many.
+        """
+        keys = [k for k, (m, _, _) in self._entries.items() if model is None or m == model]
+        for key in keys:
+            del self._entries[key]
+            self._locks.pop(key, None)
+        return len(keys)
+
+
+prefix_cache = PrefixContextCache(
+    max_entries=int(os.getenv("PREFIX_CACHE_MAX_ENTRIES", "64")),
+    ttl_seconds=float(os.getenv("PREFIX_CACHE_TTL_SECONDS", "3600")),
+    enabled=os.getenv("PREFIX_CACHE_ENABLED", "true").lower() == "true",
+)
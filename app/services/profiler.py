@@ -0,0 +1,83 @@
+"""
+On-demand CPU and memory profiling of the running server.
+"""
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import tempfile
+import time
+import tracemalloc
+import zipfile
+from typing import Tuple
+
+_profile_lock = asyncio.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Another capture is already running."""
+
+
+async def capture_profile(seconds: float, top: int = 50) -> bytes:
+    """
+    Profile the event-loop thread for ``seconds`` and return a zip with:
+
+    - ``cpu.pstats``: cProfile data, loadable with ``pstats``/snakeviz
+    - ``cpu.txt``: the ``top`` functions by cumulative time
+    - ``memory.snapshot``: a tracemalloc snapshot (``tracemalloc.Snapshot.load``)
+    - ``memory.txt``: the ``top`` allocation sites by size
+
+    Everything scheduled on the loop during the window is profiled, which
+    is where blocking work shows up. If tracemalloc was not already
+    running it is enabled only for the window, so the snapshot holds the
+    allocations made (and still alive) during it.
+    """
+    if _profile_lock.locked():
+        raise ProfilerBusy()
+    async with _profile_lock:
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(25)
+        profiler = cProfile.Profile()
+        profiler.enable()
+        started = time.monotonic()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+        elapsed = time.monotonic() - started
+        # Serializing the results is CPU work of its own; keep it off the loop
+        return await asyncio.to_thread(_package, profiler, snapshot, elapsed, top)
+
+
+def _package(profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot, elapsed: float, top: int) -> bytes:
+    with tempfile.TemporaryDirectory() as tmp:
+        pstats_path, snapshot_path = os.path.join(tmp, "cpu.pstats"), os.path.join(tmp, "memory.snapshot")
+        profiler.dump_stats(pstats_path)
+        snapshot.dump(snapshot_path)
+        cpu_text, memory_text = _summaries(profiler, snapshot, elapsed, top)
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.write(pstats_path, "cpu.pstats")
+            archive.write(snapshot_path, "memory.snapshot")
+            archive.writestr("cpu.txt", cpu_text)
+            archive.writestr("memory.txt", memory_text)
+        return buffer.getvalue()
+
+
+def _summaries(
+    profiler: cProfile.Profile, snapshot: tracemalloc.Snapshot, elapsed: float, top: int
+) -> Tuple[str, str]:
+    stream = io.StringIO()
+    stream.write(f"Profiled event-loop thread for {elapsed:.1f}s\n\n")
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(top)
+
+    lines = [f"Top {top} allocation sites (tracemalloc)\n"]
+    for stat in snapshot.statistics("lineno")[:top]:
+        lines.append(str(stat))
+    return stream.getvalue(), "\n".join(lines) + "\n"
@@ -0,0 +1,33 @@
+"""
+Report prompt representation.
+"""
+from typing import Dict
+
+
+class ReportPrompt(str):
+    """
+    A prompt made of a static ``preamble`` (role, required structure and
+    style rules of its report type) followed by the dynamic data ``body``.
+
+    It behaves as the full prompt text everywhere a plain string is
+    expected; the split lets the generator reuse the Ollama context of the
+    preamble across requests.
+    """
+
+    preamble: str
+    body: str
+    # Hashes of the data the prompt was built from (see ``sources.tracks_sources``)
+    sources: Dict[str, str]
+
+    def __new__(cls, preamble: str, body: str):
+        prompt = super().__new__(cls, preamble + body)
+        prompt.preamble = preamble
+        prompt.body = body
+        prompt.sources = {}
+        return prompt
+
+    def extend(self, text: str) -> "ReportPrompt":
+        """The same prompt with ``text`` appended to the body."""
+        prompt = ReportPrompt(self.preamble, self.body + text)
+        prompt.sources = self.sources
+        return prompt
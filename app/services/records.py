@@ -0,0 +1,115 @@
+"""
+Columnar decoding of large backend lists.
+
+Validating thousands of activity or incident dicts into Pydantic models
+builds an object graph per row on the event loop, only for the prompt
+builders to read a few fields. A ``RecordSpec`` names those fields, and
+``RecordColumns`` keeps only them, column by column: a page body is
+parsed from its raw bytes by the C JSON decoder, each field is pulled out
+with one comprehension, and the page's dicts are dropped. Categorical
+strings (status, severity, organization) are interned, so a column of
+thousands of rows holds a handful of distinct strings. Required fields
+are checked as the router's model would check them, and ``rows`` returns
+``__slots__`` rows with the model's attribute names for the few rows a
+prompt lists.
+"""
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel
+
+
+class RecordError(ValueError):
+    """A backend row lacks a required field."""
+
+
+def _row_type(name: str, fields: Tuple[str, ...]) -> type:
+    def __init__(self, *values):
+        for field, value in zip(fields, values):
+            setattr(self, field, value)
+
+    def __repr__(self):
+        return f"{name}(" + ", ".join(f"{field}={getattr(self, field)!r}" for field in fields) + ")"
+
+    return type(name, (), {"__slots__": fields, "__init__": __init__, "__repr__": __repr__})
+
+
+class RecordSpec:
+    def __init__(
+        self,
+        name: str,
+        fields: Sequence[str],
+        categories: Iterable[str] = (),
+        required: Iterable[str] = (),
+    ):
+        self.fields = tuple(fields)
+        self.categories = frozenset(categories) & set(self.fields)
+        self.required = tuple(field for field in self.fields if field in set(required))
+        self.positions = {field: index for index, field in enumerate(self.fields)}
+        self.row_type = _row_type(name, self.fields)
+
+    @classmethod
+    def from_model(
+        cls,
+        model: Type[BaseModel],
+        fields: Optional[Sequence[str]] = None,
+        categories: Iterable[str] = (),
+    ) -> "RecordSpec":
+        """The spec of ``model``'s fields (or a subset), required as in the model."""
+        fields = tuple(fields or model.model_fields)
+        required = [name for name in fields if name in model.model_fields and model.model_fields[name].is_required()]
+        return cls(model.__name__ + "Row", fields, categories, required)
+
+
+class RecordColumns:
+    """Rows of a backend list stored by column, in the order received."""
+
+    __slots__ = ("spec", "columns")
+
+    def __init__(self, spec: RecordSpec):
+        self.spec = spec
+        self.columns: Dict[str, List[Any]] = {field: [] for field in spec.fields}
+
+    @classmethod
+    def from_items(cls, spec: RecordSpec, items: Sequence[Dict[str, Any]]) -> "RecordColumns":
+        """Columns of decoded JSON objects."""
+        table = cls(spec)
+        try:
+            table._extend({field: [item.get(field) for item in items] for field in spec.fields})
+        except AttributeError:
+            raise RecordError("Expected a list of objects")
+        return table
+
+    @classmethod
+    def from_rows(cls, spec: RecordSpec, rows: Sequence[Sequence[Any]]) -> "RecordColumns":
+        """Columns of rows holding the spec's fields in order (e.g. SQLite rows)."""
+        table = cls(spec)
+        table._extend({field: [row[index] for row in rows] for field, index in spec.positions.items()})
+        return table
+
+    def _extend(self, columns: Dict[str, List[Any]]) -> None:
+        for field in self.spec.required:
+            if None in columns[field]:
+                row = columns[field].index(None)
+                raise RecordError(f"Row {len(self) + row} is missing required field '{field}'")
+        for field, values in columns.items():
+            if field in self.spec.categories:
+                values = [sys.intern(value) if value.__class__ is str else value for value in values]
+            self.columns[field].extend(values)
+
+    def __len__(self) -> int:
+        return len(self.columns[self.spec.fields[0]]) if self.spec.fields else 0
+
+    def __getitem__(self, field: str) -> List[Any]:
+        return self.columns[field]
+
+    def rows(self, indices: Optional[Iterable[int]] = None) -> List[Any]:
+        """``__slots__`` rows with the spec's fields as attributes."""
+        row_type = self.spec.row_type
+        columns = [self.columns[field] for field in self.spec.fields]
+        if indices is None:
+            indices = range(len(self))
+        return [row_type(*(column[index] for column in columns)) for index in indices]
+
+    def head(self, count: int) -> List[Any]:
+        return self.rows(range(min(count, len(self))))
@@ -0,0 +1,450 @@
+"""
+Local SQLite replica of the backend's report datasets.
+
+A background task polls each dataset for records changed since its
+watermark (the largest ``updatedAt`` seen, sent as ``updatedSince``) and
+upserts them. A dataset without a watermark, because the backend does not
+report ``updatedAt``, is fully re-read on each sync and replaced, and every
+dataset is fully re-read periodically so deletions are picked up. Rows are
+stored as JSON next to indexed process type, status, organization and date
+columns, so routers can read them locally in milliseconds. Timestamps are
+compared parsed, not as strings, so backends mixing ``T`` and space
+separators or zone offsets neither stall the watermark nor misorder rows.
+Datasets whose routers stand in for a backend listing (critical incidents
+and vulnerabilities, organizations) are returned in the backend's own
+order, recorded at each full read; the others newest first.
+
+When several workers share the file, a lease row lets only one of them
+sync at a time. Readers check ``is_fresh`` and fall back to the backend
+when the replica is disabled or stale.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.services.backend_client import backend
+from app.services.records import RecordColumns, RecordSpec
+from app.services.sources import record_source
+
+logger = logging.getLogger("app.replica")
+
+
+@dataclass(frozen=True)
+class ReplicaDataset:
+    name: str
+    path: str
+    date_field: str
+    status_field: Optional[str] = "status"
+    organization_field: Optional[str] = "organizationName"
+    # "{process}" in ``path`` is filled with each activity process type
+    per_process: bool = False
+    # Query results in the backend's listing order instead of newest first
+    backend_order: bool = False
+
+
+DATASETS: Tuple[ReplicaDataset, ...] = (
+    ReplicaDataset("activities", "/activities/by-process/{process}", "createdDate", per_process=True),
+    ReplicaDataset("incidents", "/incidents", "detectionDate", backend_order=True),
+    ReplicaDataset("vulnerabilities", "/vulnerabilities", "discoveredDate", backend_order=True),
+    ReplicaDataset("assessments", "/assessments", "assessmentDate"),
+    ReplicaDataset(
+        "organizations", "/organizations", "createdDate",
+        status_field=None, organization_field="name", backend_order=True,
+    ),
+)
+
+UPDATED_FIELD = "updatedAt"
+SINCE_PARAM = "updatedSince"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    dataset TEXT NOT NULL,
+    id TEXT NOT NULL,
+    process_type TEXT,
+    status TEXT,
+    organization TEXT,
+    date TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (dataset, id)
+);
+CREATE INDEX IF NOT EXISTS records_process ON records (dataset, process_type, date);
+CREATE INDEX IF NOT EXISTS records_status ON records (dataset, status);
+CREATE INDEX IF NOT EXISTS records_organization ON records (dataset, organization);
+CREATE INDEX IF NOT EXISTS records_date ON records (dataset, date);
+CREATE TABLE IF NOT EXISTS sync_state (
+    dataset TEXT NOT NULL,
+    partition TEXT NOT NULL,
+    watermark TEXT,
+    last_attempt REAL,
+    last_success REAL,
+    last_error TEXT,
+    last_full REAL,
+    PRIMARY KEY (dataset, partition)
+);
+CREATE TABLE IF NOT EXISTS sync_lease (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """An ISO date/time as naive UTC when it has an offset, else as given."""
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def _date_column(value: Any) -> Optional[str]:
+    # Wall-clock time with a "T" separator, as analytics.parse_timestamps reads dates
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.strip())
+    except ValueError:
+        return None
+    return parsed.replace(tzinfo=None).isoformat(timespec="seconds")
+
+
+class BackendReplica:
+    def __init__(
+        self,
+        path: str,
+        interval: float = 60.0,
+        full_interval: float = 3600.0,
+        max_age: float = 300.0,
+        enabled: bool = False,
+    ):
+        self.path = path
+        self.interval = interval
+        self.full_interval = full_interval
+        self.max_age = max_age
+        self.enabled = enabled
+        self.datasets = {dataset.name: dataset for dataset in DATASETS}
+        self.activity_processes: Tuple[str, ...] = ()
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self._local = threading.local()
+        self._task: Optional[asyncio.Task] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            if "position" not in {row[1] for row in conn.execute("PRAGMA table_info(records)")}:
+                try:
+                    conn.execute("ALTER TABLE records ADD COLUMN position INTEGER")
+                except sqlite3.OperationalError:
+                    pass  # another worker added it first
+            conn.execute("CREATE INDEX IF NOT EXISTS records_position ON records (dataset, position)")
+            self._local.conn = conn
+        return conn
+
+    # --- Sync ---
+
+    def start(self, activity_processes: Iterable[str]) -> None:
+        self.activity_processes = tuple(activity_processes)
+        if self.enabled and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if await asyncio.to_thread(self._take_lease):
+                    await self.sync_all()
+            except Exception:
+                logger.exception("replica sync failed")
+            await asyncio.sleep(self.interval)
+
+    def _take_lease(self) -> bool:
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, expires_at FROM sync_lease WHERE id = 1").fetchone()
+            taken = row is None or row["owner"] == self.owner or row["expires_at"] <= now
+            if taken:
+                conn.execute(
+                    "INSERT OR REPLACE INTO sync_lease (id, owner, expires_at) VALUES (1, ?, ?)",
+                    (self.owner, now + self.interval * 3),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return taken
+
+    async def sync_all(self) -> None:
+        for dataset in self.datasets.values():
+            partitions = self.activity_processes if dataset.per_process else ("",)
+            for partition in partitions:
+                await self.sync(dataset, partition)
+
+    async def sync(self, dataset: ReplicaDataset, partition: str = "") -> int:
+        """Apply the backend's changes for one dataset (partition); returns rows written."""
+        state = await asyncio.to_thread(self._state, dataset.name, partition)
+        watermark = state["watermark"] if state else None
+        if state is None or state["last_full"] is None or time.time() - state["last_full"] > self.full_interval:
+            watermark = None
+        params = {SINCE_PARAM: watermark} if watermark else None
+        path = dataset.path.format(process=partition)
+        written, seen_ids, new_watermark = 0, set(), watermark
+        latest = parse_timestamp(watermark)
+        full = watermark is None
+        try:
+            async for page in backend.iter_page_lists(path, params, cached=False):
+                # A full read numbers the rows in the backend's order
+                rows = [self._row(dataset, partition, item) + (written + index,) for index, item in enumerate(page)]
+                seen_ids.update(row[1] for row in rows)
+                for item in page:
+                    updated = parse_timestamp(item.get(UPDATED_FIELD))
+                    if updated is not None and (latest is None or updated > latest):
+                        # Sent back as the backend wrote it
+                        latest, new_watermark = updated, item[UPDATED_FIELD]
+                await asyncio.to_thread(self._upsert, dataset, partition, rows, full)
+                written += len(rows)
+        except Exception as e:
+            await asyncio.to_thread(self._record_sync, dataset.name, partition, watermark, str(e), False)
+            raise
+        if full:
+            # A full read: drop rows the backend no longer returns
+            await asyncio.to_thread(self._delete_missing, dataset, partition, seen_ids)
+        await asyncio.to_thread(self._record_sync, dataset.name, partition, new_watermark, None, full)
+        return written
+
+    @staticmethod
+    def _row(dataset: ReplicaDataset, partition: str, item: Dict[str, Any]) -> Tuple:
+        data = json.dumps(item, ensure_ascii=False, sort_keys=True)
+        record_id = item.get("id")
+        if record_id is None:
+            record_id = hashlib.sha256(data.encode("utf-8")).hexdigest()[:32]
+        return (
+            dataset.name,
+            str(record_id),
+            partition or item.get("processType"),
+            item.get(dataset.status_field) if dataset.status_field else None,
+            item.get(dataset.organization_field) if dataset.organization_field else None,
+            _date_column(item.get(dataset.date_field)),
+            data,
+        )
+
+    def _upsert(self, dataset: ReplicaDataset, partition: str, rows: Sequence[Tuple], full: bool) -> None:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            position = "excluded.position"
+            if not full:
+                # Records new since the last full read go after the known ones; changed ones keep their place
+                clause, args = "dataset = ?", [dataset.name]
+                if dataset.per_process:
+                    clause, args = clause + " AND process_type = ?", args + [partition]
+                base = conn.execute(
+                    f"SELECT COALESCE(MAX(position), -1) + 1 FROM records WHERE {clause}", args
+                ).fetchone()[0]
+                rows = [row[:-1] + (base + index,) for index, row in enumerate(rows)]
+                position = "COALESCE(records.position, excluded.position)"
+            conn.executemany(
+                "INSERT INTO records (dataset, id, process_type, status, organization, date, data, position) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (dataset, id) DO UPDATE SET process_type = excluded.process_type, "
+                "status = excluded.status, organization = excluded.organization, date = excluded.date, "
+                f"data = excluded.data, position = {position}",
+                rows,
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _delete_missing(self, dataset: ReplicaDataset, partition: str, seen_ids: set) -> None:
+        conn = self._connection()
+        clause, args = "dataset = ?", [dataset.name]
+        if dataset.per_process:
+            clause, args = clause + " AND process_type = ?", args + [partition]
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stored = [row[0] for row in conn.execute(f"SELECT id FROM records WHERE {clause}", args)]
+            stale = [(dataset.name, record_id) for record_id in stored if record_id not in seen_ids]
+            conn.executemany("DELETE FROM records WHERE dataset = ? AND id = ?", stale)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _state(self, dataset: str, partition: str) -> Optional[sqlite3.Row]:
+        return self._connection().execute(
+            "SELECT * FROM sync_state WHERE dataset = ? AND partition = ?", (dataset, partition)
+        ).fetchone()
+
+    def _record_sync(
+        self, dataset: str, partition: str, watermark: Optional[str], error: Optional[str], full: bool
+    ) -> None:
+        now = time.time()
+        self._connection().execute(
+            "INSERT INTO sync_state (dataset, partition, watermark, last_attempt, last_success, last_error, last_full) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (dataset, partition) DO UPDATE SET watermark = excluded.watermark, "
+            "last_attempt = excluded.last_attempt, last_error = excluded.last_error, "
+            "last_success = COALESCE(excluded.last_success, sync_state.last_success), "
+            "last_full = COALESCE(excluded.last_full, sync_state.last_full)",
+            (dataset, partition, watermark, now, None if error else now, error, now if full else None),
+        )
+
+    # --- Reads ---
+
+    def _last_success(self, dataset: str) -> Optional[float]:
+        """Time of the oldest successful sync over the dataset's partitions."""
+        rows = self._connection().execute(
+            "SELECT last_success FROM sync_state WHERE dataset = ?", (dataset,)
+        ).fetchall()
+        if not rows or any(row["last_success"] is None for row in rows):
+            return None
+        return min(row["last_success"] for row in rows)
+
+    async def is_fresh(self, dataset: str) -> bool:
+        if not self.enabled:
+            return False
+        last_success = await asyncio.to_thread(self._last_success, dataset)
+        return last_success is not None and time.time() - last_success <= self.max_age
+
+    async def query(
+        self,
+        dataset: str,
+        process_type: Optional[str] = None,
+        status: Optional[str] = None,
+        organization: Optional[str] = None,
+        since: Optional[str] = None,
+        limit: Optional[int] = None,
+        match: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Records of ``dataset`` matching the given indexed columns, in the
+        backend's order or newest first (see ``ReplicaDataset``). ``match`` adds conditions on other top-level fields of the
+        record; those are not indexed.
+        """
+        rows = await asyncio.to_thread(
+            self._query, dataset, process_type, status, organization, since, limit, match or {}
+        )
+        record_source(self._source_key(dataset, process_type, status, organization, since, match), rows)
+        return rows
+
+    async def query_columns(
+        self,
+        dataset: str,
+        spec: RecordSpec,
+        process_type: Optional[str] = None,
+        status: Optional[str] = None,
+        organization: Optional[str] = None,
+        since: Optional[str] = None,
+        limit: Optional[int] = None,
+        match: Optional[Dict[str, Any]] = None,
+    ) -> RecordColumns:
+        """
+        Like ``query`` but extract only ``spec``'s fields in SQLite, straight
+        into columns, without decoding each record's JSON.
+        """
+        columns = await asyncio.to_thread(
+            self._query_columns, dataset, spec, process_type, status, organization, since, limit, match or {}
+        )
+        record_source(self._source_key(dataset, process_type, status, organization, since, match), columns.columns)
+        return columns
+
+    @staticmethod
+    def _source_key(dataset, process_type, status, organization, since, match) -> str:
+        return (
+            f"replica:{dataset}?process_type={process_type}&status={status}&organization={organization}&since={since}"
+            + "".join(f"&{field}={value}" for field, value in sorted((match or {}).items()))
+        )
+
+    def _select(self, columns, dataset, process_type, status, organization, since, limit, match) -> sqlite3.Cursor:
+        clauses, args = ["dataset = ?"], [dataset]
+        for column, value in (("process_type", process_type), ("status", status), ("organization", organization)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        for field, value in match.items():
+            clauses.append("json_extract(data, ?) = ?")
+            args.extend([f'$."{field}"', value])
+        if since is not None:
+            clauses.append("date >= ?")
+            args.append(_date_column(since) or since)
+        order = "position" if self.datasets[dataset].backend_order else "date DESC"
+        sql = f"SELECT {columns} FROM records WHERE {' AND '.join(clauses)} ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(limit)
+        return self._connection().execute(sql, args)
+
+    def _query(self, dataset, process_type, status, organization, since, limit, match) -> List[Dict[str, Any]]:
+        rows = self._select("data", dataset, process_type, status, organization, since, limit, match)
+        return [json.loads(row[0]) for row in rows]
+
+    def _query_columns(self, dataset, spec, process_type, status, organization, since, limit, match) -> RecordColumns:
+        # Field names are the spec's own identifiers, never caller input
+        columns = ", ".join(f"json_extract(data, '$.\"{field}\"')" for field in spec.fields)
+        rows = self._select(columns, dataset, process_type, status, organization, since, limit, match).fetchall()
+        return RecordColumns.from_rows(spec, rows)
+
+    async def count(self, dataset: str) -> int:
+        return await asyncio.to_thread(
+            lambda: self._connection().execute("SELECT COUNT(*) FROM records WHERE dataset = ?", (dataset,)).fetchone()[0]
+        )
+
+    def _freshness(self) -> Dict[str, Any]:
+        conn = self._connection()
+        counts = dict(conn.execute("SELECT dataset, COUNT(*) FROM records GROUP BY dataset").fetchall())
+        now = time.time()
+        datasets = {}
+        for name in self.datasets:
+            states = conn.execute("SELECT * FROM sync_state WHERE dataset = ?", (name,)).fetchall()
+            last_success = self._last_success(name)
+            datasets[name] = {
+                "rows": counts.get(name, 0),
+                "partitions": len(states),
+                "last_success": last_success,
+                "age_seconds": round(now - last_success, 1) if last_success else None,
+                "fresh": last_success is not None and now - last_success <= self.max_age,
+                "watermark": max(
+                    (state["watermark"] for state in states if state["watermark"]),
+                    key=lambda watermark: parse_timestamp(watermark) or datetime.min,
+                    default=None,
+                ),
+                "errors": {state["partition"] or name: state["last_error"] for state in states if state["last_error"]},
+            }
+        return {"enabled": self.enabled, "max_age_seconds": self.max_age, "datasets": datasets}
+
+    async def freshness(self) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._freshness)
+
+
+replica = BackendReplica(
+    path=os.getenv("REPLICA_PATH", "/tmp/ollama_report_replica.sqlite3"),
+    interval=float(os.getenv("REPLICA_SYNC_INTERVAL_SECONDS", "60")),
+    full_interval=float(os.getenv("REPLICA_FULL_SYNC_SECONDS", "3600")),
+    max_age=float(os.getenv("REPLICA_MAX_AGE_SECONDS", "300")),
+    enabled=os.getenv("REPLICA_ENABLED", "false").lower() in ("1", "true", "yes"),
+)
@@ -0,0 +1,348 @@
+"""
+Change-driven cache of generated reports.
+
+A report is cached under its type, parameters, model and mode together
+with the fingerprint of its inputs (the prompt text and the hashes of the
+backend payloads it was built from). A request whose freshly built prompt
+has the same fingerprint gets the cached report; otherwise the report is
+generated again. A background watcher checks cached reports ahead of
+requests: it first revalidates the backend sources recorded with each
+report (a conditional GET per source, see ``BackendClient.probe``) and
+rebuilds the prompt only when one of them changed, a source cannot be
+probed, or the day has turned (prompts summarise windows ending today).
+It regenerates, at batch priority, only reports whose fingerprint changed. Entries live in the shared cache, so all
+workers see them and only one worker runs each watcher pass.
+
+Independently of the cache, the last successful report of each report
+type and parameter set is kept (stale-if-error). When a generation fails
+(Ollama down or overloaded) or misses its deadline, that report is served
+instead, marked ``stale`` with its age, and the report is regenerated in
+the background, retried with backoff until Ollama has capacity again.
+Last good reports are pinned in the shared cache, so other cached values
+never evict them, and a served one is saved to the report store again so
+its export link outlives the store's TTL.
+"""
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.models.report import Report
+from app.services.backend_client import backend
+from app.services.deadline import DeadlineExceeded
+from app.services.prompts import ReportPrompt
+from app.services.report_generator import ReportGenerator
+from app.services.report_store import report_store
+from app.services.scheduler import run_as_background
+from app.services.shared_cache import SharedCache, shared_cache
+from app.services.sources import fingerprint
+
+logger = logging.getLogger("app.report_cache")
+
+KEY_PREFIX = "report-cache:"
+LAST_GOOD_PREFIX = "report-last-good:"
+
+
+class ReportCache:
+    def __init__(
+        self,
+        shared: SharedCache,
+        ttl: float = 86400.0,
+        watch_interval: float = 300.0,
+        enabled: bool = True,
+        stale_if_error: bool = True,
+        last_good_ttl: float = 604800.0,
+        retry_seconds: float = 30.0,
+        retry_max_seconds: float = 900.0,
+    ):
+        self.shared = shared
+        self.ttl = ttl
+        self.watch_interval = watch_interval
+        self.enabled = enabled
+        self.stale_if_error = stale_if_error
+        self.last_good_ttl = last_good_ttl
+        self.retry_seconds = retry_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.generator = ReportGenerator()
+        self.backend = backend
+        self.store = report_store
+        self._build_prompt: Optional[Callable[[str, Dict[str, Any]], Awaitable[ReportPrompt]]] = None
+        self._task: Optional[asyncio.Task] = None
+        # Reports to regenerate once Ollama recovers, by last-good key
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._retry_task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def key(report_type: str, params: Dict[str, Any], model: Optional[str], sectioned: bool) -> str:
+        identity = json.dumps([report_type, params, model, sectioned], sort_keys=True, default=str)
+        return KEY_PREFIX + hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+    @staticmethod
+    def last_good_key(report_type: str, params: Dict[str, Any]) -> str:
+        identity = json.dumps([report_type, params], sort_keys=True, default=str)
+        return LAST_GOOD_PREFIX + hashlib.sha256(identity.encode("utf-8")).hexdigest()[:32]
+
+    async def generate(
+        self,
+        model: Optional[str],
+        prompt: ReportPrompt,
+        report_type: str,
+        params: Dict[str, Any],
+        sectioned: bool = False,
+    ) -> Report:
+        """
+        Return the cached report for these inputs, or generate and cache it.
+
+        ``params`` are the keyword arguments of the report type's prompt
+        builder, which lets the watcher rebuild the prompt later.
+
+        If the generation fails or runs out of time, the last good report
+        for ``report_type`` and ``params`` is returned instead when there is
+        one (see ``_serve_stale``).
+        """
+        if self.enabled:
+            key = self.key(report_type, params, model, sectioned)
+            digest = fingerprint(prompt)
+            entry = await self.shared.aget(key)
+            if entry is not None and entry["fingerprint"] == digest:
+                report = Report(**entry["report"])
+                report.metadata = {**(report.metadata or {}), "cache": "hit"}
+                return report
+        try:
+            report = await self.generator.generate_report(model, prompt, report_type=report_type, sectioned=sectioned)
+        except Exception as e:
+            stale = await self._serve_stale(report_type, params, model, sectioned, prompt, e)
+            if stale is None:
+                raise
+            return stale
+        if _cut_by_deadline(report):
+            stale = await self._serve_stale(report_type, params, model, sectioned, prompt, None)
+            if stale is not None:
+                return stale
+        # A report cut short by the caller's deadline is not the report for these inputs
+        if "generation" not in (report.metadata or {}).get("deadline", {}).get("shortened", {}):
+            if self.enabled:
+                await self._store(key, report, prompt, digest, report_type, params, model, sectioned)
+            await self._remember(report, report_type, params)
+        return report
+
+    async def _store(
+        self,
+        key: str,
+        report: Report,
+        prompt: ReportPrompt,
+        digest: str,
+        report_type: str,
+        params: Dict[str, Any],
+        model: Optional[str],
+        sectioned: bool,
+    ) -> None:
+        report.metadata = {**(report.metadata or {}), "cache": "miss", "input_fingerprint": digest}
+        await self.shared.aset(key, {
+            "report": report.model_dump(mode="json"),
+            "fingerprint": digest,
+            "sources": getattr(prompt, "sources", {}),
+            "report_type": report_type,
+            "params": params,
+            "model": model,
+            "sectioned": sectioned,
+            "generated_at": time.time(),
+        }, self.ttl)
+
+    # --- Stale-if-error ---
+
+    async def _remember(self, report: Report, report_type: str, params: Dict[str, Any]) -> None:
+        if self.stale_if_error:
+            await self.shared.aset_pinned(self.last_good_key(report_type, params), {
+                "report": report.model_dump(mode="json"),
+                "generated_at": time.time(),
+            }, self.last_good_ttl)
+
+    async def _serve_stale(
+        self,
+        report_type: str,
+        params: Dict[str, Any],
+        model: Optional[str],
+        sectioned: bool,
+        prompt: ReportPrompt,
+        error: Optional[Exception],
+    ) -> Optional[Report]:
+        """
+        The last good report marked stale, with a regeneration queued;
+        ``None`` when there is none.
+        """
+        if not self.stale_if_error:
+            return None
+        key = self.last_good_key(report_type, params)
+        entry = await self.shared.aget_pinned(key)
+        if entry is None:
+            return None
+        if isinstance(error, DeadlineExceeded):
+            reason = "deadline"
+        elif error is not None:
+            reason = f"generation failed: {error}"
+        else:
+            reason = "deadline: generation stopped before the report was complete"
+        report = Report(**entry["report"])
+        report.metadata = {
+            **(report.metadata or {}),
+            "cache": "stale",
+            "stale": True,
+            "stale_age_seconds": round(time.time() - entry["generated_at"], 1),
+            "stale_reason": reason,
+        }
+        # The stored copy under this id may have expired; exports of it must keep working
+        await self.store.save(report)
+        logger.warning("serving stale %s report (%s)", report_type, reason)
+        self._queue_regeneration(key, report_type, params, model, sectioned, prompt)
+        return report
+
+    def _queue_regeneration(
+        self,
+        key: str,
+        report_type: str,
+        params: Dict[str, Any],
+        model: Optional[str],
+        sectioned: bool,
+        prompt: ReportPrompt,
+    ) -> None:
+        self._pending[key] = {
+            "report_type": report_type,
+            "params": params,
+            "model": model,
+            "sectioned": sectioned,
+            "prompt": prompt,
+        }
+        if self._retry_task is None or self._retry_task.done():
+            # Not the request's context: no caller deadline, timings or estimates
+            self._retry_task = asyncio.get_running_loop().create_task(
+                self._regenerate_pending(), context=contextvars.Context()
+            )
+
+    async def _regenerate_pending(self) -> None:
+        run_as_background("stale-regenerator")
+        delay = self.retry_seconds
+        while self._pending:
+            await asyncio.sleep(delay)
+            for key, item in list(self._pending.items()):
+                try:
+                    await self._regenerate(item)
+                except Exception as e:
+                    # Still no capacity: back off before trying again
+                    delay = min(delay * 2, self.retry_max_seconds)
+                    logger.warning(
+                        "regenerating stale %s failed, retrying in %.0fs: %s", item["report_type"], delay, e
+                    )
+                    break
+                if self._pending.get(key) is item:
+                    del self._pending[key]
+                delay = self.retry_seconds
+
+    async def _regenerate(self, item: Dict[str, Any]) -> None:
+        report_type, params = item["report_type"], item["params"]
+        # Fresh data when the builder is known, else the prompt of the failed request
+        prompt = await self._build_prompt(report_type, params) if self._build_prompt else item["prompt"]
+        report = await self.generator.generate_report(
+            item["model"], prompt, report_type=report_type, sectioned=item["sectioned"]
+        )
+        if self.enabled:
+            key = self.key(report_type, params, item["model"], item["sectioned"])
+            await self._store(
+                key, report, prompt, fingerprint(prompt), report_type, params, item["model"], item["sectioned"]
+            )
+        await self._remember(report, report_type, params)
+
+    # --- Background regeneration ---
+
+    def start(self, build_prompt: Callable[[str, Dict[str, Any]], Awaitable[ReportPrompt]]) -> None:
+        self._build_prompt = build_prompt
+        if self.enabled and self.watch_interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._watch())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._retry_task is not None:
+            self._retry_task.cancel()
+            self._retry_task = None
+
+    async def _watch(self) -> None:
+        # Regeneration is background work: lowest priority, its own caller
+        run_as_background("report-watcher")
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                # One worker per interval claims the pass, however long it runs
+                if await self.shared.aclaim("report-watch-pass", self.watch_interval * 0.9):
+                    await self.refresh_all()
+            except Exception:
+                logger.exception("report cache watcher pass failed")
+
+    async def refresh_all(self) -> Dict[str, int]:
+        """Rebuild every cached report's prompt and regenerate the changed ones."""
+        counts = {"checked": 0, "regenerated": 0, "failed": 0}
+        for key in await self.shared.akeys(KEY_PREFIX):
+            entry = await self.shared.aget(key)
+            if not isinstance(entry, dict) or "fingerprint" not in entry:
+                continue
+            counts["checked"] += 1
+            try:
+                if await self.refresh(key, entry):
+                    counts["regenerated"] += 1
+            except Exception:
+                counts["failed"] += 1
+                logger.exception("regenerating %s failed", entry.get("report_type"))
+        logger.info("report cache watcher pass: %s", counts)
+        return counts
+
+    async def _sources_unchanged(self, entry: Dict[str, Any]) -> bool:
+        sources = entry.get("sources") or {}
+        generated = time.localtime(entry.get("generated_at", 0))
+        if not sources or generated[:3] != time.localtime()[:3]:
+            return False
+        for key, digest in sources.items():
+            try:
+                if await self.backend.probe(key) != digest:
+                    return False
+            except Exception:
+                return False
+        return True
+
+    async def refresh(self, key: str, entry: Dict[str, Any]) -> bool:
+        if await self._sources_unchanged(entry):
+            return False
+        prompt = await self._build_prompt(entry["report_type"], entry["params"])
+        digest = fingerprint(prompt)
+        if digest == entry["fingerprint"]:
+            return False
+        report = await self.generator.generate_report(
+            entry["model"], prompt, report_type=entry["report_type"], sectioned=entry["sectioned"]
+        )
+        await self._store(
+            key, report, prompt, digest, entry["report_type"], entry["params"], entry["model"], entry["sectioned"]
+        )
+        await self._remember(report, entry["report_type"], entry["params"])
+        return True
+
+
+def _cut_by_deadline(report: Report) -> bool:
+    metadata = report.metadata or {}
+    sections = metadata.get("section_timings") or []
+    return metadata.get("early_stop") == "deadline" or any(s.get("early_stop") == "deadline" for s in sections)
+
+
+report_cache = ReportCache(
+    shared=shared_cache,
+    ttl=float(os.getenv("REPORT_CACHE_TTL_SECONDS", "86400")),
+    watch_interval=float(os.getenv("REPORT_WATCH_INTERVAL_SECONDS", "300")),
+    enabled=os.getenv("REPORT_CACHE_ENABLED", "true").lower() in ("1", "true", "yes"),
+    stale_if_error=os.getenv("STALE_IF_ERROR_ENABLED", "true").lower() in ("1", "true", "yes"),
+    last_good_ttl=float(os.getenv("LAST_GOOD_TTL_SECONDS", "604800")),
+    retry_seconds=float(os.getenv("STALE_RETRY_SECONDS", "30")),
+    retry_max_seconds=float(os.getenv("STALE_RETRY_MAX_SECONDS", "900")),
+)
@@ -1,21 +1,406 @@
 """
 Report generation service.
 """
+import asyncio
+import os
+import time
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.services.deadline import Deadline, current_deadline
+from app.services.early_stop import EARLY_STOP_ENABLED, CompletionDetector
+from app.services.eta import eta_predictor, publish
 from app.services.ollama_client import OllamaClient
+from app.services.generation_profiles import (
+    GenerationProfile, affordable_tokens, build_options, profile_for, token_rates,
+)
+from app.services.model_policy import ModelDecision, model_policy
+from app.services.prefix_cache import prefix_cache
+from app.services.prompts import ReportPrompt
+from app.services.report_store import report_store
+from app.services.request_context import caller_id, request_id
+from app.services.scheduler import Priority, priority_for, scheduler
+from app.services.timing import count, record
+from app.services.sections import Section, expected_sections, strip_heading
 from app.models.report import Report
 
+# Concurrent section requests of one sectioned report
+SECTIONED_MAX_PARALLEL = int(os.getenv("SECTIONED_MAX_PARALLEL", "3"))
+
+SECTION_INSTRUCTION = """
+
+    **دستور این درخواست:** از ساختار بالا فقط بخش {index} («{title}») را بنویسید.
+    عنوان بخش را تکرار نکنید و به بخش‌های دیگر نپردازید.
+    """
+
 class ReportGenerator:
     def __init__(self):
         self.ollama_client = OllamaClient()
-    
-    async def generate_report(self, model: str, prompt: str) -> Report:
+
+    async def generate_report(
+        self, model: Optional[str], prompt: str, report_type: str = "generate", sectioned: bool = False
+    ) -> Report:
         """
         Generate a report using the specified model and prompt.
+
+        When no model is given the report type's preferred model is used;
+        under load the model policy may pick a lighter one. The call waits
+        for an Ollama slot according to the priority class of ``report_type``,
+        and output length is bounded by the report type's generation profile.
+        Generation stops early once the prompt's last section is complete or
+        the model starts repeating itself (see ``early_stop``). With
+        ``sectioned`` the prompt's numbered sections are generated in
+        parallel (see ``generate_sectioned_report``).
+        """
+        if sectioned:
+            return await self.generate_sectioned_report(model, prompt, report_type)
+        decision = model_policy.select(report_type, model)
+        profile = profile_for(report_type)
+        priority = priority_for(report_type)
+        result, options, queue_wait = await self._generate(decision.model, prompt, report_type, profile, priority)
+
+        return await self._build_report(
+            report_type, decision, profile, priority, queue_wait, options, result, result["response"]
+        )
+
+    async def generate_sectioned_report(
+        self, model: Optional[str], prompt: str, report_type: str = "generate"
+    ) -> Report:
+        """
+        Generate each numbered section of the prompt as its own request.
+
+        Every section request carries the full data context of the prompt
+        and asks for that one section only. Up to ``SECTIONED_MAX_PARALLEL``
+        sections run at once (each still takes a scheduler slot, and the
+        Ollama client spreads them over the configured instances); the
+        results are stitched back together in order.
         """
-        content = await self.ollama_client.generate(model, prompt)
-        
-        return Report(
-            title=f"Report generated with {model}",
+        titles = expected_sections(prompt)
+        if len(titles) < 2:
+            return await self.generate_report(model, prompt, report_type)
+
+        decision = model_policy.select(report_type, model)
+        profile = profile_for(report_type)
+        priority = priority_for(report_type)
+        # Each section gets a share of the whole-report budget, with headroom
+        predict_scale = min(1.0, 1.5 / len(titles))
+        semaphore = asyncio.Semaphore(SECTIONED_MAX_PARALLEL)
+        started = time.monotonic()
+
+        async def run_section(index: int, title: str):
+            async with semaphore:
+                section_started = time.monotonic()
+                instruction = SECTION_INSTRUCTION.format(index=index, title=title)
+                if isinstance(prompt, ReportPrompt):
+                    section_prompt = prompt.extend(instruction)
+                else:
+                    section_prompt = prompt + instruction
+                result, options, queue_wait = await self._generate(
+                    decision.model,
+                    section_prompt,
+                    f"{report_type}.section",
+                    profile,
+                    priority,
+                    predict_scale,
+                    expected=(),
+                )
+                timing = {
+                    "index": index,
+                    "title": title,
+                    "started_at": round(section_started - started, 3),
+                    "queue_wait_seconds": round(queue_wait, 3),
+                    "seconds": round(time.monotonic() - section_started, 3),
+                    "eval_count": result.get("eval_count"),
+                    "prefix_cached": result["prefix_cached"],
+                    "early_stop": result.get("early_stop"),
+                    "tokens_saved_estimate": result.get("tokens_saved_estimate", 0),
+                    "predicted_seconds": result["predicted_seconds"],
+                }
+                return strip_heading(result["response"], title), options, timing
+
+        outputs = await asyncio.gather(*(run_section(i, t) for i, t in enumerate(titles, start=1)))
+        eta_predictor.observe_report(
+            report_type, decision.model, sum(t["seconds"] - t["queue_wait_seconds"] for _, _, t in outputs)
+        )
+        content = "\n\n".join(f"**{t['index']}. {t['title']}:**\n{text}" for text, _, t in outputs)
+        timings = [timing for _, _, timing in outputs]
+        report = await self._build_report(
+            report_type,
+            decision,
+            profile,
+            priority,
+            max(t["queue_wait_seconds"] for t in timings),
+            outputs[0][1],
+            {
+                "eval_count": sum(t["eval_count"] or 0 for t in timings),
+                "prefix_cached": all(t["prefix_cached"] for t in timings),
+                "tokens_saved_estimate": sum(t["tokens_saved_estimate"] for t in timings),
+                "predicted_seconds": max(t["predicted_seconds"] for t in timings),
+            },
+            content,
+        )
+        report.metadata.update({
+            "sectioned": True,
+            "wall_seconds": round(time.monotonic() - started, 3),
+            "section_seconds_total": round(sum(t["seconds"] for t in timings), 3),
+            "section_timings": timings,
+        })
+        return report
+
+    async def stream_report(
+        self, model: Optional[str], prompt: str, report_type: str = "generate"
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Generate a report while streaming progress events.
+
+        Yields ``token`` events with text deltas (reasoning blocks removed),
+        a ``section`` event each time one of the prompt's numbered sections
+        completes, and finally a ``report`` event carrying the assembled
+        ``Report``.
+        """
+        decision = model_policy.select(report_type, model)
+        model = decision.model
+        profile = profile_for(report_type)
+        priority = priority_for(report_type)
+        detector = CompletionDetector(expected_sections(prompt), stop=EARLY_STOP_ENABLED)
+        async with self._slot(model, prompt, report_type, profile, priority) as (queue_wait, options, result):
+            async for delta, sections in self._stream_generation(model, prompt, options, detector, result):
+                if delta:
+                    yield {"event": "token", "delta": delta}
+                for section in sections:
+                    yield {"event": "section", **section.to_dict()}
+
+        report = await self._build_report(
+            report_type, decision, profile, priority, queue_wait, options, result, result["response"]
+        )
+        report.metadata["sections"] = [section.title for section in detector.parser.sections]
+        yield {"event": "report", "report": report}
+
+    async def _generate(
+        self,
+        model: str,
+        prompt: str,
+        report_type: str,
+        profile: GenerationProfile,
+        priority: Priority,
+        predict_scale: float = 1.0,
+        expected: Optional[List[str]] = None,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any], float]:
+        """
+        One generation inside a scheduler slot, stopped early by a
+        ``CompletionDetector`` for ``expected`` (by default the prompt's own
+        sections).
+        """
+        detector = CompletionDetector(
+            expected_sections(prompt) if expected is None else expected, stop=EARLY_STOP_ENABLED
+        )
+        async with self._slot(model, prompt, report_type, profile, priority, predict_scale) as (
+            queue_wait, options, result
+        ):
+            async for _ in self._stream_generation(model, prompt, options, detector, result):
+                pass
+        return result, options, queue_wait
+
+    @asynccontextmanager
+    async def _slot(
+        self,
+        model: str,
+        prompt: str,
+        report_type: str,
+        profile: GenerationProfile,
+        priority: Priority,
+        predict_scale: float = 1.0,
+    ) -> AsyncIterator[Tuple[float, Dict[str, Any], Dict[str, Any]]]:
+        """
+        Hold a scheduler slot; yields the queue wait, the options to
+        generate with and the result dict to fill.
+
+        The completion time is predicted before queueing (published for
+        the response, see ``eta``) and the predictor learns from the
+        generation once it is done. Under a request deadline, work that cannot produce even
+        ``min_predict`` tokens in the time left is rejected before it is
+        queued, the queue wait ends at the deadline, and ``num_predict`` is
+        capped to what the measured token rate affords once the slot is
+        granted.
+        """
+        options = build_options(profile, model, prompt, token_rates)
+        if predict_scale < 1.0:
+            options["num_predict"] = max(profile.min_predict, int(options["num_predict"] * predict_scale))
+        estimate = eta_predictor.predict(report_type, model, profile, priority, prompt, options["num_predict"])
+        publish(estimate)
+        result: Dict[str, Any] = {"predicted_seconds": round(estimate.total_seconds, 1)}
+
+        deadline = current_deadline.get()
+        timeout = None
+        if deadline is not None:
+            _check_affordable(deadline, "queue", model, prompt, profile)
+            timeout = deadline.remaining()
+            if estimate.queue_seconds >= timeout:
+                raise deadline.expire(
+                    "queue", f"expected queue wait {estimate.queue_seconds:.0f}s, {timeout:.1f}s left"
+                )
+        async with AsyncExitStack() as stack:
+            try:
+                queue_wait = await stack.enter_async_context(
+                    scheduler.slot(priority, caller_id.get(), timeout=timeout)
+                )
+            except asyncio.TimeoutError:
+                raise deadline.expire("queue", f"no generation slot within {timeout:.1f}s") from None
+            record("queue", queue_wait)
+            granted = time.monotonic()
+            if deadline is not None:
+                affordable = _check_affordable(deadline, "generation", model, prompt, profile)
+                if affordable is not None and affordable < options["num_predict"]:
+                    deadline.shorten("generation", f"num_predict {options['num_predict']} -> {affordable}")
+                    options["num_predict"] = affordable
+            yield queue_wait, options, result
+            eta_predictor.observe(estimate, queue_wait, time.monotonic() - granted, prompt, result)
+
+    async def _stream_generation(
+        self,
+        model: str,
+        prompt: str,
+        options: Dict[str, Any],
+        detector: CompletionDetector,
+        result: Dict[str, Any],
+    ) -> AsyncIterator[Tuple[str, List[Section]]]:
+        """
+        Stream one generation through ``detector``, yielding the visible
+        deltas and completed sections (the last ones once the stream ends),
+        and fill ``result`` with the final
+        Ollama counters plus ``response`` (the kept content).
+
+        When the detector calls for a stop the stream is closed, which makes
+        Ollama abandon the generation; the counters are then estimated from
+        the chunks received (one token each) and the unused part of the
+        ``num_predict`` budget is recorded as tokens saved. Reaching the
+        request deadline stops the stream the same way, keeping what was
+        written so far.
+        """
+        deadline = current_deadline.get()
+        sent_prompt, context = await self._with_prefix_context(model, prompt, options)
+        started = time.monotonic()
+        first_token: Optional[float] = None
+        tokens = 0
+        timed_out = False
+        stream = self.ollama_client.generate_stream(model, sent_prompt, options, context)
+        try:
+            while True:
+                try:
+                    chunk = await _next_chunk(stream, deadline)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    timed_out = True
+                    break
+                if chunk.get("response"):
+                    tokens += 1
+                    first_token = first_token or time.monotonic()
+                    yield detector.feed(chunk["response"])
+                    if detector.reason is not None:
+                        break
+                if chunk.get("done"):
+                    result.update(chunk)
+        finally:
+            await stream.aclose()
+        model_policy.observe_latency(model, time.monotonic() - started)
+        yield "", detector.close()
+        if timed_out:
+            if not detector.content:
+                raise deadline.expire("generation", "no output before the deadline")
+            detector.reason = detector.reason or "deadline"
+            deadline.shorten("generation", f"stopped at the deadline after {tokens} tokens")
+
+        if detector.reason is not None:
+            saved = max(0, options["num_predict"] - tokens)
+            result.update({
+                "eval_count": tokens,
+                "eval_duration": int((time.monotonic() - (first_token or started)) * 1e9),
+                "early_stop": detector.reason,
+                "tokens_saved_estimate": saved,
+            })
+            count("tokens_saved_estimate", saved)
+        token_rates.observe(model, sent_prompt, result)
+        result["response"] = detector.content
+        result["reasoning_chars"] = detector.reasoning_chars
+        result["prefix_cached"] = context is not None
+
+    async def _with_prefix_context(
+        self, model: str, prompt: str, options: Dict[str, Any]
+    ) -> Tuple[str, Optional[List[int]]]:
+        """
+        The text to send and the cached preamble context to send it with.
+
+        For a ``ReportPrompt`` whose preamble context is cached (or can be
+        primed now) only the data body is sent.
+        """
+        if isinstance(prompt, ReportPrompt):
+            context = await prefix_cache.context_for(
+                self.ollama_client, model, prompt.preamble, options["num_ctx"]
+            )
+            if context:
+                return prompt.body, context
+        return prompt, None
+
+    async def _build_report(
+        self,
+        report_type: str,
+        decision: ModelDecision,
+        profile: GenerationProfile,
+        priority: Priority,
+        queue_wait: float,
+        options: Dict[str, Any],
+        result: Dict[str, Any],
+        content: str,
+    ) -> Report:
+        report = Report(
+            title=f"Report generated with {decision.model}",
             content=content,
-            model_used=model
+            model_used=decision.model,
+            metadata={
+                "request_id": request_id.get(),
+                "report_type": report_type,
+                "priority": priority.name.lower(),
+                "queue_wait_seconds": round(queue_wait, 3),
+                "generation_profile": profile.name,
+                "num_predict": options["num_predict"],
+                "eval_count": result.get("eval_count"),
+                "prompt_eval_count": result.get("prompt_eval_count"),
+                "prefix_cached": bool(result.get("prefix_cached")),
+                "early_stop": result.get("early_stop"),
+                "tokens_saved_estimate": result.get("tokens_saved_estimate", 0),
+                "predicted_seconds": result.get("predicted_seconds"),
+                **decision.metadata(),
+            }
         )
+        deadline = current_deadline.get()
+        if deadline is not None:
+            report.metadata["deadline"] = deadline.to_dict()
+        await report_store.save(report)
+        return report
+
+
+def _check_affordable(
+    deadline: Deadline, stage: str, model: str, prompt: str, profile: GenerationProfile
+) -> Optional[int]:
+    """
+    Tokens affordable before ``deadline`` (``None`` while the model's rate
+    is unmeasured); raises when fewer than ``min_predict`` are.
+    """
+    remaining = deadline.remaining()
+    if remaining <= 0:
+        raise deadline.expire(stage, "no time left")
+    affordable = affordable_tokens(model, prompt, remaining, token_rates)
+    if affordable is not None and affordable < profile.min_predict:
+        raise deadline.expire(
+            stage, f"{affordable} tokens affordable in {remaining:.1f}s, {profile.min_predict} needed"
+        )
+    return affordable
+
+
+async def _next_chunk(stream: AsyncIterator[Dict[str, Any]], deadline: Optional[Deadline]) -> Dict[str, Any]:
+    if deadline is None:
+        return await stream.__anext__()
+    # Not wait_for: the stream must advance in this task, whose context its phase() was entered in
+    async with asyncio.timeout(max(deadline.remaining(), 0)):
+        return await stream.__anext__()
@@ -0,0 +1,54 @@
+"""
+Store of recently generated reports, addressable by id.
+
+Reports are kept in process memory and written through to the shared
+cache, so a report generated by one worker can be exported from another.
+"""
+import os
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from app.models.report import Report
+from app.services.shared_cache import SharedCache, shared_cache
+
+
+class ReportStore:
+    def __init__(self, max_reports: int = 500, shared: Optional[SharedCache] = None, ttl: float = 86400.0):
+        self.max_reports = max_reports
+        self.shared = shared
+        self.ttl = ttl
+        self._reports: "OrderedDict[str, Report]" = OrderedDict()
+
+    async def save(self, report: Report) -> str:
+        """
+        Keep ``report``, assigning it an id if it has none.
+        """
+        if not report.id:
+            report.id = uuid.uuid4().hex
+        self._remember(report)
+        if self.shared is not None:
+            await self.shared.aset(f"report:{report.id}", report.model_dump(mode="json"), self.ttl)
+        return report.id
+
+    async def get(self, report_id: str) -> Optional[Report]:
+        report = self._reports.get(report_id)
+        if report is None and self.shared is not None:
+            data = await self.shared.aget(f"report:{report_id}")
+            if data is not None:
+                report = Report(**data)
+                self._remember(report)
+        return report
+
+    def _remember(self, report: Report) -> None:
+        self._reports[report.id] = report
+        self._reports.move_to_end(report.id)
+        while len(self._reports) > self.max_reports:
+            self._reports.popitem(last=False)
+
+
+report_store = ReportStore(
+    max_reports=int(os.getenv("REPORT_STORE_MAX_REPORTS", "500")),
+    shared=shared_cache,
+    ttl=float(os.getenv("REPORT_STORE_TTL_SECONDS", "86400")),
+)
@@ -0,0 +1,14 @@
+"""
+Per-request context shared between the HTTP middleware and the services.
+"""
+from contextvars import ContextVar
+from typing import Optional
+
+# Identity of the caller, used for fair queuing in front of Ollama
+caller_id: ContextVar[str] = ContextVar("caller_id", default="anonymous")
+
+# Optional priority class requested by the caller (e.g. "batch")
+priority_override: ContextVar[Optional[str]] = ContextVar("priority_override", default=None)
+
+# Correlation id of the current request (X-Request-ID or generated)
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
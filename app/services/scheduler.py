@@ -0,0 +1,284 @@
+"""
+Priority-aware scheduler for Ollama generation slots.
+
+Ollama serves requests in arrival order, so a burst of batch reports can
+starve an executive report. Every generation acquires a slot here first:
+waiters are ordered by priority class, then by weighted fair queuing across
+callers within a class. Waiters are promoted one class per
+``aging_seconds`` of waiting so batch work is never starved indefinitely.
+
+The fleet has ``OLLAMA_SLOTS_PER_INSTANCE`` slots per configured instance,
+of which ``SCHEDULER_RESERVED_SLOTS`` are kept for executive work. Other
+work, including the sections of a sectioned report, shares the rest: with
+one instance of two slots it runs one generation at a time.
+"""
+import asyncio
+import itertools
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from app.services.ollama_client import ollama_instances
+from app.services.request_context import caller_id, priority_override
+
+
+class Priority(IntEnum):
+    EXECUTIVE = 0
+    INTERACTIVE = 1
+    BATCH = 2
+
+
+# Priority class per report type, or per router (first component of the report type)
+REPORT_PRIORITIES: Dict[str, Priority] = {
+    "executive": Priority.EXECUTIVE,
+    "processes": Priority.INTERACTIVE,
+    "incidents": Priority.INTERACTIVE,
+    "vulnerabilities": Priority.INTERACTIVE,
+    "assessments": Priority.INTERACTIVE,
+    "generate": Priority.INTERACTIVE,
+    "generate.batch": Priority.BATCH,
+}
+
+
+def priority_for(report_type: str) -> Priority:
+    """
+    Resolve the priority class of a report type.
+
+    Callers may lower their own priority (``X-Report-Priority: batch``) but
+    never raise it above the class of the endpoint.
+    """
+    priority = REPORT_PRIORITIES.get(report_type)
+    if priority is None:
+        priority = REPORT_PRIORITIES.get(report_type.split(".")[0], Priority.BATCH)
+    requested = priority_override.get()
+    if requested and requested.upper() in Priority.__members__:
+        priority = max(priority, Priority[requested.upper()])
+    return priority
+
+
+def run_as_background(caller: Optional[str] = None) -> None:
+    """
+    Mark the current task as background work (report watcher, stale
+    regeneration, jobs): it is scheduled at batch priority whatever its
+    report type, under ``caller`` when given.
+    """
+    if caller is not None:
+        caller_id.set(caller)
+    priority_override.set(Priority.BATCH.name.lower())
+
+
+@dataclass
+class _Waiter:
+    priority: Priority
+    caller: str
+    virtual_start: float
+    virtual_finish: float
+    seq: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    future: Optional[asyncio.Future] = None
+    granted_at: Optional[float] = None
+
+    def effective_priority(self, now: float, aging_seconds: float) -> int:
+        if aging_seconds <= 0:
+            return int(self.priority)
+        return max(0, int(self.priority) - int((now - self.enqueued_at) // aging_seconds))
+
+
+class OllamaScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = 2,
+        aging_seconds: float = 30.0,
+        caller_weights: Optional[Dict[str, float]] = None,
+        reserved_slots: int = 1,
+    ):
+        self.max_concurrency = max(1, max_concurrency)
+        self.aging_seconds = aging_seconds
+        self.caller_weights = caller_weights or {}
+        # Slots only executive (or aged-to-executive) work may take
+        self.reserved_slots = max(0, min(reserved_slots, self.max_concurrency - 1))
+        self._active = 0
+        self._running: Dict[Priority, int] = {p: 0 for p in Priority}
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._virtual_time: Dict[Priority, float] = {p: 0.0 for p in Priority}
+        self._caller_finish: Dict[Tuple[Priority, str], float] = {}
+        # Wakes the dispatcher when waiting work ages into the reserved slots
+        self._aging_timer: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    def queue_depth(self, priority: Optional[Priority] = None) -> int:
+        if priority is None:
+            return len(self._waiters)
+        return sum(1 for w in self._waiters if w.priority == priority)
+
+    def queued_ahead(self, priority: Priority) -> int:
+        """Waiters that would be served before a new waiter of ``priority``."""
+        now = time.monotonic()
+        return sum(1 for w in self._waiters if w.effective_priority(now, self.aging_seconds) <= priority)
+
+    def usable_slots(self, priority: Priority) -> int:
+        """Slots work of ``priority`` may ever hold (the reserved ones are executive only)."""
+        return self.max_concurrency - (0 if priority == Priority.EXECUTIVE else self.reserved_slots)
+
+    def free_slots(self, priority: Priority) -> int:
+        """Slots a new waiter of ``priority`` could take right now."""
+        return max(0, self.usable_slots(priority) - self._active)
+
+    def stats(self) -> Dict[str, int]:
+        stats = {"active": self._active, "queued": len(self._waiters)}
+        for p in Priority:
+            stats[f"queued_{p.name.lower()}"] = self.queue_depth(p)
+        return stats
+
+    @asynccontextmanager
+    async def slot(
+        self, priority: Priority, caller: str = "anonymous", cost: float = 1.0, timeout: Optional[float] = None
+    ) -> AsyncIterator[float]:
+        """
+        Hold one generation slot; yields the seconds spent waiting in queue.
+
+        With ``timeout`` the wait is given up (``asyncio.TimeoutError``)
+        if no slot is granted in time.
+        """
+        waiter = self._enqueue(priority, caller, cost)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(waiter.future, timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            if waiter.granted_at is not None:
+                self._release(waiter.priority)
+            else:
+                self._waiters.remove(waiter)
+            raise
+        try:
+            yield waiter.granted_at - waiter.enqueued_at
+        finally:
+            self._release(waiter.priority)
+
+    def _enqueue(self, priority: Priority, caller: str, cost: float) -> _Waiter:
+        weight = self.caller_weights.get(caller, 1.0)
+        start = max(self._virtual_time[priority], self._caller_finish.get((priority, caller), 0.0))
+        finish = start + cost / weight
+        self._caller_finish[(priority, caller)] = finish
+        waiter = _Waiter(
+            priority=priority,
+            caller=caller,
+            virtual_start=start,
+            virtual_finish=finish,
+            seq=next(self._seq),
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._waiters.append(waiter)
+        return waiter
+
+    def _release(self, priority: Priority) -> None:
+        self._active -= 1
+        self._running[priority] -= 1
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        try:
+            self._grant()
+        finally:
+            self._forget_idle_callers()
+            self._schedule_aging()
+
+    def _schedule_aging(self) -> None:
+        """
+        Dispatch again when the next waiter is promoted, if only promotion
+        can let it into a free (reserved) slot; nothing else would wake it.
+        """
+        if self._aging_timer is not None:
+            self._aging_timer.cancel()
+            self._aging_timer = None
+        if self.aging_seconds <= 0 or not self._waiters or self._active >= self.max_concurrency:
+            return
+        now = time.monotonic()
+        promotable = [
+            w for w in self._waiters if w.effective_priority(now, self.aging_seconds) > Priority.EXECUTIVE
+        ]
+        if not promotable:
+            return
+        delay = min(self.aging_seconds - (now - w.enqueued_at) % self.aging_seconds for w in promotable)
+        self._aging_timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+
+    def _grant(self) -> None:
+        while self._waiters and self._active < self.max_concurrency:
+            now = time.monotonic()
+            candidates = sorted(
+                self._waiters,
+                key=lambda w: (w.effective_priority(now, self.aging_seconds), w.virtual_finish, w.seq),
+            )
+            general_free = self._active < self.max_concurrency - self.reserved_slots
+            chosen = None
+            for w in candidates:
+                if general_free or w.effective_priority(now, self.aging_seconds) == Priority.EXECUTIVE:
+                    chosen = w
+                    break
+            if chosen is None:
+                return
+            self._waiters.remove(chosen)
+            self._advance(chosen.priority, chosen.virtual_start)
+            self._active += 1
+            self._running[chosen.priority] += 1
+            chosen.granted_at = now
+            chosen.future.set_result(None)
+
+    def _forget_idle_callers(self) -> None:
+        # Once a class is idle everyone in it has been served: its clock jumps
+        # to the last finish and the per-caller state can go
+        if not self._caller_finish:
+            return
+        waiting = {w.priority for w in self._waiters}
+        for priority in Priority:
+            if priority in waiting or self._running[priority]:
+                continue
+            keys = [key for key in self._caller_finish if key[0] == priority]
+            if keys:
+                self._advance(priority, max(self._caller_finish[key] for key in keys))
+
+    def _advance(self, priority: Priority, virtual_start: float) -> None:
+        if virtual_start < self._virtual_time[priority]:
+            return
+        self._virtual_time[priority] = virtual_start
+        # Callers whose last finish is behind the class clock start from the clock anyway
+        stale = [key for key, finish in self._caller_finish.items()
+                 if key[0] == priority and finish <= virtual_start]
+        for key in stale:
+            del self._caller_finish[key]
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    weights = {}
+    for item in raw.split(","):
+        if "=" in item:
+            name, value = item.split("=", 1)
+            weights[name.strip()] = float(value)
+    return weights
+
+
+def _max_concurrency() -> int:
+    """
+    ``OLLAMA_MAX_CONCURRENCY`` when set, else the parallel slots of one
+    instance (``OLLAMA_SLOTS_PER_INSTANCE``, Ollama's ``OLLAMA_NUM_PARALLEL``)
+    times the number of instances.
+    """
+    configured = os.getenv("OLLAMA_MAX_CONCURRENCY")
+    if configured:
+        return int(configured)
+    return int(os.getenv("OLLAMA_SLOTS_PER_INSTANCE", "2")) * len(ollama_instances())
+
+
+scheduler = OllamaScheduler(
+    max_concurrency=_max_concurrency(),
+    aging_seconds=float(os.getenv("SCHEDULER_AGING_SECONDS", "30")),
+    caller_weights=_parse_weights(os.getenv("SCHEDULER_CALLER_WEIGHTS", "")),
+    reserved_slots=int(os.getenv("SCHEDULER_RESERVED_SLOTS", "1")),
+)
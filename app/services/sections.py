@@ -0,0 +1,189 @@
+"""
+Section parsing for generated reports.
+
+Every report prompt asks for a numbered structure such as
+``1. **خلاصه اجرایی:**``. The expected section titles are read from the
+prompt itself, and the model output is split on the matching headings as
+it streams in.
+"""
+import re
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+# "1. **خلاصه اجرایی:** ..." in the prompt templates
+_PROMPT_SECTION_RE = re.compile(r"^\s*(\d{1,2})\.\s+\*\*(.+?)\*\*", re.M)
+
+# Headings in model output: "## 1. title", "**1. title**", "1) **title:**", "### title"
+_HEADING_RE = re.compile(
+    r"^\s*(?P<hashes>#{1,6})?\s*(?P<bold>\*\*)?\s*"
+    r"(?:(?P<number>[0-9۰-۹]{1,2})\s*[.)\-]\s*)?"
+    r"(?:\*\*)?\s*(?P<title>[^\n]+?)\s*$"
+)
+
+_PERSIAN_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹", "0123456789")
+
+
+def normalize_title(title: str) -> str:
+    title = title.replace("*", "").replace("#", "")
+    return re.sub(r"\s+", " ", title).strip(" :.-")
+
+
+def _comparable(title: str) -> str:
+    # Models are inconsistent about the zero-width non-joiner
+    return normalize_title(title.replace("\u200c", " "))
+
+
+def expected_sections(prompt: str) -> List[str]:
+    """
+    Top-level section titles requested by a prompt, in order.
+    """
+    titles: List[str] = []
+    for number, title in _PROMPT_SECTION_RE.findall(prompt):
+        if int(number) == len(titles) + 1:
+            titles.append(normalize_title(title))
+    return titles
+
+
+def strip_heading(text: str, title: str) -> str:
+    """
+    Drop a leading heading line for ``title`` that the model repeated.
+    """
+    text = text.strip()
+    first_line, _, rest = text.partition("\n")
+    match = _HEADING_RE.match(first_line)
+    if not match or not (match.group("hashes") or match.group("number") or "**" in first_line):
+        return text
+    heading, remainder = _split_inline_text(match.group("title"))
+    if titles_match(title, heading):
+        return (remainder + rest).strip()
+    return text
+
+
+def titles_match(expected: str, candidate: str) -> bool:
+    expected, candidate = _comparable(expected), _comparable(candidate)
+    if not expected or not candidate:
+        return False
+    if expected in candidate or candidate in expected:
+        return True
+    expected_words, candidate_words = set(expected.split()), set(candidate.split())
+    return len(expected_words & candidate_words) >= max(1, len(expected_words) // 2)
+
+
+@dataclass
+class Section:
+    index: int
+    title: str
+    content: str
+
+    def to_dict(self) -> dict:
+        return {"index": self.index, "title": self.title, "content": self.content}
+
+
+class SectionParser:
+    """
+    Incremental splitter of streamed report text into sections.
+
+    ``feed`` returns the sections completed by the new text; a section is
+    complete once the heading of the next one appears (or on ``close``).
+    """
+
+    def __init__(self, expected: Sequence[str] = ()):
+        self.expected = list(expected)
+        self.preamble = ""
+        self.sections: List[Section] = []
+        self._current: Optional[Section] = None
+        self._buffer = ""
+
+    @property
+    def current(self) -> Optional[Section]:
+        return self._current
+
+    def feed(self, delta: str) -> List[Section]:
+        self._buffer += delta
+        completed: List[Section] = []
+        while "\n" in self._buffer:
+            line, self._buffer = self._buffer.split("\n", 1)
+            section = self._consume_line(line + "\n")
+            if section is not None:
+                completed.append(section)
+        return completed
+
+    def close(self) -> List[Section]:
+        completed: List[Section] = []
+        if self._buffer:
+            section = self._consume_line(self._buffer)
+            self._buffer = ""
+            if section is not None:
+                completed.append(section)
+        if self._current is not None:
+            completed.append(self._finish_current())
+        return completed
+
+    def heading_index(self, line: str) -> Optional[int]:
+        """
+        The index of the section ``line`` would open, or ``None``.
+        """
+        heading = self._match_heading(line)
+        return heading[0] if heading is not None else None
+
+    def _consume_line(self, line: str) -> Optional[Section]:
+        heading = self._match_heading(line)
+        if heading is None:
+            if self._current is None:
+                self.preamble += line
+            else:
+                self._current.content += line
+            return None
+        finished = self._finish_current() if self._current is not None else None
+        index, title, remainder = heading
+        self._current = Section(index=index, title=title, content=remainder)
+        return finished
+
+    def _finish_current(self) -> Section:
+        section = self._current
+        section.content = section.content.strip()
+        self.sections.append(section)
+        self._current = None
+        return section
+
+    def _next_index(self) -> int:
+        return len(self.sections) + (1 if self._current is not None else 0) + 1
+
+    def _match_heading(self, line: str) -> Optional[Tuple[int, str, str]]:
+        """
+        ``(index, title, remainder)`` when ``line`` opens the next section.
+        """
+        match = _HEADING_RE.match(line)
+        if not match or not line.strip():
+            return None
+        title, remainder = _split_inline_text(match.group("title"))
+        next_index = self._next_index()
+        expected = self.expected[next_index - 1] if next_index <= len(self.expected) else None
+        number = match.group("number")
+
+        if number is not None:
+            if int(number.translate(_PERSIAN_DIGITS)) != next_index:
+                return None
+            if expected is not None and titles_match(expected, title):
+                return next_index, expected, remainder
+            # Without a matching title only a markdown heading is trusted;
+            # bold numbered lines are also used for lists inside sections
+            if match.group("hashes") or (expected is None and "**" in line):
+                return next_index, title, remainder
+            return None
+
+        # Unnumbered markdown heading carrying the next expected title
+        if match.group("hashes") and expected is not None and titles_match(expected, title):
+            return next_index, expected, remainder
+        return None
+
+
+def _split_inline_text(text: str) -> Tuple[str, str]:
+    """
+    Split ``"title:** body"`` into the heading title and the inline body.
+    """
+    if "**" not in text:
+        return normalize_title(text), ""
+    title, remainder = text.split("**", 1)
+    remainder = remainder.lstrip(" :").strip()
+    return normalize_title(title), (remainder + "\n" if remainder else "")
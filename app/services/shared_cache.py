@@ -0,0 +1,333 @@
+"""
+Cache shared by all worker processes on one host.
+
+Entries live in a local SQLite database in WAL mode, so readers in every
+uvicorn worker see each other's writes without blocking, and each
+operation is a single atomic transaction. Values are JSON, expire after a
+TTL and are evicted least-recently-used once the stored bytes exceed a
+bound. The stored bytes are kept as a running total by triggers, and
+reads record their access time in memory and write it back in batches,
+so a hit costs no write transaction. Pinned values (``set_pinned``) are
+kept in a table of their own, outside the byte bound and the LRU, until
+their TTL runs out. ``get_or_set`` is single-flight
+across processes: one worker computes a missing value while the others
+wait for it to appear, using a lease row that expires if its holder dies.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+_MISSING = object()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    expires_at REAL NOT NULL,
+    accessed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE INDEX IF NOT EXISTS entries_expires ON entries (expires_at);
+CREATE TABLE IF NOT EXISTS totals (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO totals (name, value)
+    SELECT 'bytes', COALESCE(SUM(size), 0) FROM entries
+    WHERE NOT EXISTS (SELECT 1 FROM totals WHERE name = 'bytes');
+CREATE TRIGGER IF NOT EXISTS entries_added AFTER INSERT ON entries BEGIN
+    UPDATE totals SET value = value + NEW.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_removed AFTER DELETE ON entries BEGIN
+    UPDATE totals SET value = value - OLD.size WHERE name = 'bytes';
+END;
+CREATE TRIGGER IF NOT EXISTS entries_resized AFTER UPDATE OF size ON entries BEGIN
+    UPDATE totals SET value = value + NEW.size - OLD.size WHERE name = 'bytes';
+END;
+CREATE TABLE IF NOT EXISTS pinned (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+
+class SharedCache:
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 256 * 1024 * 1024,
+        lease_seconds: float = 120.0,
+        poll_interval: float = 0.05,
+        touch_batch: int = 64,
+        touch_interval: float = 1.0,
+    ):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self.owner_prefix = f"{os.getpid()}:"
+        self._local = threading.local()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # key -> last read in this process, not yet written to accessed_at
+        self._touched: Dict[str, float] = {}
+        self._touched_at = time.monotonic()
+        self._touch_lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; the async wrappers run in the default executor
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            # INSERT OR REPLACE must run the delete trigger for the replaced row
+            conn.execute("PRAGMA recursive_triggers=ON")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    # --- Synchronous operations (each one transaction) ---
+
+    def get(self, key: str, default: Any = None) -> Any:
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value FROM entries WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        if row is None:
+            return default
+        self._touch(key, now)
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        data = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        if len(data) > self.max_bytes:
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._flush_touches(conn)
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now + ttl, now),
+            )
+            self._evict(conn, now)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get_pinned(self, key: str, default: Any = None) -> Any:
+        row = self._connection().execute(
+            "SELECT value FROM pinned WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set_pinned(self, key: str, value: Any, ttl: float) -> None:
+        """
+        Store ``value`` until ``ttl`` runs out whatever else is cached. Meant
+        for a bounded set of keys, since pinned values do not count towards
+        ``max_bytes``.
+        """
+        data = json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM pinned WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "INSERT OR REPLACE INTO pinned (key, value, expires_at) VALUES (?, ?, ?)", (key, data, now + ttl)
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def claim(self, key: str, ttl: float) -> bool:
+        """
+        Store a marker under ``key`` unless a live one exists; ``True`` for
+        the one caller (in any process) that stored it.
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM entries WHERE key = ? AND expires_at <= ?", (key, now))
+            data = json.dumps(self.owner_prefix).encode("utf-8")
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO entries (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now + ttl, now),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def delete(self, key: str) -> None:
+        self._connection().execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def keys(self, prefix: str) -> List[str]:
+        """Live keys starting with ``prefix``."""
+        pattern = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        rows = self._connection().execute(
+            "SELECT key FROM entries WHERE key LIKE ? ESCAPE '\\' AND expires_at > ?", (pattern, time.time())
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def _touch(self, key: str, now: float) -> None:
+        with self._touch_lock:
+            self._touched[key] = now
+            due = len(self._touched) >= self.touch_batch or time.monotonic() - self._touched_at >= self.touch_interval
+        if due:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._flush_touches(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _flush_touches(self, conn: sqlite3.Connection) -> None:
+        """Write the pending access times (inside the caller's transaction)."""
+        with self._touch_lock:
+            touched, self._touched = self._touched, {}
+            self._touched_at = time.monotonic()
+        if touched:
+            conn.executemany(
+                "UPDATE entries SET accessed_at = MAX(accessed_at, ?) WHERE key = ?",
+                [(at, key) for key, at in touched.items()],
+            )
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+        total = conn.execute("SELECT value FROM totals WHERE name = 'bytes'").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def _try_lease(self, key: str, owner: str) -> bool:
+        now = time.time()
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + self.lease_seconds),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return cursor.rowcount == 1
+
+    def _release(self, key: str, owner: str) -> None:
+        self._connection().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def stats(self) -> Dict[str, Any]:
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE expires_at > ?", (time.time(),)
+        ).fetchone()
+        return {"path": self.path, "entries": entries, "bytes": size, "max_bytes": self.max_bytes}
+
+    # --- Async API ---
+
+    async def aget(self, key: str, default: Any = None) -> Any:
+        return await asyncio.to_thread(self.get, key, default)
+
+    async def aset(self, key: str, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(self.set, key, value, ttl)
+
+    async def aget_pinned(self, key: str, default: Any = None) -> Any:
+        return await asyncio.to_thread(self.get_pinned, key, default)
+
+    async def aset_pinned(self, key: str, value: Any, ttl: float) -> None:
+        await asyncio.to_thread(self.set_pinned, key, value, ttl)
+
+    async def aclaim(self, key: str, ttl: float) -> bool:
+        return await asyncio.to_thread(self.claim, key, ttl)
+
+    async def akeys(self, prefix: str) -> List[str]:
+        return await asyncio.to_thread(self.keys, prefix)
+
+    async def get_or_set(self, key: str, ttl: float, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value of ``key`` or compute it with ``factory``.
+
+        Concurrent callers in this process share one in-flight computation;
+        across processes the lease makes sure only one worker runs it.
+        """
+        value = await self.aget(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        while key in self._inflight:
+            shared = self._inflight[key]
+            try:
+                return await asyncio.shield(shared)
+            except asyncio.CancelledError:
+                # Compute it ourselves if only the caller that started it went away
+                if not shared.cancelled() or asyncio.current_task().cancelling():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await self._compute_once(key, ttl, factory)
+            future.set_result(value)
+            return value
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an unawaited failure is not logged
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _compute_once(self, key: str, ttl: float, factory: Callable[[], Awaitable[Any]]) -> Any:
+        owner = self.owner_prefix + uuid.uuid4().hex
+        while True:
+            if await asyncio.to_thread(self._try_lease, key, owner):
+                try:
+                    value = await self.aget(key, _MISSING)
+                    if value is _MISSING:
+                        value = await factory()
+                        await self.aset(key, value, ttl)
+                    return value
+                finally:
+                    await asyncio.to_thread(self._release, key, owner)
+            # Another worker holds the lease; wait for its result or for the lease to lapse
+            await asyncio.sleep(self.poll_interval)
+            value = await self.aget(key, _MISSING)
+            if value is not _MISSING:
+                return value
+
+
+shared_cache = SharedCache(
+    path=os.getenv("SHARED_CACHE_PATH", "/tmp/ollama_report_cache.sqlite3"),
+    max_bytes=int(os.getenv("SHARED_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    lease_seconds=float(os.getenv("SHARED_CACHE_LEASE_SECONDS", "120")),
+)
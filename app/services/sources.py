@@ -0,0 +1,63 @@
+"""
+Fingerprints of the data a report prompt was built from.
+
+Prompt builders decorated with ``tracks_sources`` collect a hash of every
+backend payload (or replica result) they read; the hashes are attached to
+the returned prompt as ``prompt.sources``. Together with the prompt text
+they form the report's input fingerprint, which the report cache compares
+to decide whether a report has to be generated again.
+"""
+import functools
+import hashlib
+import json
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+_sources: ContextVar[Optional[Dict[str, str]]] = ContextVar("report_sources", default=None)
+
+
+def payload_hash(data: Any) -> str:
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def body_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()[:16]
+
+
+def record_source(
+    key: str, data: Any = None, body: Optional[bytes] = None, digest: Optional[str] = None
+) -> None:
+    """
+    Note that the current prompt build consumed ``data`` from ``key``.
+    Pass the raw ``body`` or its ``digest`` when known: hashing ``data``
+    serializes it again.
+    """
+    sources = _sources.get()
+    if sources is not None:
+        if digest is None:
+            digest = body_hash(body) if body is not None else payload_hash(data)
+        sources[key] = digest
+
+
+def tracks_sources(func: Callable) -> Callable:
+    """Decorator attaching the consumed sources to the prompt a builder returns."""
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        sources: Dict[str, str] = {}
+        token = _sources.set(sources)
+        try:
+            prompt = await func(*args, **kwargs)
+        finally:
+            _sources.reset(token)
+        prompt.sources = dict(sorted(sources.items()))
+        return prompt
+    return wrapper
+
+
+def fingerprint(prompt: str) -> str:
+    """Digest of a prompt's text and the sources it was built from."""
+    digest = hashlib.sha256(prompt.encode("utf-8"))
+    for key, value in getattr(prompt, "sources", {}).items():
+        digest.update(f"\0{key}={value}".encode("utf-8"))
+    return digest.hexdigest()[:32]
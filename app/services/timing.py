@@ -0,0 +1,112 @@
+"""
+Per-request phase timing.
+
+The HTTP middleware binds a ``RequestTimings`` to the request context;
+services record phases into it with ``phase`` (monotonic clock) or
+``record``. Nested phases are exclusive: the wall-clock time covered by
+inner phases is not counted again in the outer one, so inner phases run
+concurrently under ``gather`` are subtracted once, not summed. The result is emitted as a
+``Server-Timing`` header and a structured log line, together with any
+counters added with ``count`` (e.g. tokens saved by early termination).
+"""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class RequestTimings:
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.monotonic()
+        self.phases: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.counters: Dict[str, float] = {}
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + max(seconds, 0.0)
+        self.counts[name] = self.counts.get(name, 0) + 1
+
+    def count(self, name: str, amount: float = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def server_timing(self) -> str:
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result = {
+            "duration_ms": round(self.elapsed() * 1000, 1),
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "phase_counts": dict(self.counts),
+        }
+        if self.counters:
+            result["counters"] = dict(self.counters)
+        return result
+
+
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar("current_timings", default=None)
+
+# (start, end) intervals of the closed children of each phase open in this context
+_open_phases: ContextVar[List[List[Tuple[float, float]]]] = ContextVar("open_phases", default=[])
+
+
+def record(name: str, seconds: float) -> None:
+    """Add an externally measured duration (e.g. a queue wait) to the request."""
+    timings = current_timings.get()
+    if timings is not None:
+        timings.record(name, seconds)
+
+
+def count(name: str, amount: float = 1) -> None:
+    """Add to a per-request counter reported in the request log line."""
+    timings = current_timings.get()
+    if timings is not None:
+        timings.count(name, amount)
+
+
+def _covered(intervals: List[Tuple[float, float]]) -> float:
+    """Length of the union of ``intervals``."""
+    total = 0.0
+    end = float("-inf")
+    for start, stop in sorted(intervals):
+        if stop > end:
+            total += stop - max(start, end)
+            end = stop
+    return total
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    timings = current_timings.get()
+    if timings is None:
+        yield
+        return
+    children: List[Tuple[float, float]] = []
+    stack = _open_phases.get()
+    token = _open_phases.set(stack + [children])
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        ended = time.monotonic()
+        _open_phases.reset(token)
+        timings.record(name, ended - started - _covered(children))
+        if stack:
+            stack[-1].append((started, ended))
+
+
+def timed(name: str) -> Callable:
+    """Decorator recording every call of a coroutine function as a phase."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with phase(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
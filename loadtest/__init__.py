@@ -0,0 +1,16 @@
+"""
+Load-testing harness for the report service.
+
+- ``fake_ollama``: an Ollama stand-in that simulates model loading,
+  prompt evaluation and token rates, streaming, limited parallelism and
+  errors.
+- ``fake_backend``: serves generated data for the backend ``/api/*``
+  resources the routers read.
+- ``runner``: runs a scenario of concurrent virtual users against the
+  service and reports throughput, latency percentiles and error rates per
+  endpoint. With ``--stack`` it starts both fakes and the service itself.
+
+Example::
+
+    python -m loadtest.runner --stack --scenario dashboard --users 50 --duration 120
+"""
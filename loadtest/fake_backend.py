@@ -0,0 +1,260 @@
+"""
+Fake backend serving generated data for the resources the routers read.
+
+Data is generated once from a seed, so runs are repeatable. Lists are
+returned as plain arrays, or as Spring pages when ``page``/``size`` are
+given; ``updatedSince`` filters by ``updatedAt`` like the real backend does
+for the replica. Every response can be delayed to model backend latency.
+
+    python -m loadtest.fake_backend --port 18080 --scale 2000 --latency-ms 20
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+
+PROCESS_TYPES = (
+    "FIELD_ASSESSMENT", "SECURITY_PLAN_MONITORING", "THREAT_MONITORING", "INCIDENT_RESPONSE",
+    "FORENSICS", "THREAT_HUNTING", "CYBER_SECURITY_GUIDANCE", "CONSULTANT_CERTIFICATION",
+    "TRAINING", "CYBER_EXERCISE", "INFRASTRUCTURE_MONITORING", "SECURITY_PLAN_STATUS",
+)
+SEVERITIES = ("CRITICAL", "HIGH", "MEDIUM", "LOW")
+ACTIVITY_STATUSES = ("COMPLETED", "IN_PROGRESS", "PENDING", "CANCELLED")
+INCIDENT_STATUSES = ("OPEN", "INVESTIGATING", "RESOLVED", "CLOSED")
+INFRASTRUCTURE_TYPES = ("IT", "OT", "Hybrid")
+
+
+def _date(rng: random.Random, now: datetime, max_days: int) -> datetime:
+    return now - timedelta(days=rng.random() * max_days)
+
+
+def _iso(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+class Dataset:
+    """The generated backend contents."""
+
+    def __init__(self, scale: int = 1000, organizations: int = 40, seed: int = 7):
+        rng = random.Random(seed)
+        now = datetime.now()
+        self.organizations = [
+            {
+                "id": index,
+                "name": f"سازمان {index}",
+                "infrastructureType": rng.choice(INFRASTRUCTURE_TYPES),
+                "createdDate": _iso(_date(rng, now, 900)),
+                "updatedAt": _iso(_date(rng, now, 30)),
+            }
+            for index in range(1, organizations + 1)
+        ]
+        names = [org["name"] for org in self.organizations]
+
+        def record(index: int, date_field: str, statuses, max_days: int, **extra) -> Dict[str, Any]:
+            created = _date(rng, now, max_days)
+            return {
+                "id": index,
+                "title": f"مورد {index}",
+                "status": rng.choice(statuses),
+                "organizationName": rng.choice(names),
+                date_field: _iso(created),
+                "updatedAt": _iso(created + timedelta(hours=rng.random() * 48)),
+                **extra,
+            }
+
+        self.incidents = [
+            record(i, "detectionDate", INCIDENT_STATUSES, 180, severity=rng.choice(SEVERITIES))
+            for i in range(1, scale // 4 + 1)
+        ]
+        self.vulnerabilities = [
+            record(i, "discoveredDate", INCIDENT_STATUSES, 365, severity=rng.choice(SEVERITIES))
+            for i in range(1, scale // 2 + 1)
+        ]
+        self.assessments = [
+            record(i, "assessmentDate", ACTIVITY_STATUSES, 365,
+                   riskScore=rng.randint(1, 100), riskLevel=rng.choice(("بالا", "متوسط", "پایین")))
+            for i in range(1, scale // 8 + 1)
+        ]
+        self.activities: Dict[str, List[Dict[str, Any]]] = {}
+        for process in PROCESS_TYPES:
+            items = []
+            for i in range(1, scale + 1):
+                item = record(i, "createdDate", ACTIVITY_STATUSES, 120,
+                              processType=process, assignedTo=f"کارشناس {rng.randint(1, 60)}")
+                if item["status"] == "COMPLETED":
+                    item["completedDate"] = _iso(datetime.fromisoformat(item["createdDate"])
+                                                 + timedelta(hours=rng.random() * 96))
+                items.append(item)
+            self.activities[process] = items
+
+    def by_severity(self, items: List[Dict[str, Any]], severity: str) -> List[Dict[str, Any]]:
+        return [item for item in items if item.get("severity") == severity]
+
+    def dashboard_stats(self) -> Dict[str, Any]:
+        activities = [item for items in self.activities.values() for item in items]
+        completed = sum(1 for item in activities if item["status"] == "COMPLETED")
+        return {
+            "totalOrganizations": len(self.organizations),
+            "totalActivities": len(activities),
+            "completedActivities": completed,
+            "pendingActivities": len(activities) - completed,
+            "totalVulnerabilities": len(self.vulnerabilities),
+            "criticalVulnerabilities": len(self.by_severity(self.vulnerabilities, "CRITICAL")),
+            "totalIncidents": len(self.incidents),
+            "totalAssessments": len(self.assessments),
+        }
+
+
+def create_app(data: Dataset, latency_ms: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Fake backend")
+
+    @app.middleware("http")
+    async def delay(request: Request, call_next):
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        return await call_next(request)
+
+    def listing(items: List[Dict[str, Any]], request: Request) -> Any:
+        query = request.query_params
+        since = query.get("updatedSince")
+        if since:
+            items = [item for item in items if item["updatedAt"] > since]
+        if "page" not in query:
+            return items
+        page, size = int(query["page"]), int(query.get("size", 500))
+        chunk = items[page * size:(page + 1) * size]
+        return {"content": chunk, "last": (page + 1) * size >= len(items), "totalElements": len(items)}
+
+    def severity_counts(items: List[Dict[str, Any]]) -> Dict[str, int]:
+        return {severity.lower(): len(data.by_severity(items, severity)) for severity in SEVERITIES}
+
+    @app.get("/api/dashboard/stats")
+    async def dashboard_stats():
+        return data.dashboard_stats()
+
+    @app.get("/api/organizations")
+    async def organizations(request: Request):
+        return listing(data.organizations, request)
+
+    @app.get("/api/organizations/stats")
+    async def organization_stats():
+        return [
+            {
+                "name": org["name"],
+                "infrastructureType": org["infrastructureType"],
+                "totalVulnerabilities": sum(1 for v in data.vulnerabilities if v["organizationName"] == org["name"]),
+                "totalIncidents": sum(1 for i in data.incidents if i["organizationName"] == org["name"]),
+            }
+            for org in data.organizations
+        ]
+
+    @app.get("/api/reports/monthly-summary")
+    async def monthly_summary():
+        return {"month": datetime.now().month, **data.dashboard_stats()}
+
+    @app.get("/api/activities/user-stats")
+    async def user_stats():
+        counts: Dict[str, int] = {}
+        for items in data.activities.values():
+            for item in items:
+                counts[item["assignedTo"]] = counts.get(item["assignedTo"], 0) + 1
+        return [{"user": user, "totalActivities": total} for user, total in sorted(counts.items())]
+
+    @app.get("/api/activities/recent")
+    async def recent_activities(limit: int = 10):
+        activities = [item for items in data.activities.values() for item in items]
+        return sorted(activities, key=lambda item: item["createdDate"], reverse=True)[:limit]
+
+    @app.get("/api/activities/by-process/{process}")
+    async def activities_by_process(process: str, request: Request):
+        return listing(data.activities.get(process, []), request)
+
+    @app.get("/api/processes")
+    async def processes():
+        return [
+            {
+                "name": process,
+                "totalActivities": len(items),
+                "completedActivities": sum(1 for item in items if item["status"] == "COMPLETED"),
+            }
+            for process, items in data.activities.items()
+        ]
+
+    @app.get("/api/incidents")
+    async def incidents(request: Request):
+        return listing(data.incidents, request)
+
+    @app.get("/api/incidents/stats")
+    async def incident_stats():
+        counts = severity_counts(data.incidents)
+        return {
+            "totalIncidents": len(data.incidents),
+            "criticalIncidents": counts["critical"],
+            "highSeverityIncidents": counts["high"],
+            "investigatingIncidents": sum(1 for i in data.incidents if i["status"] == "INVESTIGATING"),
+            "averageResolutionTime": 18.5,
+        }
+
+    @app.get("/api/incidents/critical")
+    async def critical_incidents():
+        return data.by_severity(data.incidents, "CRITICAL")
+
+    @app.get("/api/vulnerabilities")
+    async def vulnerabilities(request: Request):
+        return listing(data.vulnerabilities, request)
+
+    @app.get("/api/vulnerabilities/stats")
+    async def vulnerability_stats():
+        counts = severity_counts(data.vulnerabilities)
+        fixed = sum(1 for v in data.vulnerabilities if v["status"] in ("RESOLVED", "CLOSED"))
+        return {
+            **counts,
+            "criticalInProgress": sum(
+                1 for v in data.by_severity(data.vulnerabilities, "CRITICAL") if v["status"] == "INVESTIGATING"
+            ),
+            "fixRate": round(100 * fixed / max(len(data.vulnerabilities), 1), 1),
+        }
+
+    @app.get("/api/vulnerabilities/severity/{severity}")
+    async def vulnerabilities_by_severity(severity: str):
+        return data.by_severity(data.vulnerabilities, severity.upper())
+
+    @app.get("/api/assessments")
+    async def assessments(request: Request):
+        return listing(data.assessments, request)
+
+    @app.get("/api/assessments/stats")
+    async def assessment_stats():
+        completed = sum(1 for a in data.assessments if a["status"] == "COMPLETED")
+        total = max(len(data.assessments), 1)
+        return {
+            "totalAssessments": len(data.assessments),
+            "completedAssessments": completed,
+            "inProgressAssessments": sum(1 for a in data.assessments if a["status"] == "IN_PROGRESS"),
+            "averageRiskScore": round(sum(a["riskScore"] for a in data.assessments) / total, 1),
+            "completionRate": round(100 * completed / total, 1),
+        }
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--scale", type=int, default=1000, help="activities per process (other lists scale with it)")
+    parser.add_argument("--organizations", type=int, default=40)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+    data = Dataset(args.scale, args.organizations, args.seed)
+    uvicorn.run(create_app(data, args.latency_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
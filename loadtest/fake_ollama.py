@@ -0,0 +1,206 @@
+"""
+Fake Ollama server with simulated timing.
+
+Implements ``/api/generate`` (streamed and not), ``/api/tags`` and
+``/api/ps``. A request waits for one of ``--parallel`` slots (like
+``OLLAMA_NUM_PARALLEL``), loads the model if it is not resident (it stays
+loaded for ``--keep-alive`` seconds), evaluates the prompt at
+``--prompt-tps`` and then produces tokens at ``--eval-tps`` up to the
+request's ``num_predict``. A prompt sent with a ``context`` only pays for
+its new text (the context's text is remembered for the output). The output follows the numbered sections the prompt asks for;
+with ``--ramble`` some responses keep writing past the last section, as
+reasoning models do. ``--error-rate`` makes requests fail with a 500.
+
+    python -m loadtest.fake_ollama --port 11435 --eval-tps 25 --parallel 2
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+
+from app.services.sections import expected_sections
+
+# Roughly how many characters of Persian text make one token
+CHARS_PER_TOKEN = 3.0
+# Tokens sent per streamed chunk sleep, to keep timer overhead low
+TOKENS_PER_TICK = 4
+
+FILLER = (
+    "وضعیت امنیت سایبری در این دوره نسبتاً پایدار ارزیابی می‌شود",
+    "تعداد رخدادهای بحرانی نسبت به دوره قبل کاهش یافته است",
+    "پیگیری آسیب‌پذیری‌های باز سازمان‌های زیرساختی ضروری است",
+    "تقویت پایش مستمر و آموزش کارشناسان در اولویت قرار دارد",
+    "هماهنگی میان سازمان‌ها برای پاسخ سریع‌تر باید بهبود یابد",
+)
+
+
+class Simulator:
+    def __init__(
+        self,
+        models: List[str],
+        prompt_tps: float = 400.0,
+        eval_tps: float = 25.0,
+        load_seconds: float = 5.0,
+        keep_alive: float = 300.0,
+        parallel: int = 2,
+        error_rate: float = 0.0,
+        ramble: float = 0.0,
+        seed: int = 11,
+    ):
+        self.models = models
+        self.prompt_tps = prompt_tps
+        self.eval_tps = eval_tps
+        self.load_seconds = load_seconds
+        self.keep_alive = keep_alive
+        self.error_rate = error_rate
+        self.ramble = ramble
+        self.rng = random.Random(seed)
+        self.slots = asyncio.Semaphore(parallel)
+        self.loaded: Dict[str, float] = {}
+        self._loading: Dict[str, asyncio.Task] = {}
+        # Text behind each returned context, keyed by its first token
+        self._contexts: Dict[int, str] = {}
+
+    async def ensure_loaded(self, model: str) -> float:
+        """Load ``model`` unless resident; returns the seconds spent loading."""
+        now = time.monotonic()
+        if self.loaded.get(model, 0.0) > now:
+            self.loaded[model] = now + self.keep_alive
+            return 0.0
+        # Concurrent requests for a cold model wait for the same load
+        loading = self._loading.get(model)
+        if loading is None:
+            loading = self._loading[model] = asyncio.ensure_future(asyncio.sleep(self.load_seconds))
+        started = time.monotonic()
+        await asyncio.shield(loading)
+        if self._loading.get(model) is loading:
+            del self._loading[model]
+            self.loaded[model] = time.monotonic() + self.keep_alive
+        return time.monotonic() - started
+
+    def response_tokens(self, prompt: str, num_predict: int) -> List[str]:
+        words: List[str] = []
+        titles = expected_sections(prompt) or ["گزارش"]
+        for index, title in enumerate(titles, start=1):
+            words += ["\n\n", f"**{index}. {title}:**", "\n"]
+            for _ in range(self.rng.randint(2, 4)):
+                words += self.rng.choice(FILLER).split() + ["."]
+        if self.rng.random() < self.ramble:
+            words += ["\n\n", f"**{len(titles) + 1}. نکات تکمیلی:**", "\n"]
+            while len(words) < num_predict:
+                words += self.rng.choice(FILLER).split() + ["."]
+        return [word if word.startswith(("\n", ".")) else " " + word for word in words][:num_predict]
+
+    async def generate(self, body: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        model = body.get("model") or self.models[0]
+        prompt = body.get("prompt", "")
+        context = body.get("context") or []
+        full_text = self._contexts.get(context[0], "") + prompt if context else prompt
+        options = body.get("options") or {}
+        num_predict = int(options.get("num_predict", 1024))
+        if num_predict < 0:
+            num_predict = 4096
+        started = time.monotonic()
+        async with self.slots:
+            load_seconds = await self.ensure_loaded(model)
+            prompt_tokens = max(1, int(len(prompt) / CHARS_PER_TOKEN))
+            prompt_seconds = prompt_tokens / self.prompt_tps
+            await asyncio.sleep(prompt_seconds)
+
+            tokens = self.response_tokens(full_text, num_predict)
+            eval_started = time.monotonic()
+            for offset in range(0, len(tokens), TOKENS_PER_TICK):
+                batch = tokens[offset:offset + TOKENS_PER_TICK]
+                await asyncio.sleep(len(batch) / self.eval_tps)
+                for token in batch:
+                    yield {"model": model, "response": token, "done": False}
+            eval_seconds = time.monotonic() - eval_started
+
+        context_id = len(self._contexts) + 1
+        self._contexts[context_id] = full_text
+        yield {
+            "model": model,
+            "response": "",
+            "done": True,
+            "done_reason": "length" if len(tokens) >= num_predict else "stop",
+            "context": [context_id] + list(range(prompt_tokens + len(tokens)))[:2047],
+            "total_duration": int((time.monotonic() - started) * 1e9),
+            "load_duration": int(load_seconds * 1e9),
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_seconds * 1e9),
+            "eval_count": len(tokens),
+            "eval_duration": int(eval_seconds * 1e9),
+        }
+
+
+def create_app(simulator: Simulator) -> FastAPI:
+    app = FastAPI(title="Fake Ollama")
+
+    @app.post("/api/generate")
+    async def generate(body: Dict[str, Any]):
+        if simulator.rng.random() < simulator.error_rate:
+            raise HTTPException(status_code=500, detail="simulated model failure")
+        chunks = simulator.generate(body)
+        if body.get("stream", True):
+            async def lines():
+                async for chunk in chunks:
+                    yield json.dumps(chunk, ensure_ascii=False) + "\n"
+            return StreamingResponse(lines(), media_type="application/x-ndjson")
+        text, final = [], {}
+        async for chunk in chunks:
+            text.append(chunk["response"])
+            final = chunk
+        return {**final, "response": "".join(text)}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": model, "model": model, "size": 4_000_000_000} for model in simulator.models]}
+
+    @app.get("/api/ps")
+    async def ps():
+        now = time.monotonic()
+        return {"models": [
+            {"name": model, "model": model, "expires_in_seconds": round(expires - now)}
+            for model, expires in simulator.loaded.items() if expires > now
+        ]}
+
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--models", default="phi4-reasoning:plus,phi4-reasoning,phi4,phi4:mini,phi3:mini")
+    parser.add_argument("--prompt-tps", type=float, default=400.0)
+    parser.add_argument("--eval-tps", type=float, default=25.0)
+    parser.add_argument("--load-seconds", type=float, default=5.0)
+    parser.add_argument("--keep-alive", type=float, default=300.0)
+    parser.add_argument("--parallel", type=int, default=2)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--ramble", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args(argv)
+    simulator = Simulator(
+        [model.strip() for model in args.models.split(",") if model.strip()],
+        prompt_tps=args.prompt_tps,
+        eval_tps=args.eval_tps,
+        load_seconds=args.load_seconds,
+        keep_alive=args.keep_alive,
+        parallel=args.parallel,
+        error_rate=args.error_rate,
+        ramble=args.ramble,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(simulator), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,311 @@
+"""
+Scenario runner for load tests.
+
+Each virtual user repeatedly picks an endpoint of the scenario (weighted),
+sends the request, waits for the answer and optionally thinks for a while.
+At the end throughput, p50/p95/p99 latency and the error rate are printed
+per endpoint (and written as JSON with ``--json``).
+
+Against a running service::
+
+    python -m loadtest.runner --base-url http://127.0.0.1:8000 --scenario dashboard --users 50 --duration 120
+
+With ``--stack`` the fake Ollama, the fake backend and the service are
+started as subprocesses first and stopped afterwards.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+import numpy as np
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    method: str
+    path: str
+    weight: float = 1.0
+    params: Optional[Dict[str, Any]] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.path}"
+
+
+SCENARIOS: Dict[str, Tuple[Endpoint, ...]] = {
+    # Dashboard users opening the management and process reports
+    "dashboard": (
+        Endpoint("POST", "/api/executive/governor", 2),
+        Endpoint("POST", "/api/executive/director-general", 2),
+        Endpoint("POST", "/api/executive/center-director", 2),
+        Endpoint("POST", "/api/processes/soc-monitoring", 1, {"days": 30}),
+        Endpoint("POST", "/api/processes/forensics", 1),
+        Endpoint("POST", "/api/processes/threat-hunting", 1),
+        Endpoint("POST", "/api/processes/training", 1, {"period_days": 90}),
+        Endpoint("POST", "/api/processes/FIELD_ASSESSMENT", 1),
+        Endpoint("POST", "/api/incidents/report", 2),
+        Endpoint("POST", "/api/vulnerabilities/report", 2),
+        Endpoint("POST", "/api/assessments/report", 1),
+        Endpoint("GET", "/api/models", 1),
+    ),
+    # Management reports only, individually and as a bundle
+    "executive": (
+        Endpoint("POST", "/api/executive/governor"),
+        Endpoint("POST", "/api/executive/director-general"),
+        Endpoint("POST", "/api/executive/center-director"),
+        Endpoint("POST", "/api/executive/bundle"),
+    ),
+    # Cheap requests that never reach Ollama, for the service's own overhead
+    "overhead": (
+        Endpoint("GET", "/api/models"),
+        Endpoint("GET", "/api/replica/freshness"),
+    ),
+}
+
+
+@dataclass
+class Sample:
+    endpoint: str
+    status: int
+    seconds: float
+    error: Optional[str] = None
+
+
+async def virtual_user(
+    client: httpx.AsyncClient,
+    endpoints: Sequence[Endpoint],
+    samples: List[Sample],
+    deadline: float,
+    budget: List[int],
+    think: float,
+    rng: random.Random,
+) -> None:
+    weights = [endpoint.weight for endpoint in endpoints]
+    while time.monotonic() < deadline and budget[0] != 0:
+        budget[0] -= 1
+        endpoint = rng.choices(endpoints, weights)[0]
+        started = time.monotonic()
+        try:
+            response = await client.request(endpoint.method, endpoint.path, params=endpoint.params)
+            error = None if response.status_code < 400 else response.text[:200]
+            samples.append(Sample(endpoint.name, response.status_code, time.monotonic() - started, error))
+        except httpx.HTTPError as e:
+            samples.append(Sample(endpoint.name, 0, time.monotonic() - started, f"{type(e).__name__}: {e}"))
+        if think:
+            await asyncio.sleep(rng.expovariate(1 / think))
+
+
+async def run_scenario(
+    base_url: str,
+    endpoints: Sequence[Endpoint],
+    users: int,
+    duration: float,
+    requests: int = 0,
+    ramp_up: float = 0.0,
+    think: float = 0.0,
+    timeout: float = 600.0,
+    seed: int = 1,
+) -> Tuple[List[Sample], float]:
+    """Run the scenario; returns the samples and the wall time of the run."""
+    samples: List[Sample] = []
+    # Shared request budget; -1 means unlimited (duration only)
+    budget = [requests or -1]
+    # Drop idle connections before the server's keep-alive timeout (uvicorn: 5s) can race a reuse
+    limits = httpx.Limits(max_connections=users, max_keepalive_connections=users, keepalive_expiry=2.0)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        started = time.monotonic()
+        deadline = started + duration
+
+        async def start_user(index: int) -> None:
+            if ramp_up:
+                await asyncio.sleep(ramp_up * index / users)
+            rng = random.Random(seed + index)
+            await virtual_user(client, endpoints, samples, deadline, budget, think, rng)
+
+        await asyncio.gather(*(start_user(index) for index in range(users)))
+        return samples, time.monotonic() - started
+
+
+def summarize(samples: Sequence[Sample], wall_seconds: float) -> Dict[str, Dict[str, Any]]:
+    groups: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        groups.setdefault(sample.endpoint, []).append(sample)
+    groups["total"] = list(samples)
+
+    summary: Dict[str, Dict[str, Any]] = {}
+    for name, group in groups.items():
+        if not group:
+            continue
+        latencies = np.array([sample.seconds for sample in group])
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        errors = [sample for sample in group if sample.error is not None]
+        summary[name] = {
+            "requests": len(group),
+            "throughput_rps": round(len(group) / wall_seconds, 3) if wall_seconds else None,
+            "p50_seconds": round(float(p50), 3),
+            "p95_seconds": round(float(p95), 3),
+            "p99_seconds": round(float(p99), 3),
+            "max_seconds": round(float(latencies.max()), 3),
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(group), 4),
+            "statuses": {str(status): count for status, count in sorted(Counter(s.status for s in group).items())},
+        }
+        if errors:
+            summary[name]["first_error"] = errors[0].error
+    return summary
+
+
+def print_summary(summary: Dict[str, Dict[str, Any]], wall_seconds: float) -> None:
+    print(f"\nwall time: {wall_seconds:.1f}s")
+    header = f"{'endpoint':<42} {'reqs':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'err%':>6}"
+    print(header)
+    print("-" * len(header))
+    for name, row in sorted(summary.items(), key=lambda item: item[0] == "total"):
+        print(
+            f"{name:<42} {row['requests']:>6} {row['throughput_rps']:>8.3f} {row['p50_seconds']:>8.2f} "
+            f"{row['p95_seconds']:>8.2f} {row['p99_seconds']:>8.2f} {row['max_seconds']:>8.2f} "
+            f"{row['error_rate'] * 100:>5.1f}%"
+        )
+    for name, row in summary.items():
+        if name != "total" and row.get("first_error"):
+            print(f"  {name}: {row['first_error']}")
+
+
+# --- Local stack ---
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url}: process exited with {process.returncode}")
+        try:
+            if httpx.get(url, timeout=2).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} not ready after {timeout:.0f}s")
+
+
+def start_stack(args: argparse.Namespace) -> List[subprocess.Popen]:
+    """Start the fake Ollama, the fake backend and the service; returns the processes."""
+    python = sys.executable
+    workdir = tempfile.mkdtemp(prefix="loadtest-")
+    processes: List[subprocess.Popen] = []
+    try:
+        ollama = subprocess.Popen([
+            python, "-m", "loadtest.fake_ollama", "--port", str(args.ollama_port),
+            "--eval-tps", str(args.eval_tps), "--prompt-tps", str(args.prompt_tps),
+            "--parallel", str(args.parallel), "--load-seconds", str(args.load_seconds),
+            "--error-rate", str(args.error_rate), "--ramble", str(args.ramble),
+        ])
+        processes.append(ollama)
+        backend = subprocess.Popen([
+            python, "-m", "loadtest.fake_backend", "--port", str(args.backend_port),
+            "--scale", str(args.scale), "--latency-ms", str(args.backend_latency_ms),
+        ])
+        processes.append(backend)
+        _wait_ready(f"http://127.0.0.1:{args.ollama_port}/api/tags", ollama)
+        _wait_ready(f"http://127.0.0.1:{args.backend_port}/api/dashboard/stats", backend)
+
+        env = {
+            **os.environ,
+            "OLLAMA_BASE_URL": f"http://127.0.0.1:{args.ollama_port}",
+            "BACKEND_BASE_URL": f"http://127.0.0.1:{args.backend_port}/api",
+            "SHARED_CACHE_PATH": os.path.join(workdir, "cache.sqlite3"),
+            "REPLICA_PATH": os.path.join(workdir, "replica.sqlite3"),
+            # Cached reports would turn repeated requests into lookups
+            "REPORT_CACHE_ENABLED": "true" if args.report_cache else "false",
+        }
+        service = subprocess.Popen([
+            python, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(args.service_port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ], env=env)
+        processes.append(service)
+        _wait_ready(f"http://127.0.0.1:{args.service_port}/docs", service)
+    except BaseException:
+        stop_stack(processes)
+        raise
+    return processes
+
+
+def stop_stack(processes: Sequence[subprocess.Popen]) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="dashboard")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests (0: duration only)")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="seconds over which users start")
+    parser.add_argument("--think", type=float, default=0.0, help="mean think time between requests, seconds")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", dest="json_path", help="write the summary to this file")
+
+    stack = parser.add_argument_group("local stack (--stack)")
+    stack.add_argument("--stack", action="store_true", help="start fake Ollama, fake backend and the service")
+    stack.add_argument("--service-port", type=int, default=18000)
+    stack.add_argument("--ollama-port", type=int, default=11435)
+    stack.add_argument("--backend-port", type=int, default=18080)
+    stack.add_argument("--workers", type=int, default=1)
+    stack.add_argument("--report-cache", action="store_true", help="keep the report cache enabled")
+    stack.add_argument("--eval-tps", type=float, default=25.0)
+    stack.add_argument("--prompt-tps", type=float, default=400.0)
+    stack.add_argument("--parallel", type=int, default=2)
+    stack.add_argument("--load-seconds", type=float, default=5.0)
+    stack.add_argument("--error-rate", type=float, default=0.0)
+    stack.add_argument("--ramble", type=float, default=0.0)
+    stack.add_argument("--scale", type=int, default=1000)
+    stack.add_argument("--backend-latency-ms", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    processes: List[subprocess.Popen] = []
+    base_url = args.base_url
+    if args.stack:
+        processes = start_stack(args)
+        base_url = f"http://127.0.0.1:{args.service_port}"
+    try:
+        samples, wall_seconds = asyncio.run(run_scenario(
+            base_url,
+            SCENARIOS[args.scenario],
+            users=args.users,
+            duration=args.duration,
+            requests=args.requests,
+            ramp_up=args.ramp_up,
+            think=args.think,
+            timeout=args.timeout,
+            seed=args.seed,
+        ))
+    finally:
+        stop_stack(processes)
+
+    summary = summarize(samples, wall_seconds)
+    print_summary(summary, wall_seconds)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"scenario": args.scenario, "users": args.users, "wall_seconds": wall_seconds,
+                       "endpoints": summary}, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
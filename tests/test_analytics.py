@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import numpy as np
+
+from app.services.analytics import TimelineStats, parse_timestamps
+
+NOW = datetime(2026, 3, 20, 12, 0)
+
+
+def _item(created, completed=None, status="OPEN", organization="سازمان الف"):
+    return {"createdDate": created, "completedDate": completed, "status": status, "organizationName": organization}
+
+
+def test_parse_timestamps_tolerates_zones_fractions_and_garbage():
+    parsed = parse_timestamps(["2026-03-01T10:00:00.123Z", "2026-03-02 08:30:00", None, "", "not a date"])
+    assert parsed[0] == np.datetime64("2026-03-01T10:00:00")
+    assert parsed[1] == np.datetime64("2026-03-02T08:30:00")
+    assert np.isnat(parsed[2:]).all()
+
+
+def test_window_keeps_whole_days_including_today():
+    stats = TimelineStats("createdDate", days=7, now=NOW)
+    stats.add([_item("2026-03-14T00:00:00"), _item("2026-03-13T23:59:59"), _item("2026-03-20T11:00:00")])
+    assert stats.total == 2
+
+
+def test_pages_accumulate_groups_rates_and_durations():
+    stats = TimelineStats("createdDate", "completedDate", now=NOW)
+    stats.add([
+        _item("2026-03-18T08:00:00", "2026-03-18T10:00:00", "COMPLETED"),
+        _item("2026-03-18T09:00:00", None, "OPEN", None),
+    ])
+    stats.add([
+        _item("2026-03-19T08:00:00", "2026-03-19T14:00:00", "CLOSED"),
+        # Ends before it starts: not a usable duration
+        _item("2026-03-19T08:00:00", "2026-03-18T08:00:00", "RESOLVED"),
+    ])
+    stats.add([])
+    summary = stats.summary()
+    assert summary["total"] == 4
+    assert summary["completion_rate"] == 0.75
+    assert summary["groups"]["organizationName"] == {"سازمان الف": 3, "نامشخص": 1}
+    assert summary["duration_hours"]["count"] == 2
+    assert summary["duration_hours"]["mean"] == 4.0
+
+
+def test_daily_and_weekly_series_end_today():
+    stats = TimelineStats("createdDate", now=NOW)
+    stats.add([_item("2026-03-20T01:00:00"), _item("2026-03-19T01:00:00"), _item("2026-03-10T01:00:00")])
+    assert stats.daily_series(3).tolist() == [0, 1, 1]
+    assert stats.weekly_series(2).tolist() == [1, 2]
+    summary = stats.summary()
+    assert (summary["last_7_days"], summary["previous_7_days"]) == (2, 1)
+
+
+def test_prompt_text_omits_week_over_week_without_two_weeks_of_window():
+    stats = TimelineStats("createdDate", days=7, now=NOW)
+    stats.add([_item("2026-03-19T01:00:00", status="COMPLETED")])
+    text = stats.prompt_text()
+    assert "(7 روز گذشته): 1" in text
+    assert "نرخ تکمیل: 100.0%" in text
+    assert "۷ روز قبل" not in text
+
+
+def test_empty_stats_render_only_the_count():
+    stats = TimelineStats("createdDate", days=30, now=NOW)
+    assert stats.summary()["duration_hours"] is None
+    assert stats.prompt_text().count("\n") == 0
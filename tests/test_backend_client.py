@@ -0,0 +1,270 @@
+import asyncio
+import contextlib
+
+import httpx
+
+from app.services.backend_client import BackendClient
+
+
+def _client(handler, **kwargs):
+    client = BackendClient(**kwargs)
+    client.base_url = "http://backend/api"
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+def test_a_304_returns_the_payload_parsed_earlier():
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, json={"total": 7}, headers={"ETag": '"v1"'})
+
+    client = _client(handler)
+
+    async def scenario():
+        return await client.get_json("/dashboard/stats"), await client.get_json("/dashboard/stats")
+
+    first, second = asyncio.run(scenario())
+    assert seen == [None, '"v1"']
+    assert first == {"total": 7}
+    assert second is first
+
+
+def test_a_changed_resource_replaces_the_stored_payload():
+    versions = iter([("v1", 1), ("v2", 2)])
+
+    def handler(request):
+        if request.headers.get("if-modified-since") == "v2-time":
+            return httpx.Response(304)
+        tag, total = next(versions)
+        return httpx.Response(200, json={"total": total}, headers={"Last-Modified": f"{tag}-time"})
+
+    client = _client(handler)
+
+    async def scenario():
+        return [await client.get_json("/processes") for _ in range(3)]
+
+    assert [r["total"] for r in asyncio.run(scenario())] == [1, 2, 2]
+
+
+def test_responses_without_validators_are_not_kept():
+    def handler(request):
+        assert "if-none-match" not in request.headers
+        return httpx.Response(200, json=[1])
+
+    client = _client(handler)
+    asyncio.run(client.get_json("/organizations"))
+    assert client._validated == {}
+
+
+def test_the_validator_table_is_bounded():
+    def handler(request):
+        return httpx.Response(200, json=[], headers={"ETag": request.url.path})
+
+    client = _client(handler, revalidate_max_entries=2)
+
+    async def scenario():
+        for path in ("/a", "/b", "/c"):
+            await client.get_json(path)
+
+    asyncio.run(scenario())
+    assert list(client._validated) == ["/b", "/c"]
+
+
+def _paged(total_pages, requested):
+    def handler(request):
+        page = int(request.url.params["page"])
+        requested.append(page)
+        return httpx.Response(200, json={"content": [page], "totalPages": total_pages})
+    return handler
+
+
+def test_pages_are_prefetched_only_up_to_the_bound():
+    requested = []
+    client = _client(_paged(10, requested), page_prefetch=2)
+
+    async def scenario():
+        pages = client.iter_page_lists("/activities")
+        first = await pages.__anext__()
+        for _ in range(5):
+            await asyncio.sleep(0.01)
+        fetched_while_paused = len(requested)
+        rest = [items async for items in pages]
+        return first, fetched_while_paused, rest
+
+    first, fetched_while_paused, rest = asyncio.run(scenario())
+    assert first == [0]
+    # One page handed out, two queued, one held by the blocked producer
+    assert fetched_while_paused == 4
+    assert rest == [[page] for page in range(1, 10)]
+
+
+def test_cursor_pages_send_the_cursor_back():
+    def handler(request):
+        cursor = request.url.params.get("cursor")
+        assert ("page" in request.url.params) == (cursor is None)
+        if cursor is None:
+            return httpx.Response(200, json={"items": [1, 2], "nextCursor": "c1"})
+        return httpx.Response(200, json={"items": [3], "nextCursor": None})
+
+    client = _client(handler)
+
+    async def scenario():
+        return [item async for item in client.iter_pages("/incidents")]
+
+    assert asyncio.run(scenario()) == [1, 2, 3]
+
+
+def test_an_unpaged_array_is_the_only_page():
+    client = _client(lambda request: httpx.Response(200, json=[1, 2]))
+
+    async def scenario():
+        return [items async for items in client.iter_page_lists("/processes")]
+
+    assert asyncio.run(scenario()) == [[1, 2]]
+
+
+def test_a_failed_page_raises_in_the_consumer_and_leaving_early_stops_the_producer():
+    requested = []
+
+    def handler(request):
+        if request.url.params["page"] == "1":
+            return httpx.Response(500)
+        return _paged(10, requested)(request)
+
+    client = _client(handler)
+
+    async def failing():
+        return [items async for items in client.iter_page_lists("/activities")]
+
+    try:
+        asyncio.run(failing())
+    except httpx.HTTPStatusError as e:
+        assert e.response.status_code == 500
+    else:
+        raise AssertionError("the failed page was swallowed")
+
+    requested.clear()
+    client = _client(_paged(100, requested), page_prefetch=1)
+
+    async def leave_early():
+        async with contextlib.aclosing(client.iter_page_lists("/activities")) as pages:
+            async for items in pages:
+                break
+        await asyncio.sleep(0.05)
+
+    asyncio.run(leave_early())
+    assert len(requested) <= 3
+
+
+def _counting(delay=0.01, fail=False):
+    calls = []
+
+    async def handler(request):
+        calls.append(str(request.url))
+        await asyncio.sleep(delay)
+        if fail:
+            return httpx.Response(502)
+        return httpx.Response(200, json={"path": request.url.path})
+
+    return calls, handler
+
+
+def test_identical_gets_in_shared_fetches_reach_the_backend_once():
+    calls, handler = _counting()
+    client = _client(handler)
+
+    async def scenario():
+        with client.shared_fetches():
+            shared = await asyncio.gather(
+                client.get_json("/dashboard/stats"),
+                client.get_json("/dashboard/stats"),
+                client.get_json("/processes"),
+            )
+        outside = await asyncio.gather(client.get_json("/dashboard/stats"), client.get_json("/dashboard/stats"))
+        return shared, outside
+
+    shared, outside = asyncio.run(scenario())
+    assert shared[0] is shared[1]
+    assert len(calls) == 4
+    assert sorted(calls[:2]) == ["http://backend/api/dashboard/stats", "http://backend/api/processes"]
+
+
+def test_a_shared_failure_reaches_every_caller():
+    calls, handler = _counting(fail=True)
+    client = _client(handler)
+
+    async def scenario():
+        with client.shared_fetches():
+            return await asyncio.gather(
+                client.get_json("/organizations"), client.get_json("/organizations"), return_exceptions=True
+            )
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(isinstance(result, httpx.HTTPStatusError) for result in results)
+
+
+def test_a_waiter_fetches_itself_when_the_first_caller_is_cancelled():
+    calls, handler = _counting(delay=0.05)
+    client = _client(handler)
+
+    async def scenario():
+        with client.shared_fetches():
+            first = asyncio.ensure_future(client.get_json("/processes"))
+            await asyncio.sleep(0.01)
+            second = asyncio.ensure_future(client.get_json("/processes"))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second, first.cancelled()
+
+    data, cancelled = asyncio.run(scenario())
+    assert cancelled
+    assert data == {"path": "/api/processes"}
+    assert len(calls) == 2
+
+
+def test_a_body_is_hashed_once_and_its_digest_reused_on_304(monkeypatch):
+    from app.services import backend_client as client_module
+    from app.services.sources import _sources, body_hash
+
+    hashed = []
+    monkeypatch.setattr(client_module, "body_hash", lambda body: hashed.append(body) or body_hash(body))
+
+    def handler(request):
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, content=b'{"total": 7}', headers={"ETag": '"v1"'})
+
+    client = _client(handler)
+
+    async def scenario():
+        sources = {}
+        _sources.set(sources)
+        await client.get_json("/dashboard/stats")
+        await client.get_json("/dashboard/stats")
+        return sources, await client.probe("/dashboard/stats"), await client.probe("replica:incidents")
+
+    sources, probed, replica = asyncio.run(scenario())
+    assert hashed == [b'{"total": 7}']
+    assert sources == {"/dashboard/stats": body_hash(b'{"total": 7}')}
+    assert probed == sources["/dashboard/stats"]
+    assert replica is None
+
+
+def test_a_probe_sees_a_changed_body():
+    bodies = iter([b'[1]', b'[1, 2]'])
+
+    def handler(request):
+        return httpx.Response(200, content=next(bodies))
+
+    client = _client(handler)
+
+    async def scenario():
+        return await client.probe("/processes?page=0&size=2"), await client.probe("/processes?page=0&size=2")
+
+    first, second = asyncio.run(scenario())
+    assert first != second
@@ -0,0 +1,68 @@
+import asyncio
+import json
+import os
+
+import httpx
+import pytest
+
+from app.services.backend_client import BackendClient
+from app.services.backend_snapshot import SnapshotMiss, SnapshotReader, SnapshotRecorder, snapshot_key
+
+
+def test_recorded_bodies_replay_by_key(tmp_path):
+    recorder = SnapshotRecorder(str(tmp_path), worker="a")
+    recorder.record(snapshot_key("/incidents", {"size": 2, "page": 0}), b'[{"id": 1}]')
+    recorder.record("/dashboard/stats", '{"total": "۱۲"}'.encode("utf-8"))
+
+    reader = SnapshotReader(str(tmp_path))
+    assert len(reader) == 2
+    assert reader.get_json("/incidents?page=0&size=2") == [{"id": 1}]
+    assert reader.get_json("/dashboard/stats") == {"total": "۱۲"}
+    with pytest.raises(SnapshotMiss):
+        reader.get_json("/organizations")
+
+
+def test_workers_record_side_by_side_and_the_latest_recording_wins(tmp_path):
+    first = SnapshotRecorder(str(tmp_path), worker="1")
+    second = SnapshotRecorder(str(tmp_path), worker="2")
+    first.record("/processes", b'["old"]')
+    second.record("/organizations", b'["org"]')
+    second.record("/processes", b'["new"]')
+    first.record("/vulnerabilities/stats", b'{"open": 3}')
+
+    reader = SnapshotReader(str(tmp_path))
+    assert reader.get_json("/processes") == ["new"]
+    assert reader.get_json("/organizations") == ["org"]
+    assert reader.get_json("/vulnerabilities/stats") == {"open": 3}
+
+
+def test_a_torn_index_line_is_skipped(tmp_path):
+    recorder = SnapshotRecorder(str(tmp_path), worker="1")
+    recorder.record("/processes", b'["kept"]')
+    with open(recorder.index_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(["/organizations", 0, 999, 0.0]) + "\n")
+        f.write('["/dashboard/stats", 0')
+
+    reader = SnapshotReader(str(tmp_path))
+    assert reader.get_json("/processes") == ["kept"]
+    assert "/organizations" not in reader
+    assert "/dashboard/stats" not in reader
+
+
+def test_a_client_recording_replays_without_the_backend(tmp_path):
+    def handler(request):
+        return httpx.Response(200, json={"path": request.url.path, "query": dict(request.url.params)})
+
+    async def record():
+        client = BackendClient(base_url="http://backend/api", mode="record", snapshot_dir=str(tmp_path))
+        client.base_url = "http://backend/api"
+        client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return [await client.get_json("/incidents", {"status": "OPEN"}), await client.get_json("/processes")]
+
+    async def replay():
+        client = BackendClient(mode="replay", snapshot_dir=str(tmp_path))
+        return [await client.get_json("/incidents", {"status": "OPEN"}), await client.get_json("/processes")]
+
+    recorded = asyncio.run(record())
+    assert os.listdir(tmp_path)
+    assert asyncio.run(replay()) == recorded
@@ -0,0 +1,99 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.services.deadline import Deadline, DeadlineExceeded, current_deadline, parse_timeout
+from app.services.early_stop import CompletionDetector
+from app.services.ollama_client import OllamaClient
+from app.services.report_generator import ReportGenerator
+from app.services.timing import RequestTimings, current_timings
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("30", 30.0),
+    ("2.5", 2.5),
+    ("1e9", 600.0),
+    ("0", None),
+    ("-3", None),
+    ("nan", None),
+    ("inf", None),
+    ("soon", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_timeout(value, expected):
+    assert parse_timeout(value) == expected
+
+
+def test_shorten_accumulates_details_and_expire_keeps_the_first_error():
+    deadline = Deadline(10)
+    deadline.shorten("backend", "a")
+    deadline.shorten("backend", "b")
+    first = deadline.expire("queue", "full")
+    assert deadline.expire("generation", "late") is first
+    result = deadline.to_dict()
+    assert result["shortened"] == {"backend": "a; b"}
+    assert result["exceeded"] == {"stage": "queue", "detail": "full"}
+
+
+def test_wait_bounds_the_wait_but_lets_the_shared_work_finish():
+    async def scenario():
+        deadline = Deadline(0.05)
+        work = asyncio.ensure_future(asyncio.sleep(0.1, result="done"))
+        with pytest.raises(DeadlineExceeded) as raised:
+            await deadline.wait("backend", work, usual_timeout=30)
+        assert raised.value.stage == "backend"
+        assert "timeout" in deadline.shortened["backend"]
+        # Shielded: whoever else awaits the fetch still gets it
+        assert await work == "done"
+
+    asyncio.run(scenario())
+
+
+def test_wait_without_time_left_does_not_start_waiting():
+    async def scenario():
+        deadline = Deadline(-1)
+        work = asyncio.ensure_future(asyncio.sleep(1))
+        with pytest.raises(DeadlineExceeded):
+            await deadline.wait("backend", work)
+        await asyncio.sleep(0)
+        assert work.cancelled()
+
+    asyncio.run(scenario())
+
+
+def _slow_ollama(delay: float) -> OllamaClient:
+    async def lines():
+        for i in range(1000):
+            yield (json.dumps({"response": f"کلمه{i} ", "done": False}) + "\n").encode("utf-8")
+            await asyncio.sleep(delay)
+
+    client = OllamaClient("http://ollama.test")
+    client.instances = ["http://ollama.test"]
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, content=lines())))
+    return client
+
+
+def test_stream_stops_at_the_deadline_with_timings_bound():
+    # Regression: the stream's phase("ollama") used to be entered in a wait_for task and fail on exit
+    async def scenario():
+        generator = ReportGenerator()
+        generator.ollama_client = _slow_ollama(0.02)
+        timings = RequestTimings("test")
+        current_timings.set(timings)
+        deadline = Deadline(0.2)
+        current_deadline.set(deadline)
+        detector = CompletionDetector(stop=False)
+        result = {}
+        deltas = [d async for d, _ in generator._stream_generation("m", "prompt", {"num_predict": 5000}, detector, result)]
+        return timings, deadline, detector, result, deltas
+
+    timings, deadline, detector, result, deltas = asyncio.run(scenario())
+    assert detector.reason == "deadline"
+    assert result["early_stop"] == "deadline"
+    assert 0 < result["eval_count"] < 1000
+    assert detector.content.startswith("کلمه0")
+    assert "stopped at the deadline" in deadline.shortened["generation"]
+    assert timings.phases["ollama"] > 0
@@ -0,0 +1,93 @@
+from app.services.early_stop import CompletionDetector
+
+EXPECTED = ["خلاصه", "تحلیل", "توصیه‌ها"]
+
+REPORT = """## 1. خلاصه
+وضعیت پایدار است.
+## 2. تحلیل
+رخدادها کاهش یافته‌اند.
+## 3. توصیه‌ها
+پایش را تقویت کنید.
+"""
+
+
+def _feed(detector, chunks):
+    visible, sections = "", []
+    for chunk in chunks:
+        text, completed = detector.feed(chunk)
+        visible += text
+        sections += completed
+    return visible, sections
+
+
+def test_reasoning_split_across_chunks_is_removed():
+    detector = CompletionDetector(EXPECTED)
+    visible, _ = _feed(detector, ["<thi", "nk>plan the", " report</th", "ink>", REPORT[:20], "<", "b>"])
+    assert visible == REPORT[:20] + "<b>"
+    assert detector.reasoning_chars == len("<think>plan the report</think>")
+
+
+def test_pending_angle_bracket_is_released_on_close():
+    detector = CompletionDetector()
+    _feed(detector, ["a <"])
+    detector.close()
+    assert detector.content == "a <"
+
+
+def test_stops_at_a_heading_past_the_last_section():
+    detector = CompletionDetector(EXPECTED)
+    _, sections = _feed(detector, [REPORT, "## 4. جمع‌بندی اضافه\n", "متن اضافه\n"])
+    assert detector.reason == "sections_complete"
+    assert detector.content == REPORT.strip()
+    assert [s.index for s in sections + detector.close()] == [1, 2, 3]
+
+
+def test_stops_at_a_rule_after_the_last_section():
+    detector = CompletionDetector(EXPECTED)
+    _feed(detector, [REPORT, "---\n", "یادداشت پایانی مدل\n"])
+    assert detector.reason == "sections_complete"
+    assert detector.content.endswith("پایش را تقویت کنید.")
+
+
+def test_repetition_keeps_one_copy():
+    line = "این جمله بارها و بارها تکرار می‌شود.\n"
+    detector = CompletionDetector(EXPECTED)
+    _feed(detector, ["## 1. خلاصه\n", line, line, line, line])
+    assert detector.reason == "repetition"
+    assert detector.content.count(line.strip()) == 1
+
+
+def test_repeated_block_keeps_one_copy():
+    block = "- دسترسی‌های مدیریتی را بازبینی کنید.\n- گزارش هفتگی ارسال شود.\n"
+    detector = CompletionDetector(EXPECTED)
+    _feed(detector, ["## 1. خلاصه\n", block, "\n", block, block])
+    assert detector.reason == "repetition"
+    assert detector.content.count("گزارش هفتگی") == 1
+
+
+def test_bullets_repeated_across_sections_are_kept():
+    bullet = "- پایش رخدادهای بحرانی را تقویت کنید.\n"
+    report = (
+        "## 1. خلاصه\n" + bullet + "وضعیت پایدار است.\n"
+        "## 2. تحلیل\n" + bullet + "رخدادها کاهش یافته‌اند.\n"
+        "## 3. توصیه‌ها\n" + bullet + "- آموزش کارکنان ادامه یابد.\n" + bullet
+    )
+    detector = CompletionDetector(EXPECTED)
+    _feed(detector, [report])
+    assert detector.reason is None
+    assert detector.content.count(bullet.strip()) == 4
+
+
+def test_long_final_section_is_not_cut():
+    detector = CompletionDetector(EXPECTED)
+    filler = "".join(f"- توصیه شماره {i} برای سازمان\n" for i in range(200))
+    _feed(detector, [REPORT, filler])
+    assert detector.reason is None
+    assert detector.content == (REPORT + filler).strip()
+
+
+def test_without_stop_only_reasoning_is_stripped():
+    detector = CompletionDetector(EXPECTED, stop=False)
+    _feed(detector, ["<think>x</think>", REPORT, "## 4. اضافه\n"])
+    assert detector.reason is None
+    assert detector.content.endswith("## 4. اضافه")
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.services.eta import Estimate, EtaPredictor
+from app.services.generation_profiles import GenerationProfile, TokenRateTracker
+from app.services.scheduler import OllamaScheduler, Priority
+
+PROFILE = GenerationProfile("test", num_predict=1000, num_ctx=4096, temperature=0.2, target_latency_seconds=40)
+
+
+def _predictor(slots=4, reserved=1):
+    rates = TokenRateTracker()
+    return EtaPredictor(rates, OllamaScheduler(max_concurrency=slots, reserved_slots=reserved), alpha=1.0), rates
+
+
+def test_unmeasured_model_falls_back_to_the_profile_target():
+    predictor, _ = _predictor()
+    estimate = predictor.predict("incidents", "m", PROFILE, Priority.INTERACTIVE, "x" * 100)
+    assert estimate.queue_seconds == 0
+    assert estimate.generation_seconds == 40
+
+
+def test_generation_time_follows_measured_rates_and_learned_output_length():
+    predictor, rates = _predictor()
+    rates.observe("m", "", {"eval_count": 100, "eval_duration": 10 * 10**9})
+    estimate = predictor.predict("incidents", "m", PROFILE, Priority.INTERACTIVE, "")
+    assert estimate.generation_seconds == pytest.approx(100.0)
+    # Reports of this type end after 200 tokens, not the 1000 allowed
+    predictor.observe(estimate, 0.0, 20.0, "", {"eval_count": 200})
+    assert predictor.predict("incidents", "m", PROFILE, Priority.INTERACTIVE, "").generation_seconds == pytest.approx(20.0)
+
+
+def test_queue_estimate_uses_the_slots_the_class_may_use():
+    async def scenario():
+        predictor, _ = _predictor(slots=3, reserved=1)
+        predictor._mean_service = 60.0
+        scheduler = predictor.scheduler
+        held = [scheduler.slot(Priority.EXECUTIVE) for _ in range(3)]
+        for slot in held:
+            await slot.__aenter__()
+        waiters = [asyncio.ensure_future(scheduler.slot(Priority.INTERACTIVE).__aenter__()) for _ in range(4)]
+        await asyncio.sleep(0)
+        interactive = predictor.predict("incidents", "m", PROFILE, Priority.INTERACTIVE, "")
+        executive = predictor.predict("executive", "m", PROFILE, Priority.EXECUTIVE, "")
+        for task in waiters:
+            task.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        return interactive, executive
+
+    interactive, executive = asyncio.run(scenario())
+    assert interactive.position == 4
+    # 4 ahead over the 2 non-reserved slots, plus half a generation
+    assert interactive.queue_seconds == pytest.approx((4 / 2 + 0.5) * 60)
+    # Executive work is served before the interactive waiters
+    assert executive.position == 0
+    assert executive.queue_seconds == pytest.approx(0.5 * 60)
+
+
+def test_capacity_counts_reports_per_priority_class():
+    predictor, _ = _predictor(slots=4, reserved=1)
+    section = Estimate("executive.section", "m", 0, 0.0, 10.0)
+    for _ in range(3):
+        predictor.observe(section, 0.0, 20.0, "p", {"eval_count": 50})
+    predictor.observe_report("executive", "m", 60.0)
+    capacity = predictor.capacity()
+    model = capacity["models"]["m"]
+    assert capacity["usable_slots"] == {"executive": 4, "interactive": 3, "batch": 3}
+    assert model["seconds_per_report"] == 60.0
+    assert model["seconds_per_generation"] == 20.0
+    assert model["reports_per_minute"] == {"executive": 4.0, "interactive": 3.0, "batch": 3.0}
+    assert model["report_types"] == {"executive": 60.0}
+
+
+def test_single_generation_reports_count_as_reports():
+    predictor, _ = _predictor(slots=2, reserved=0)
+    predictor.observe(Estimate("incidents", "m", 0, 0.0, 30.0), 0.0, 30.0, "p", {"eval_count": 10})
+    assert predictor.capacity()["models"]["m"]["reports_per_minute"]["interactive"] == 4.0
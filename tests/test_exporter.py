@@ -0,0 +1,102 @@
+import asyncio
+import io
+import zipfile
+
+from docx.oxml import parse_xml
+from docx.oxml.ns import qn
+
+from app.services.exporter import ExportService, render_docx
+
+CONTENT = """## خلاصه
+متن **مهم** گزارش
+
+| ستون | مقدار |
+| --- | --- |
+| الف | ۱ |
+"""
+
+
+def _document_xml(data):
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        return parse_xml(archive.read("word/document.xml"))
+
+
+def _children(element):
+    return [child.tag for child in element]
+
+
+def _before(tags, first, second):
+    return tags.index(qn(first)) < tags.index(qn(second))
+
+
+def test_docx_rtl_properties_follow_schema_order():
+    root = _document_xml(render_docx("گزارش", "زیرعنوان", CONTENT))
+    paragraphs = root.findall(".//" + qn("w:pPr"))
+    assert paragraphs
+    for pPr in paragraphs:
+        tags = _children(pPr)
+        assert tags.count(qn("w:bidi")) == 1
+        if qn("w:jc") in tags:
+            assert _before(tags, "w:bidi", "w:jc")
+    for rPr in root.findall(".//" + qn("w:r") + "/" + qn("w:rPr")):
+        assert qn("w:rtl") in _children(rPr)
+    tblPr = root.find(".//" + qn("w:tblPr"))
+    assert _before(_children(tblPr), "w:bidiVisual", "w:tblW")
+    assert _before(_children(tblPr), "w:bidiVisual", "w:tblLook")
+    sectPr = root.find(qn("w:body") + "/" + qn("w:sectPr"))
+    assert _before(_children(sectPr), "w:bidi", "w:docGrid")
+
+
+def test_docx_paragraphs_are_right_aligned():
+    root = _document_xml(render_docx("گزارش", "زیرعنوان", CONTENT))
+    for jc in root.findall(".//" + qn("w:pPr") + "/" + qn("w:jc")):
+        assert jc.get(qn("w:val")) == "right"
+
+
+def test_waiters_render_again_when_the_first_caller_is_cancelled(monkeypatch):
+    renders = []
+
+    async def scenario():
+        service = ExportService()
+        release = asyncio.Event()
+
+        async def fake_executor(pool, fn, fmt, *args):
+            renders.append(fmt)
+            if len(renders) == 1:
+                await release.wait()
+            return b"data"
+
+        loop = asyncio.get_running_loop()
+        monkeypatch.setattr(loop, "run_in_executor", fake_executor)
+        monkeypatch.setattr(service, "_get_pool", lambda: None)
+        first = asyncio.create_task(service.export("html", "t", "s", "c"))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(service.export("html", "t", "s", "c"))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await waiter == b"data"
+        assert first.cancelled()
+
+    asyncio.run(scenario())
+    assert renders == ["html", "html"]
+
+
+def test_render_failure_reaches_every_waiter(monkeypatch):
+    async def scenario():
+        service = ExportService()
+        gate = asyncio.Event()
+
+        async def failing_executor(pool, fn, *args):
+            await gate.wait()
+            raise RuntimeError("boom")
+
+        monkeypatch.setattr(asyncio.get_running_loop(), "run_in_executor", failing_executor)
+        monkeypatch.setattr(service, "_get_pool", lambda: None)
+        tasks = [asyncio.create_task(service.export("html", "t", "s", "c")) for _ in range(3)]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert not service._inflight
+
+    asyncio.run(scenario())
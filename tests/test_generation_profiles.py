@@ -0,0 +1,62 @@
+import pytest
+
+from app.services.generation_profiles import (
+    PROFILES,
+    SLO_SAFETY_FACTOR,
+    TokenRateTracker,
+    affordable_tokens,
+    build_options,
+    profile_for,
+)
+
+NS = 10**9
+
+
+def _rates(eval_tps=20.0, prompt_tps=None, load_seconds=0.0):
+    rates = TokenRateTracker(alpha=1.0)
+    result = {"eval_count": int(eval_tps * 10), "eval_duration": 10 * NS, "load_duration": int(load_seconds * NS)}
+    if prompt_tps:
+        # 2 characters per token
+        result.update(prompt_eval_count=500, prompt_eval_duration=int(500 / prompt_tps * NS))
+    rates.observe("m", "x" * 1000, result)
+    return rates
+
+
+def test_profiles_resolve_by_type_then_router():
+    assert profile_for("executive.center-director").name == "executive-comprehensive"
+    assert profile_for("executive.governor").name == "executive-brief"
+    assert profile_for("processes.training").name == "process"
+    assert profile_for("unknown").name == "freeform"
+
+
+def test_rates_are_measured_from_ollama_counters():
+    rates = _rates(eval_tps=20, prompt_tps=100, load_seconds=2)
+    measured = rates.get("m")
+    assert measured.eval_tps == pytest.approx(20)
+    assert measured.prompt_tps == pytest.approx(100)
+    assert measured.tokens_per_char == pytest.approx(0.5)
+    assert measured.load_seconds == pytest.approx(2)
+    assert rates.estimate_prompt_seconds("m", "x" * 400) == pytest.approx(2)
+
+
+def test_affordable_tokens_subtract_load_and_prompt_time():
+    rates = _rates(eval_tps=20, prompt_tps=100, load_seconds=2)
+    # 30 s - 2 s load - 2 s prompt leaves 26 s at 20 tokens/s
+    assert affordable_tokens("m", "x" * 400, 30, rates) == int(26 * 20 * SLO_SAFETY_FACTOR)
+    assert affordable_tokens("m", "x" * 400, 1, rates) == 0
+    assert affordable_tokens("unmeasured", "x", 30, rates) is None
+
+
+def test_build_options_caps_num_predict_to_the_slo():
+    profile = PROFILES["analytical"]
+    unmeasured = build_options(profile, "other", "p", _rates())
+    assert unmeasured["num_predict"] == profile.num_predict
+    assert unmeasured["num_ctx"] == profile.num_ctx
+    assert unmeasured["stop"] == list(profile.stop)
+    slow = build_options(profile, "m", "p", _rates(eval_tps=5))
+    assert slow["num_predict"] == int(profile.target_latency_seconds * 5 * SLO_SAFETY_FACTOR)
+
+
+def test_num_predict_never_drops_below_the_profile_minimum():
+    profile = PROFILES["analytical"]
+    assert build_options(profile, "m", "p", _rates(eval_tps=1))["num_predict"] == profile.min_predict
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.services.model_catalog import ModelCatalog
+
+
+class FakeOllama:
+    def __init__(self, tags, running=None):
+        self.instances = list(tags)
+        self.tags = tags
+        self.running = running or {}
+
+    async def list_models(self, instance):
+        listed = self.tags[instance]
+        if isinstance(listed, Exception):
+            raise listed
+        return {"models": [{"name": name} for name in listed]}
+
+    async def list_running(self, instance):
+        return {"models": [{"name": name} for name in self.running.get(instance, [])]}
+
+
+def _refreshed(client):
+    catalog = ModelCatalog(client, refresh_seconds=0)
+    asyncio.run(catalog.refresh())
+    return catalog
+
+
+def test_everything_is_allowed_until_the_first_refresh():
+    catalog = ModelCatalog(FakeOllama({"a": []}), refresh_seconds=0)
+    assert catalog.is_known("anything")
+
+
+def test_models_are_merged_across_instances():
+    catalog = _refreshed(FakeOllama(
+        {"a": ["phi4:latest", "qwen3:8b"], "b": ["phi4:latest"]},
+        running={"b": ["phi4:latest"]},
+    ))
+    assert catalog.names() == ["phi4:latest", "qwen3:8b"]
+    listing = asyncio.run(catalog.listing())
+    phi4 = listing["models"][0]
+    assert phi4["instances"] == ["a", "b"]
+    assert phi4["loaded_on"] == ["b"]
+
+
+def test_untagged_names_resolve_to_latest():
+    catalog = _refreshed(FakeOllama({"a": ["phi4:latest", "qwen3:8b"]}))
+    assert catalog.resolve("phi4") == "phi4:latest"
+    assert catalog.is_known("qwen3:8b")
+    assert not catalog.is_known("qwen3")
+    assert not catalog.is_known("llama3")
+
+
+def test_an_unreachable_instance_is_reported_but_not_fatal():
+    catalog = _refreshed(FakeOllama({"a": ["phi4:latest"], "b": RuntimeError("down")}))
+    assert catalog.names() == ["phi4:latest"]
+    assert "b: down" in catalog.error
+
+
+def test_failed_refresh_keeps_the_previous_catalog():
+    client = FakeOllama({"a": ["phi4:latest"]})
+    catalog = _refreshed(client)
+    client.tags["a"] = RuntimeError("down")
+    asyncio.run(catalog.refresh())
+    assert catalog.names() == ["phi4:latest"]
+    assert catalog.error == "a: down"
+
+
+def test_first_refresh_failing_everywhere_raises():
+    catalog = ModelCatalog(FakeOllama({"a": RuntimeError("down")}), refresh_seconds=0)
+    with pytest.raises(RuntimeError):
+        asyncio.run(catalog.listing())
+    assert not catalog.loaded
+
+
+def test_unknown_models_are_rejected_before_any_work(monkeypatch):
+    from fastapi import HTTPException
+
+    from app.api import dependencies
+
+    monkeypatch.setattr(dependencies, "model_catalog", _refreshed(FakeOllama({"a": ["phi4:latest"]})))
+    dependencies.check_model(None)
+    dependencies.check_model("phi4")
+    with pytest.raises(HTTPException) as raised:
+        dependencies.check_model("llama3")
+    assert raised.value.status_code == 422
+    assert "phi4:latest" in raised.value.detail
+
+
+def test_a_changed_digest_drops_cached_prefix_contexts(monkeypatch):
+    from app.services import model_catalog as catalog_module
+    from app.services.prefix_cache import PrefixContextCache
+
+    cache = PrefixContextCache()
+    monkeypatch.setattr(catalog_module, "prefix_cache", cache)
+
+    class DigestOllama(FakeOllama):
+        digests = {"phi4:latest": "d1", "qwen3:8b": "q1"}
+
+        async def list_models(self, instance):
+            return {"models": [{"name": n, "digest": d} for n, d in self.digests.items()]}
+
+    client = DigestOllama({"a": []})
+    catalog = _refreshed(client)
+    cache._store(cache.key("phi4", "p"), "phi4", [1])
+    cache._store(cache.key("qwen3:8b", "p"), "qwen3:8b", [2])
+
+    asyncio.run(catalog.refresh())
+    assert cache.get("phi4", "p") == [1]
+
+    client.digests = {"phi4:latest": "d2", "qwen3:8b": "q1"}
+    asyncio.run(catalog.refresh())
+    assert cache.get("phi4", "p") is None
+    assert cache.get("qwen3:8b", "p") == [2]
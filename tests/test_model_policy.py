@@ -0,0 +1,71 @@
+import pytest
+
+from app.services import model_policy as policy_module
+from app.services.model_policy import ModelPolicy
+
+
+class FakeQueue:
+    depth = 0
+
+    def queue_depth(self):
+        return self.depth
+
+
+@pytest.fixture
+def queue(monkeypatch):
+    fake = FakeQueue()
+    monkeypatch.setattr(policy_module, "scheduler", fake)
+    return fake
+
+
+def test_routes_and_family_fallbacks():
+    policy = ModelPolicy()
+    assert policy.fallback_chain("executive.governor") == ["phi4", "phi4:mini", "phi3:mini"]
+    assert policy.fallback_chain("processes.forensics") == ["phi4:mini", "phi3:mini"]
+    assert policy.fallback_chain("incidents") == ["phi3:mini"]
+    assert policy.fallback_chain("incidents", "phi4-reasoning")[0:2] == ["phi4-reasoning", "phi4"]
+    assert policy.fallback_chain("executive", "custom:7b") == ["custom:7b", "phi4:mini", "phi3:mini"]
+
+
+def test_short_queue_keeps_the_preferred_model(queue):
+    queue.depth = 3
+    decision = ModelPolicy(queue_depth_threshold=4).select("executive")
+    assert decision.model == "phi4"
+    assert not decision.downgraded
+    assert decision.metadata() == {}
+
+
+@pytest.mark.parametrize("depth, model", [(4, "phi4:mini"), (8, "phi3:mini"), (40, "phi3:mini")])
+def test_queue_depth_downgrades_one_step_per_threshold(queue, depth, model):
+    queue.depth = depth
+    decision = ModelPolicy(queue_depth_threshold=4).select("executive")
+    assert decision.model == model
+    assert decision.metadata() == {
+        "model_requested": "phi4",
+        "model_downgraded": True,
+        "downgrade_reason": f"queue_depth={depth}",
+    }
+
+
+def test_slow_models_are_skipped(queue):
+    policy = ModelPolicy(latency_threshold_seconds=90)
+    policy.observe_latency("phi4", 120)
+    policy.observe_latency("phi4:mini", 80)
+    decision = policy.select("executive")
+    assert decision.model == "phi4:mini"
+    assert decision.reason == "latency phi4=120.0s"
+
+
+def test_latency_samples_expire(queue, monkeypatch):
+    policy = ModelPolicy(latency_threshold_seconds=90, latency_window_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr(policy_module.time, "monotonic", lambda: now[0])
+    policy.observe_latency("phi4", 120)
+    now[0] += 61
+    assert policy.observed_latency("phi4") is None
+    assert policy.select("executive").model == "phi4"
+
+
+def test_disabled_policy_never_downgrades(queue):
+    queue.depth = 100
+    assert ModelPolicy(enabled=False).select("executive").model == "phi4"
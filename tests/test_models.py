@@ -0,0 +1,86 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import models
+from app.models.report import Report
+
+
+class FakeGenerator:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+        self.running = 0
+        self.peak = 0
+
+    async def generate_report(self, model, prompt, report_type=None):
+        self.calls.append((model, prompt, report_type))
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            if prompt == "fail":
+                raise RuntimeError("model crashed")
+            return Report(title=prompt, content=f"report for {prompt}", model_used=model)
+        finally:
+            self.running -= 1
+
+
+def _batch(monkeypatch, body, generator=None):
+    generator = generator or FakeGenerator()
+    monkeypatch.setattr(models, "report_generator", generator)
+    app = FastAPI()
+    app.include_router(models.router)
+    response = TestClient(app).post("/generate/batch", json=body)
+    lines = [json.loads(line) for line in response.text.splitlines()] if response.status_code == 200 else []
+    return response, lines, generator
+
+
+def test_batch_streams_one_line_per_item_then_a_summary(monkeypatch):
+    response, lines, generator = _batch(monkeypatch, {
+        "model": "qwen3:8b",
+        "items": ["a", {"prompt": "b", "model": "phi4:latest", "id": "second"}, "a", "fail"],
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    *items, summary = lines
+    assert summary["summary"]["items"] == 4
+    assert summary["summary"]["generated"] == 3
+    assert summary["summary"]["succeeded"] == 3
+    assert summary["summary"]["failed"] == 1
+
+    by_index = {item["index"]: item for item in items}
+    assert sorted(by_index) == [0, 1, 2, 3]
+    assert by_index[1]["id"] == "second"
+    assert by_index[1]["model"] == "phi4:latest"
+    assert by_index[1]["report"]["content"] == "report for b"
+    assert by_index[0]["report"]["content"] == by_index[2]["report"]["content"] == "report for a"
+    assert [by_index[0]["deduplicated"], by_index[2]["deduplicated"]] == [False, True]
+    assert by_index[3]["status"] == "error"
+    assert by_index[3]["error"] == "model crashed"
+    assert all("finished_at" in item and "seconds" in item for item in items)
+
+    assert sorted(generator.calls) == [
+        ("phi4:latest", "b", "generate.batch"),
+        ("qwen3:8b", "a", "generate.batch"),
+        ("qwen3:8b", "fail", "generate.batch"),
+    ]
+
+
+def test_batch_bounds_parallel_generations(monkeypatch):
+    monkeypatch.setattr(models, "BATCH_MAX_PARALLEL", 2)
+    _, lines, generator = _batch(monkeypatch, {"model": "m", "items": [str(i) for i in range(6)]}, FakeGenerator(0.01))
+    assert lines[-1]["summary"]["succeeded"] == 6
+    assert generator.peak == 2
+
+
+def test_batch_rejects_empty_and_oversized_requests(monkeypatch):
+    assert _batch(monkeypatch, {"items": []})[0].status_code == 400
+    assert _batch(monkeypatch, {"items": ["a", ""]})[0].status_code == 400
+    monkeypatch.setattr(models, "BATCH_MAX_ITEMS", 2)
+    response, _, generator = _batch(monkeypatch, {"items": ["a", "b", "c"]})
+    assert response.status_code == 413
+    assert generator.calls == []
@@ -0,0 +1,66 @@
+import asyncio
+
+from app.services.prefix_cache import PRIMING_INSTRUCTION, PrefixContextCache
+
+
+class FakeOllama:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_raw(self, model, prompt, options):
+        self.prompts.append((model, prompt))
+        await asyncio.sleep(0)
+        return {"context": [len(self.prompts)]}
+
+
+def test_a_preamble_is_evaluated_once_per_model():
+    cache = PrefixContextCache()
+    client = FakeOllama()
+
+    async def scenario():
+        first = await asyncio.gather(*(cache.context_for(client, "phi4", "role", 4096) for _ in range(3)))
+        again = await cache.context_for(client, "phi4", "role", 4096)
+        other = await cache.context_for(client, "phi4:mini", "role", 4096)
+        return first, again, other
+
+    first, again, other = asyncio.run(scenario())
+    assert first == [[1], [1], [1]]
+    assert again == [1]
+    assert other == [2]
+    assert client.prompts[0] == ("phi4", "role" + PRIMING_INSTRUCTION)
+
+
+def test_entries_are_keyed_on_the_preamble_hash():
+    cache = PrefixContextCache()
+    client = FakeOllama()
+    asyncio.run(cache.context_for(client, "phi4", "role v1", 4096))
+    assert cache.get("phi4", "role v1") == [1]
+    assert cache.get("phi4", "role v2") is None
+    assert cache.key("phi4", "role v1") != cache.key("phi4", "role v2")
+    assert asyncio.run(cache.context_for(client, "phi4", "role v2", 4096)) == [2]
+
+
+def test_expired_and_evicted_entries_miss():
+    cache = PrefixContextCache(max_entries=1, ttl_seconds=60)
+    cache._store(cache.key("a", "p"), "a", [1])
+    cache._store(cache.key("b", "p"), "b", [2])
+    assert cache.get("a", "p") is None
+    assert cache.get("b", "p") == [2]
+
+    cache.ttl_seconds = -1
+    assert cache.get("b", "p") is None
+
+
+def test_disabled_cache_never_evaluates():
+    client = FakeOllama()
+    assert asyncio.run(PrefixContextCache(enabled=False).context_for(client, "phi4", "role", 4096)) is None
+    assert client.prompts == []
+
+
+def test_invalidate_drops_one_model():
+    cache = PrefixContextCache()
+    cache._store(cache.key("a", "p"), "a", [1])
+    cache._store(cache.key("b", "p"), "b", [2])
+    assert cache.invalidate("a") == 1
+    assert cache.get("a", "p") is None
+    assert cache.get("b", "p") == [2]
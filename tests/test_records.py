@@ -0,0 +1,96 @@
+import asyncio
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+
+from app.api.endpoints.incidents import INCIDENT_SPEC
+from app.api.endpoints.processes import ACTIVITY_SPEC
+from app.services.analytics import TimelineStats
+from app.services.backend_client import BackendClient
+from app.services.records import RecordColumns, RecordError
+
+NOW = datetime(2026, 3, 20, 12, 0)
+
+
+def _activity(index, status="COMPLETED"):
+    return {
+        "id": index,
+        "title": f"activity {index}",
+        "description": "x" * 40,
+        "status": status,
+        "organizationName": "سازمان الف",
+        "createdDate": "2026-03-18T08:00:00",
+        "completedDate": "2026-03-18T10:00:00",
+        "tags": [{"status": "ignored"}],
+    }
+
+
+def _columns(items, spec=ACTIVITY_SPEC):
+    return RecordColumns.from_items(spec, json.loads(json.dumps(items).encode("utf-8")))
+
+
+def test_only_the_spec_fields_are_kept():
+    columns = _columns([_activity(1), _activity(2, "OPEN")])
+    assert len(columns) == 2
+    assert columns["status"] == ["COMPLETED", "OPEN"]
+    assert set(columns.columns) == {"status", "organizationName", "createdDate", "completedDate"}
+
+
+def test_categorical_values_are_interned():
+    first = _columns([_activity(i) for i in range(3)])
+    second = _columns([_activity(i) for i in range(3)])
+    organizations = first["organizationName"] + second["organizationName"]
+    assert all(value is organizations[0] for value in organizations)
+    assert first["createdDate"][0] is not second["createdDate"][0]
+
+
+def test_a_missing_required_field_is_rejected():
+    incident = {"title": "t", "severity": "CRITICAL", "status": "OPEN"}
+    with pytest.raises(RecordError, match="organizationName"):
+        _columns([incident], INCIDENT_SPEC)
+    with pytest.raises(RecordError, match="status"):
+        _columns([{**_activity(1), "status": None}])
+    with pytest.raises(RecordError):
+        _columns(["not an object"])
+
+
+def test_rows_have_the_model_attributes_and_no_dict():
+    columns = _columns([
+        {"title": "نفوذ", "severity": "CRITICAL", "status": "OPEN", "organizationName": "الف", "detectionDate": None},
+        {"title": "باج‌افزار", "severity": "CRITICAL", "status": "CLOSED", "organizationName": "ب"},
+    ], INCIDENT_SPEC)
+    first, = columns.head(1)
+    assert (first.title, first.status, first.detectionDate) == ("نفوذ", "OPEN", None)
+    assert not hasattr(first, "__dict__")
+    assert [row.organizationName for row in columns.rows()] == ["الف", "ب"]
+
+
+def test_timeline_stats_agree_on_dicts_and_columns():
+    items = [_activity(1), _activity(2, "OPEN"), {**_activity(3), "organizationName": None}]
+    from_dicts = TimelineStats("createdDate", "completedDate", now=NOW)
+    from_dicts.add(items)
+    from_columns = TimelineStats("createdDate", "completedDate", now=NOW)
+    from_columns.add_columns(_columns(items).columns)
+    assert from_columns.summary() == from_dicts.summary()
+
+
+def test_pages_are_decoded_straight_from_the_response_body():
+    def handler(request):
+        page = int(request.url.params["page"])
+        return httpx.Response(200, json={"content": [_activity(page)], "totalPages": 2})
+
+    client = BackendClient()
+    client.base_url = "http://backend/api"
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def scenario():
+        stats = TimelineStats("createdDate", "completedDate", now=NOW)
+        async for page in client.iter_page_columns("/activities/by-process/TRAINING", ACTIVITY_SPEC):
+            stats.add_columns(page.columns)
+        return stats
+
+    summary = asyncio.run(scenario()).summary()
+    assert summary["total"] == 2
+    assert summary["groups"]["status"] == {"COMPLETED": 2}
@@ -0,0 +1,113 @@
+import asyncio
+
+import httpx
+
+from app.services import replica as replica_module
+from app.services.backend_client import BackendClient
+from app.services.replica import BackendReplica, parse_timestamp
+
+
+class FakeBackend:
+    def __init__(self, incidents):
+        self.incidents = incidents
+        self.queries = []
+
+    def handler(self, request):
+        params = dict(request.url.params)
+        self.queries.append(params)
+        since = parse_timestamp(params.get("updatedSince"))
+        items = [i for i in self.incidents if since is None or parse_timestamp(i["updatedAt"]) > since]
+        return httpx.Response(200, json=items)
+
+
+def _incident(record_id, updated, detected="2026-03-01T10:00:00", severity="CRITICAL"):
+    return {
+        "id": record_id,
+        "title": f"incident {record_id}",
+        "severity": severity,
+        "status": "OPEN",
+        "organizationName": "الف",
+        "detectionDate": detected,
+        "updatedAt": updated,
+    }
+
+
+def _replica(tmp_path, monkeypatch, fake, full_interval=3600.0):
+    client = BackendClient()
+    client.base_url = "http://backend/api"
+    client.client = httpx.AsyncClient(transport=httpx.MockTransport(fake.handler))
+    monkeypatch.setattr(replica_module, "backend", client)
+    return BackendReplica(str(tmp_path / "replica.sqlite3"), full_interval=full_interval, enabled=True)
+
+
+def _sync(replica):
+    return asyncio.run(replica.sync(replica.datasets["incidents"]))
+
+
+def _ids(replica, **kwargs):
+    return [row["id"] for row in asyncio.run(replica.query("incidents", **kwargs))]
+
+
+def test_the_watermark_is_the_latest_timestamp_whatever_its_separator(tmp_path, monkeypatch):
+    fake = FakeBackend([
+        _incident(1, "2026-03-01T09:00:00"),
+        # Sorts before the first as a string, but is an hour later
+        _incident(2, "2026-03-01 10:00:00"),
+        _incident(3, "2026-03-01T08:30:00.5+00:00"),
+    ])
+    replica = _replica(tmp_path, monkeypatch, fake)
+    assert _sync(replica) == 3
+    assert replica._state("incidents", "")["watermark"] == "2026-03-01 10:00:00"
+
+    fake.incidents.append(_incident(4, "2026-03-01T11:00:00Z"))
+    assert _sync(replica) == 1
+    assert fake.queries[-1]["updatedSince"] == "2026-03-01 10:00:00"
+    assert replica._state("incidents", "")["watermark"] == "2026-03-01T11:00:00Z"
+
+
+def test_only_a_full_read_drops_deleted_records(tmp_path, monkeypatch):
+    fake = FakeBackend([_incident(1, "2026-03-01T09:00:00"), _incident(2, "2026-03-01T09:00:00")])
+    replica = _replica(tmp_path, monkeypatch, fake)
+    _sync(replica)
+    fake.incidents.pop(0)
+    _sync(replica)
+    assert sorted(_ids(replica)) == [1, 2]
+
+    replica.full_interval = 0
+    _sync(replica)
+    assert "updatedSince" not in fake.queries[-1]
+    assert _ids(replica) == [2]
+
+
+def test_incidents_keep_the_backend_order(tmp_path, monkeypatch):
+    fake = FakeBackend([
+        _incident(5, "2026-03-01T09:00:00", detected="2026-02-01T10:00:00"),
+        _incident(3, "2026-03-01T09:00:00", detected="2026-03-05 10:00:00", severity="HIGH"),
+        _incident(9, "2026-03-01T09:00:00", detected="2026-03-01T10:00:00"),
+    ])
+    replica = _replica(tmp_path, monkeypatch, fake)
+    _sync(replica)
+    assert _ids(replica, match={"severity": "CRITICAL"}) == [5, 9]
+
+    # A changed record keeps its place, a new one goes last
+    fake.incidents[0]["updatedAt"] = "2026-03-02T09:00:00"
+    fake.incidents.insert(0, _incident(7, "2026-03-02T09:00:00"))
+    _sync(replica)
+    assert _ids(replica) == [5, 3, 9, 7]
+
+    replica.full_interval = 0
+    _sync(replica)
+    assert _ids(replica) == [7, 5, 3, 9]
+
+
+def test_dates_are_filtered_and_sorted_as_timestamps(tmp_path, monkeypatch):
+    fake = FakeBackend([])
+    replica = _replica(tmp_path, monkeypatch, fake)
+    assessments = replica.datasets["assessments"]
+    replica._upsert(assessments, "", [
+        replica._row(assessments, "", {"id": 1, "status": "COMPLETED", "assessmentDate": "2026-03-14 10:00:00"}) + (0,),
+        replica._row(assessments, "", {"id": 2, "status": "COMPLETED", "assessmentDate": "2026-03-14T09:00:00"}) + (1,),
+        replica._row(assessments, "", {"id": 3, "status": "COMPLETED", "assessmentDate": "2026-03-13T23:00:00"}) + (2,),
+    ], True)
+    rows = asyncio.run(replica.query("assessments", since="2026-03-14 00:00:00"))
+    assert [row["id"] for row in rows] == [1, 2]
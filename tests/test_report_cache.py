@@ -0,0 +1,206 @@
+import asyncio
+
+import pytest
+
+from app.models.report import Report
+from app.services.deadline import DeadlineExceeded
+from app.services.prompts import ReportPrompt
+from app.services.report_cache import ReportCache
+from app.services.report_store import ReportStore
+from app.services.shared_cache import SharedCache
+
+PARAMS = {"limit": 5}
+
+
+class FakeGenerator:
+    def __init__(self):
+        self.outcomes = []
+        self.calls = 0
+
+    async def generate_report(self, model, prompt, report_type, sectioned=False):
+        self.calls += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return Report(id=f"r{self.calls}", title=report_type, content=outcome, model_used="m", metadata={})
+
+
+def _cache(tmp_path, **kwargs):
+    cache = ReportCache(SharedCache(str(tmp_path / "cache.sqlite3")), retry_seconds=0.01, **kwargs)
+    cache.generator = FakeGenerator()
+    cache.store = ReportStore(shared=cache.shared)
+    return cache
+
+
+def _prompt(body="data"):
+    return ReportPrompt("preamble ", body)
+
+
+async def _generate(cache, body="data"):
+    return await cache.generate(None, _prompt(body), "incidents", PARAMS)
+
+
+def test_unchanged_inputs_are_served_from_the_cache(tmp_path):
+    async def scenario():
+        cache = _cache(tmp_path)
+        cache.generator.outcomes = ["first", "second"]
+        first = await _generate(cache)
+        hit = await _generate(cache)
+        changed = await _generate(cache, "new data")
+        return first, hit, changed, cache.generator.calls
+
+    first, hit, changed, calls = asyncio.run(scenario())
+    assert first.metadata["cache"] == "miss"
+    assert (hit.content, hit.metadata["cache"]) == ("first", "hit")
+    assert changed.content == "second"
+    assert calls == 2
+
+
+def test_failed_generation_serves_the_last_good_report_and_regenerates(tmp_path):
+    async def scenario():
+        cache = _cache(tmp_path, enabled=False)
+        cache.generator.outcomes = ["good", RuntimeError("ollama down"), RuntimeError("still down"), "fresh"]
+        await _generate(cache)
+        stale = await _generate(cache, "other data")
+        # The background regeneration retries with backoff until it succeeds
+        while cache._pending:
+            await asyncio.sleep(0.01)
+        recovered = await cache.shared.aget_pinned(cache.last_good_key("incidents", PARAMS))
+        return stale, recovered, cache.generator.calls
+
+    stale, recovered, calls = asyncio.run(scenario())
+    assert stale.content == "good"
+    assert stale.metadata["stale"] is True
+    assert stale.metadata["stale_reason"] == "generation failed: ollama down"
+    assert stale.metadata["stale_age_seconds"] >= 0
+    assert recovered["report"]["content"] == "fresh"
+    assert calls == 4
+
+
+def test_deadline_error_is_reported_as_the_stale_reason(tmp_path):
+    async def scenario():
+        cache = _cache(tmp_path, enabled=False)
+        cache.generator.outcomes = ["good", DeadlineExceeded("queue", "full"), "fresh"]
+        await _generate(cache)
+        stale = await _generate(cache)
+        cache.stop()
+        return stale
+
+    assert asyncio.run(scenario()).metadata["stale_reason"] == "deadline"
+
+
+def test_report_cut_by_the_deadline_is_replaced_by_the_last_good_one(tmp_path):
+    async def scenario():
+        cache = _cache(tmp_path)
+        cache.generator.outcomes = ["complete"]
+        await _generate(cache)
+
+        async def cut(model, prompt, report_type, sectioned=False):
+            return Report(title="t", content="partial", model_used="m", metadata={
+                "early_stop": "deadline", "deadline": {"shortened": {"generation": "stopped"}},
+            })
+
+        cache.generator.generate_report = cut
+        served = await _generate(cache, "changed data")
+        cache.stop()
+        return served
+
+    served = asyncio.run(scenario())
+    assert served.content == "complete"
+    assert served.metadata["stale_reason"].startswith("deadline")
+
+
+def test_last_good_report_outlives_cache_eviction_and_its_export_artifact(tmp_path):
+    async def scenario():
+        cache = ReportCache(SharedCache(str(tmp_path / "cache.sqlite3"), max_bytes=400), enabled=False)
+        cache.generator = FakeGenerator()
+        cache.store = ReportStore(shared=cache.shared, ttl=-1)
+        cache.generator.outcomes = ["good", RuntimeError("ollama down")]
+        await _generate(cache)
+        # Other cached values fill the bound; the original export artifact expired
+        for index in range(10):
+            await cache.shared.aset(f"filler-{index}", "x" * 100, 60)
+        cache.store.ttl = 60
+        stale = await _generate(cache)
+        cache.stop()
+        # Another worker, with nothing in memory, exports it by id
+        exported = await ReportStore(shared=cache.shared).get(stale.id)
+        return stale, exported
+
+    stale, exported = asyncio.run(scenario())
+    assert (stale.id, stale.content) == ("r1", "good")
+    assert exported is not None
+    assert exported.metadata["stale"] is True
+
+
+def test_without_a_last_good_report_the_error_propagates(tmp_path):
+    async def scenario():
+        cache = _cache(tmp_path)
+        cache.generator.outcomes = [RuntimeError("ollama down")]
+        await _generate(cache)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
+
+
+class FakeProbe:
+    def __init__(self, digests):
+        self.digests = digests
+        self.probed = []
+
+    async def probe(self, key):
+        self.probed.append(key)
+        return self.digests.get(key)
+
+
+def test_the_watcher_rebuilds_only_when_a_probed_source_changed(tmp_path):
+    builds = []
+
+    async def build_prompt(report_type, params):
+        builds.append(report_type)
+        prompt = _prompt("new data")
+        prompt.sources = {"/incidents/critical": "v2"}
+        return prompt
+
+    async def scenario():
+        cache = _cache(tmp_path)
+        cache._build_prompt = build_prompt
+        cache.generator.outcomes = ["first", "second"]
+        prompt = _prompt()
+        prompt.sources = {"/incidents/critical": "v1"}
+        await cache.generate(None, prompt, "incidents", PARAMS)
+
+        cache.backend = FakeProbe({"/incidents/critical": "v1"})
+        unchanged = await cache.refresh_all()
+        cache.backend.digests["/incidents/critical"] = "v2"
+        changed = await cache.refresh_all()
+        return unchanged, changed, cache.backend.probed
+
+    unchanged, changed, probed = asyncio.run(scenario())
+    assert unchanged["regenerated"] == 0
+    assert changed["regenerated"] == 1
+    assert builds == ["incidents"]
+    assert probed == ["/incidents/critical", "/incidents/critical"]
+
+
+def test_sources_that_cannot_be_probed_are_rebuilt(tmp_path):
+    builds = []
+
+    async def build_prompt(report_type, params):
+        builds.append(report_type)
+        prompt = _prompt()
+        prompt.sources = {"replica:incidents?severity=CRITICAL": "r1"}
+        return prompt
+
+    async def scenario():
+        cache = _cache(tmp_path)
+        cache._build_prompt = build_prompt
+        cache.generator.outcomes = ["first"]
+        await cache.generate(None, await build_prompt("incidents", PARAMS), "incidents", PARAMS)
+        builds.clear()
+        cache.backend = FakeProbe({})
+        return await cache.refresh_all()
+
+    counts = asyncio.run(scenario())
+    assert builds == ["incidents"]
+    assert counts["regenerated"] == 0
@@ -0,0 +1,181 @@
+import asyncio
+
+import pytest
+
+from app.services.request_context import caller_id, priority_override
+from app.services.scheduler import OllamaScheduler, Priority, priority_for, run_as_background
+
+
+async def _serve(scheduler, requests, hold=0.01):
+    """Run ``(name, priority, caller)`` requests in order; returns the grant order."""
+    order = []
+
+    async def one(name, priority, caller):
+        async with scheduler.slot(priority, caller):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    tasks = []
+    for request in requests:
+        tasks.append(asyncio.create_task(one(*request)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    return order
+
+
+def test_higher_priority_is_served_first():
+    scheduler = OllamaScheduler(max_concurrency=1, reserved_slots=0)
+    order = asyncio.run(_serve(scheduler, [
+        ("first", Priority.BATCH, "a"),
+        ("batch", Priority.BATCH, "a"),
+        ("interactive", Priority.INTERACTIVE, "a"),
+        ("executive", Priority.EXECUTIVE, "a"),
+    ]))
+    assert order == ["first", "executive", "interactive", "batch"]
+
+
+def test_callers_share_a_class_fairly():
+    scheduler = OllamaScheduler(max_concurrency=1, reserved_slots=0)
+    requests = [("busy-0", Priority.INTERACTIVE, "busy")]
+    requests += [(f"busy-{i}", Priority.INTERACTIVE, "busy") for i in range(1, 4)]
+    requests += [("quiet-1", Priority.INTERACTIVE, "quiet")]
+    order = asyncio.run(_serve(scheduler, requests))
+    # The quiet caller does not wait behind the whole backlog of the busy one
+    assert order.index("quiet-1") == 1
+
+
+def test_caller_weights():
+    scheduler = OllamaScheduler(max_concurrency=1, reserved_slots=0, caller_weights={"heavy": 2.0})
+    requests = [("start", Priority.BATCH, "other")]
+    requests += [(f"heavy-{i}", Priority.BATCH, "heavy") for i in range(4)]
+    requests += [(f"light-{i}", Priority.BATCH, "light") for i in range(2)]
+    order = asyncio.run(_serve(scheduler, requests))
+    served = order[1:]
+    # Two heavy requests for each light one
+    assert served[:3].count("light-0") == 1
+    assert [name.split("-")[0] for name in served[:3]].count("heavy") == 2
+
+
+def test_aging_promotes_waiting_batch_work():
+    async def run():
+        scheduler = OllamaScheduler(max_concurrency=1, aging_seconds=0.05, reserved_slots=0)
+        order = []
+
+        async def one(name, priority, hold):
+            async with scheduler.slot(priority, name):
+                order.append(name)
+                await asyncio.sleep(hold)
+
+        blocker = asyncio.create_task(one("blocker", Priority.EXECUTIVE, 0.15))
+        await asyncio.sleep(0)
+        batch = asyncio.create_task(one("batch", Priority.BATCH, 0))
+        await asyncio.sleep(0.12)
+        interactive = asyncio.create_task(one("interactive", Priority.INTERACTIVE, 0))
+        await asyncio.gather(blocker, batch, interactive)
+        return order
+
+    assert asyncio.run(run()) == ["blocker", "batch", "interactive"]
+
+
+def test_reserved_slot_is_kept_for_executive_work():
+    async def run():
+        scheduler = OllamaScheduler(max_concurrency=2, reserved_slots=1)
+        release = asyncio.Event()
+        granted = []
+
+        async def one(name, priority):
+            async with scheduler.slot(priority, name):
+                granted.append(name)
+                await release.wait()
+
+        tasks = [asyncio.create_task(one("i1", Priority.INTERACTIVE)),
+                 asyncio.create_task(one("i2", Priority.INTERACTIVE))]
+        await asyncio.sleep(0.01)
+        assert granted == ["i1"]
+        assert scheduler.free_slots(Priority.INTERACTIVE) == 0
+        assert scheduler.free_slots(Priority.EXECUTIVE) == 1
+        tasks.append(asyncio.create_task(one("e1", Priority.EXECUTIVE)))
+        await asyncio.sleep(0.01)
+        assert granted == ["i1", "e1"]
+        release.set()
+        await asyncio.gather(*tasks)
+        assert scheduler.stats()["active"] == 0
+
+    asyncio.run(run())
+
+
+def test_aged_work_takes_an_idle_reserved_slot_without_other_events():
+    async def run():
+        scheduler = OllamaScheduler(max_concurrency=2, aging_seconds=0.05, reserved_slots=1)
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.slot(Priority.INTERACTIVE, "a"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        # Nothing is enqueued or released after this: only the aging timer can grant it
+        waiter = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        assert scheduler.active == 1
+        await asyncio.sleep(0.08)
+        assert scheduler.active == 2
+        release.set()
+        await asyncio.gather(holder, waiter)
+
+    asyncio.run(run())
+
+
+def test_timed_out_waiter_leaves_the_queue():
+    async def run():
+        scheduler = OllamaScheduler(max_concurrency=1, reserved_slots=0)
+        async with scheduler.slot(Priority.BATCH, "a"):
+            with pytest.raises(asyncio.TimeoutError):
+                async with scheduler.slot(Priority.BATCH, "b", timeout=0.01):
+                    pass
+            assert scheduler.queue_depth() == 0
+        assert scheduler.active == 0
+
+    asyncio.run(run())
+
+
+def test_finished_callers_are_pruned():
+    scheduler = OllamaScheduler(max_concurrency=1, reserved_slots=0)
+    requests = [(f"c{i}", Priority.INTERACTIVE, f"caller-{i}") for i in range(50)]
+    asyncio.run(_serve(scheduler, requests, hold=0))
+    assert len(scheduler._caller_finish) <= 1
+
+
+def test_priority_for_report_types_and_overrides():
+    assert priority_for("executive.governor") == Priority.EXECUTIVE
+    assert priority_for("incidents.report") == Priority.INTERACTIVE
+    assert priority_for("generate.batch") == Priority.BATCH
+    assert priority_for("unknown.type") == Priority.BATCH
+
+    async def lowered():
+        priority_override.set("batch")
+        return priority_for("executive.governor")
+
+    async def raised():
+        priority_override.set("executive")
+        return priority_for("incidents.report")
+
+    async def background():
+        run_as_background("watcher")
+        return priority_for("executive.governor"), caller_id.get()
+
+    assert asyncio.run(lowered()) == Priority.BATCH
+    assert asyncio.run(raised()) == Priority.INTERACTIVE
+    assert asyncio.run(background()) == (Priority.BATCH, "watcher")
+
+
+def test_slots_scale_with_the_fleet(monkeypatch):
+    from app.services.scheduler import _max_concurrency
+
+    monkeypatch.delenv("OLLAMA_MAX_CONCURRENCY", raising=False)
+    monkeypatch.setenv("OLLAMA_BASE_URLS", "http://a:11434,http://b:11434")
+    monkeypatch.setenv("OLLAMA_SLOTS_PER_INSTANCE", "3")
+    assert _max_concurrency() == 6
+    monkeypatch.setenv("OLLAMA_MAX_CONCURRENCY", "2")
+    assert _max_concurrency() == 2
@@ -0,0 +1,87 @@
+from app.services.sections import SectionParser, expected_sections, strip_heading, titles_match
+
+PROMPT = """
+ساختار گزارش:
+1. **خلاصه اجرایی:** وضعیت کلی
+2. **تحلیل رخدادها:** روندها
+3. **توصیه‌ها:** اقدامات
+   1. **جزئیات:** این یک فهرست داخلی است
+"""
+
+OUTPUT = """مقدمه کوتاه
+## 1. خلاصه اجرایی
+وضعیت پایدار است.
+**1. مورد فهرست:** داخل بخش
+**2. تحلیل رخدادها:** رخدادها کاهش یافته‌اند.
+ادامه تحلیل
+### ۳. توصیه ها
+پایش را تقویت کنید."""
+
+
+def test_expected_sections_reads_top_level_numbering_only():
+    assert expected_sections(PROMPT) == ["خلاصه اجرایی", "تحلیل رخدادها", "توصیه‌ها"]
+
+
+def _parse(chunks):
+    parser = SectionParser(expected_sections(PROMPT))
+    completed = []
+    for chunk in chunks:
+        completed += parser.feed(chunk)
+    completed += parser.close()
+    return parser, completed
+
+
+def test_parser_splits_on_expected_headings():
+    parser, sections = _parse([OUTPUT])
+    assert parser.preamble == "مقدمه کوتاه\n"
+    assert [s.index for s in sections] == [1, 2, 3]
+    assert [s.title for s in sections] == ["خلاصه اجرایی", "تحلیل رخدادها", "توصیه‌ها"]
+    # A bold numbered list item inside a section is not a heading
+    assert "**1. مورد فهرست:** داخل بخش" in sections[0].content
+    # Inline text after a bold heading belongs to the section
+    assert sections[1].content.startswith("رخدادها کاهش یافته‌اند.")
+    assert sections[2].content == "پایش را تقویت کنید."
+
+
+def test_parser_is_independent_of_chunking():
+    _, whole = _parse([OUTPUT])
+    _, streamed = _parse([OUTPUT[i:i + 3] for i in range(0, len(OUTPUT), 3)])
+    assert [s.to_dict() for s in streamed] == [s.to_dict() for s in whole]
+
+
+def test_sections_complete_as_the_next_heading_arrives():
+    parser = SectionParser(["الف", "ب"])
+    assert parser.feed("## 1. الف\nمتن\n") == []
+    completed = parser.feed("## 2. ب\n")
+    assert [s.title for s in completed] == ["الف"]
+    assert parser.current.title == "ب"
+    assert parser.heading_index("## 3. ج") == 3
+    assert parser.heading_index("متن عادی") is None
+
+
+def test_without_expected_titles_numbered_headings_are_used():
+    parser = SectionParser()
+    parser.feed("**1. اول**\nیک\n**2. دوم**\nدو\n")
+    parser.close()
+    sections = parser.sections
+    assert [(s.index, s.title, s.content) for s in sections] == [(1, "اول", "یک"), (2, "دوم", "دو")]
+
+
+def test_out_of_order_numbers_are_not_headings():
+    parser = SectionParser(["الف", "ب"])
+    parser.feed("## 1. الف\n## 3. ب\nمتن\n")
+    sections = parser.close()
+    assert len(sections) == 1
+    assert "## 3. ب" in sections[0].content
+
+
+def test_titles_match_tolerates_spacing_and_zwnj():
+    assert titles_match("توصیه‌ها", "توصیه ها")
+    assert titles_match("تحلیل رخدادها", "تحلیل رخدادهای امنیتی")
+    assert not titles_match("خلاصه اجرایی", "پیوست")
+
+
+def test_strip_heading_removes_a_repeated_title():
+    assert strip_heading("**خلاصه اجرایی:** متن بخش", "خلاصه اجرایی") == "متن بخش"
+    assert strip_heading("## خلاصه اجرایی\nمتن", "خلاصه اجرایی") == "متن"
+    assert strip_heading("متن بدون عنوان", "خلاصه اجرایی") == "متن بدون عنوان"
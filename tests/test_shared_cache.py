@@ -0,0 +1,111 @@
+import asyncio
+import time
+
+from app.services.shared_cache import SharedCache
+
+
+def _cache(tmp_path, **kwargs):
+    return SharedCache(str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def _stored_bytes(cache):
+    return cache._connection().execute("SELECT value FROM totals WHERE name = 'bytes'").fetchone()[0]
+
+
+def test_running_total_follows_inserts_replacements_and_deletes(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set("a", "x" * 10, ttl=60)
+    cache.set("b", "y" * 20, ttl=60)
+    cache.set("a", "x" * 30, ttl=60)
+    cache.delete("b")
+    assert _stored_bytes(cache) == cache.stats()["bytes"] == len('"' + "x" * 30 + '"')
+
+
+def test_least_recently_read_entry_is_evicted(tmp_path):
+    cache = _cache(tmp_path, max_bytes=60, touch_batch=1000, touch_interval=60)
+    cache.set("old", "a" * 20, ttl=60)
+    time.sleep(0.01)
+    cache.set("new", "b" * 20, ttl=60)
+    time.sleep(0.01)
+    # The read is only batched in memory, but flushed before the next write evicts
+    assert cache.get("old") == "a" * 20
+    cache.set("third", "c" * 20, ttl=60)
+    assert cache.get("old") is not None
+    assert cache.get("new") is None
+
+
+def test_pinned_values_are_not_evicted(tmp_path):
+    cache = _cache(tmp_path, max_bytes=60)
+    cache.set_pinned("last-good", "p" * 50, ttl=60)
+    for index in range(5):
+        cache.set(f"entry-{index}", "x" * 20, ttl=60)
+    assert cache.get_pinned("last-good") == "p" * 50
+    assert cache.get("last-good") is None
+    cache.set_pinned("expired", 1, ttl=-1)
+    assert cache.get_pinned("expired", "missing") == "missing"
+
+
+def test_expired_entries_are_not_served(tmp_path):
+    cache = _cache(tmp_path)
+    cache.set("k", 1, ttl=-1)
+    assert cache.get("k", "missing") == "missing"
+
+
+def test_workers_compute_a_missing_value_once(tmp_path):
+    # Two instances on one file stand in for two worker processes
+    workers = [_cache(tmp_path, poll_interval=0.01), _cache(tmp_path, poll_interval=0.01)]
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"value": 42}
+
+    async def scenario():
+        return await asyncio.gather(*(w.get_or_set("k", 60, factory) for w in workers for _ in range(3)))
+
+    assert asyncio.run(scenario()) == [{"value": 42}] * 6
+    assert len(calls) == 1
+
+
+def test_lease_of_a_dead_holder_lapses(tmp_path):
+    dead = _cache(tmp_path, lease_seconds=0.1)
+    started = time.monotonic()
+    assert dead._try_lease("k", "dead-worker")
+    alive = _cache(tmp_path, lease_seconds=0.1, poll_interval=0.01)
+
+    async def factory():
+        return "computed"
+
+    assert asyncio.run(alive.get_or_set("k", 60, factory)) == "computed"
+    assert time.monotonic() - started >= 0.09
+
+
+def test_waiters_take_over_when_the_computing_caller_is_cancelled(tmp_path):
+    cache = _cache(tmp_path, poll_interval=0.01)
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        if len(calls) == 1:
+            await asyncio.sleep(10)
+        return "second"
+
+    async def scenario():
+        first = asyncio.create_task(cache.get_or_set("k", 60, factory))
+        while not calls:
+            await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_set("k", 60, factory))
+        await asyncio.sleep(0.02)
+        first.cancel()
+        return await waiter
+
+    assert asyncio.run(scenario()) == "second"
+    assert len(calls) == 2
+
+
+def test_only_one_worker_claims_a_marker_until_it_expires(tmp_path):
+    workers = [_cache(tmp_path) for _ in range(3)]
+    assert [w.claim("pass", ttl=0.1) for w in workers] == [True, False, False]
+    time.sleep(0.12)
+    assert workers[2].claim("pass", ttl=0.1)
@@ -0,0 +1,29 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.endpoints import stream
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(stream.router)
+    return TestClient(app)
+
+
+def test_malformed_messages_are_reported_and_the_socket_stays_open():
+    with _client().websocket_connect("/ws/reports") as ws:
+        ws.send_text("not json")
+        assert ws.receive_json()["event"] == "error"
+        ws.send_json(["generate"])
+        message = ws.receive_json()
+        assert message["event"] == "error"
+        assert message["status_code"] == 400
+
+        ws.send_json({"action": "launch", "id": "r1"})
+        assert ws.receive_json() == {"id": "r1", "event": "error", "status_code": 400, "detail": "Unknown action: launch"}
+
+
+def test_generate_without_an_id_is_rejected():
+    with _client().websocket_connect("/ws/reports") as ws:
+        ws.send_json({"action": "generate", "report_type": "executive.governor"})
+        assert ws.receive_json()["detail"] == "A unique id is required"
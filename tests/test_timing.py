@@ -0,0 +1,27 @@
+import asyncio
+
+from app.services.timing import RequestTimings, _covered, current_timings, phase
+
+
+def test_covered_merges_overlapping_intervals():
+    assert _covered([(0, 2), (1, 3), (5, 6)]) == 4
+    assert _covered([]) == 0
+
+
+def test_concurrent_children_are_subtracted_once_from_the_parent():
+    async def child():
+        with phase("child"):
+            await asyncio.sleep(0.05)
+
+    async def scenario():
+        timings = RequestTimings("test")
+        current_timings.set(timings)
+        with phase("parent"):
+            await asyncio.sleep(0.02)
+            await asyncio.gather(child(), child(), child())
+        return timings
+
+    timings = asyncio.run(scenario())
+    assert timings.counts["child"] == 3
+    assert timings.phases["child"] >= 0.15
+    assert 0.015 <= timings.phases["parent"] < 0.045